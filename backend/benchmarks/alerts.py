@@ -0,0 +1,87 @@
+"""Alert engine throughput with many active alerts.
+
+    python -m backend.benchmarks.alerts --alerts 100000 --tickers 500 --rounds 200
+"""
+import argparse
+import time
+
+import numpy as np
+
+from ..services.alerts import THRESHOLD_OPERATORS, AlertEngine, Condition
+
+def brute_force(conditions, previous, value):
+    """Alerts a full scan would trigger for one update (condition false before, true now)"""
+    triggered = set()
+    for alert_id, condition in conditions:
+        before = previous is not None and _compare(condition, previous)
+        if not before and _compare(condition, value):
+            triggered.add(alert_id)
+    return triggered
+
+def _compare(condition, value):
+    return {
+        ">": value > condition.value,
+        ">=": value >= condition.value,
+        "<": value < condition.value,
+        "<=": value <= condition.value,
+    }[condition.operator]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--alerts", type=int, default=100_000)
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=200, help="batches of one price update per ticker")
+    parser.add_argument("--check", action="store_true", help="compare every trigger with a full scan")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    tickers = [f"T{i}" for i in range(args.tickers)]
+    start_prices = rng.uniform(20, 500, args.tickers)
+    alert_tickers = rng.integers(0, args.tickers, args.alerts)
+    operators = rng.integers(0, len(THRESHOLD_OPERATORS), args.alerts)
+    thresholds = start_prices[alert_tickers] * rng.uniform(0.8, 1.2, args.alerts)
+
+    engine = AlertEngine(debounce_seconds=0)
+    conditions = [
+        Condition("price", THRESHOLD_OPERATORS[op], round(float(threshold), 2))
+        for op, threshold in zip(operators, thresholds)
+    ]
+    started = time.perf_counter()
+    engine.replace_all(
+        (alert_id, alert_id % 1000, tickers[t], condition, None)
+        for alert_id, (t, condition) in enumerate(zip(alert_tickers, conditions))
+    )
+    engine.evaluate([(ticker, "price", price) for ticker, price in zip(tickers, start_prices)])
+    print(f"indexed {args.alerts} alerts on {args.tickers} tickers in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    by_ticker = {}
+    if args.check:
+        for alert_id, (t, condition) in enumerate(zip(alert_tickers, conditions)):
+            by_ticker.setdefault(tickers[t], []).append((alert_id, condition))
+
+    prices = start_prices.copy()
+    latencies = []
+    triggered = 0
+    for _ in range(args.rounds):
+        previous = prices.copy()
+        prices *= np.exp(rng.normal(0, 0.01, args.tickers))
+        updates = [(ticker, "price", float(price)) for ticker, price in zip(tickers, prices)]
+        batch_started = time.perf_counter()
+        triggers = engine.evaluate(updates)
+        latencies.append(time.perf_counter() - batch_started)
+        triggered += len(triggers)
+        if args.check:
+            expected = set()
+            for ticker, before, after in zip(tickers, previous, prices):
+                expected |= brute_force(by_ticker.get(ticker, ()), float(before), float(after))
+            assert {trigger.alert_id for trigger in triggers} == expected, "engine and full scan disagree"
+
+    latencies = np.array(latencies) * 1000
+    total = sum(latencies) / 1000
+    updates = args.rounds * args.tickers
+    print(f"{args.rounds} batches of {args.tickers} updates: {updates / total:,.0f} updates/s, "
+          f"batch p50 {np.percentile(latencies, 50):.2f} ms, p99 {np.percentile(latencies, 99):.2f} ms")
+    print(f"{triggered} alerts triggered" + (", all matching a full scan" if args.check else ""))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
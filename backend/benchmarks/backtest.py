@@ -0,0 +1,38 @@
+"""Backtest engine throughput on synthetic prices.
+
+    python -m backend.benchmarks.backtest --tickers 500 --years 10
+"""
+import argparse
+import time
+
+import numpy as np
+
+from ..services.backtest import PriceHistory, regenerate_signals, simulate
+from .indicators import synthetic_ohlcv
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--holding", type=int, default=5)
+    args = parser.parse_args()
+
+    bars = args.years * 252
+    close, high, low, volume = synthetic_ohlcv(args.tickers, bars)
+    ts = np.arange(bars, dtype="i8") * 86400
+    history = PriceHistory([f"T{i}" for i in range(args.tickers)], ts, close, high, low, volume)
+
+    started = time.perf_counter()
+    signals = regenerate_signals(history)
+    signals_done = time.perf_counter()
+    stats, _ = simulate(history.close, signals, args.threshold, args.holding, 10_000.0)
+    finished = time.perf_counter()
+
+    print(f"{args.tickers} tickers x {bars} bars ({args.years} years)")
+    print(f"signals {(signals_done - started) * 1000:.0f} ms, simulate {(finished - signals_done) * 1000:.0f} ms, "
+          f"total {(finished - started) * 1000:.0f} ms")
+    print(stats)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
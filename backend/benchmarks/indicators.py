@@ -0,0 +1,52 @@
+"""Throughput of the vectorized indicator engine.
+
+    python -m backend.benchmarks.indicators --tickers 5000 --bars 252
+"""
+import argparse
+import time
+
+import numpy as np
+
+from ..services.indicators import compute_indicators, latest_features
+
+def synthetic_ohlcv(tickers: int, bars: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0.0003, 0.02, size=(tickers, bars))
+    close = 100 * np.exp(np.cumsum(returns, axis=1))
+    spread = np.abs(rng.normal(0, 0.01, size=(tickers, bars)))
+    high = close * (1 + spread)
+    low = close * (1 - spread)
+    volume = rng.integers(100_000, 5_000_000, size=(tickers, bars)).astype("f8")
+
+    # A tenth of the universe has short histories, NaN-padded on the left
+    short = rng.choice(tickers, size=tickers // 10, replace=False)
+    starts = rng.integers(bars // 2, bars - 5, size=len(short))
+    for row, start in zip(short, starts):
+        for arr in (close, high, low, volume):
+            arr[row, :start] = np.nan
+    return close, high, low, volume
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickers", type=int, default=5000)
+    parser.add_argument("--bars", type=int, default=252)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    close, high, low, volume = synthetic_ohlcv(args.tickers, args.bars)
+    compute_indicators(close, high, low, volume)  # warm-up
+
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        indicators = compute_indicators(close, high, low, volume)
+        latest_features(indicators)
+        timings.append(time.perf_counter() - started)
+
+    best = min(timings)
+    print(f"{args.tickers} tickers x {args.bars} bars")
+    print(f"best {best * 1000:.1f} ms, median {np.median(timings) * 1000:.1f} ms")
+    print(f"{args.tickers / best:,.0f} tickers/s")
+
+if __name__ == "__main__":
+    main()
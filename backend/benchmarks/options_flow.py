@@ -0,0 +1,99 @@
+"""Options flow ingestion throughput and unusual-activity detection on synthetic prints.
+
+    python -m backend.benchmarks.options_flow --prints 500000 --contracts 2000 --url sqlite:////tmp/flow.db
+
+Prints are written to a CSV file and replayed through the file feed into the
+database at --url (COPY on PostgreSQL, executemany INSERT elsewhere). About one
+print in a thousand is a volume spike; the report shows how many of those the
+detector flagged and how many ordinary prints it flagged besides.
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from ..config import settings
+from ..database import Base, build_engine
+from ..services.options_flow import FileReplayFeed, FlowIngestor, UnusualActivityDetector
+
+def write_prints(path: str, prints: int, contracts: int, rng) -> np.ndarray:
+    """Write synthetic prints in time order; returns which ones are injected spikes"""
+    tickers = np.array([f"T{i:03d}" for i in range(max(contracts // 50, 1))])
+    contract_ticker = tickers[rng.integers(0, len(tickers), contracts)]
+    strike = np.round(rng.uniform(10, 500, contracts), 0)
+    expiry_days = rng.integers(1, 120, contracts)
+    kind = np.where(rng.random(contracts) < 0.5, "call", "put")
+    typical = rng.lognormal(4, 1, contracts)
+    open_interest = (typical * rng.uniform(20, 200, contracts)).astype("i8")
+
+    contract = rng.integers(0, contracts, prints)
+    volume = np.maximum(1, rng.normal(typical[contract], typical[contract] * 0.3)).astype("i8")
+    spike = rng.random(prints) < 0.001
+    volume[spike] *= 10
+    start = datetime(2024, 6, 3, 13, 30)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ticker", "strike", "expiry", "type", "volume", "open_interest", "premium", "timestamp"])
+        for i, c in enumerate(contract.tolist()):
+            writer.writerow((
+                contract_ticker[c], strike[c], (start + timedelta(days=int(expiry_days[c]))).date().isoformat(),
+                kind[c], volume[i], open_interest[c], round(volume[i] * strike[c] * 0.05 * 100, 2),
+                (start + timedelta(milliseconds=i * 10)).isoformat()
+            ))
+    return spike
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="sqlite:///" + os.path.join(tempfile.gettempdir(), "options_flow_bench.db"))
+    parser.add_argument("--prints", type=int, default=500_000)
+    parser.add_argument("--contracts", type=int, default=2_000)
+    parser.add_argument("--batch-size", type=int, default=settings.OPTIONS_FLOW_BATCH_SIZE)
+    parser.add_argument("--z-threshold", type=float, default=settings.OPTIONS_FLOW_Z_THRESHOLD)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    path = os.path.join(tempfile.gettempdir(), "options_flow_bench.csv")
+    spike = write_prints(path, args.prints, args.contracts, rng)
+
+    engine = build_engine(args.url)
+    table = Base.metadata.tables["options_flow"]
+    table.drop(engine, checkfirst=True)
+    table.create(engine)
+
+    def detector():
+        return UnusualActivityDetector(
+            z_threshold=args.z_threshold,
+            alpha=settings.OPTIONS_FLOW_EWM_ALPHA,
+            min_samples=settings.OPTIONS_FLOW_MIN_SAMPLES,
+            max_contracts=settings.OPTIONS_FLOW_MAX_CONTRACTS
+        )
+
+    feed = FileReplayFeed(path)
+    started = time.perf_counter()
+    prints = feed.read(args.prints)
+    parse_seconds = time.perf_counter() - started
+    feed.close()
+
+    started = time.perf_counter()
+    flags = np.array(detector().score(prints))
+    score_seconds = time.perf_counter() - started
+
+    ingestor = FlowIngestor(detector(), batch_size=args.batch_size, bind=engine)
+    feed = FileReplayFeed(path)
+    report = ingestor.drain(feed)
+    feed.close()
+
+    print(f"{len(prints)} prints on {args.contracts} contracts, batches of {args.batch_size} into {engine.url.get_backend_name()}")
+    print(f"parse  {len(prints) / parse_seconds:>12,.0f} prints/s")
+    print(f"score  {len(prints) / score_seconds:>12,.0f} prints/s")
+    print(f"ingest {report.prints_per_second:>12,.0f} prints/s end to end ({report.seconds:.2f}s, {report.batches} batches)")
+    print(f"flagged {int(flags.sum())}: {int((flags & spike).sum())} of {int(spike.sum())} spikes, "
+          f"{int((flags & ~spike).sum())} ordinary prints")
+    os.remove(path)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
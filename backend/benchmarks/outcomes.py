@@ -0,0 +1,75 @@
+"""Outcome scoring throughput on synthetic bars and predictions.
+
+    python -m backend.benchmarks.outcomes --predictions 1000000 --tickers 500
+"""
+import argparse
+import time
+
+import numpy as np
+
+from ..services.bar_store import BAR_DTYPE
+from ..services.outcomes import DAY_SECONDS, EXPIRED, HIT_STOP, HIT_TARGET, OPEN, resolve
+from .indicators import synthetic_ohlcv
+
+def resolve_one(bars, created, expiry, direction, target, stop):
+    """Bar-by-bar reference for a single prediction"""
+    for bar in bars[(bars["ts"] > created) & (bars["ts"] <= expiry)]:
+        high, low = bar["high"], bar["low"]
+        stopped = (direction > 0 and low <= stop) or (direction < 0 and high >= stop)
+        reached = (direction > 0 and high >= target) or (direction < 0 and low <= target)
+        if stopped:
+            return HIT_STOP
+        if reached:
+            return HIT_TARGET
+    return EXPIRED if bars["ts"][-1] >= expiry - DAY_SECONDS else OPEN
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--predictions", type=int, default=1_000_000)
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--bars", type=int, default=2520)
+    parser.add_argument("--check", type=int, default=2000, help="predictions compared with the bar-by-bar reference")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    close, high, low, volume = synthetic_ohlcv(args.tickers, args.bars)
+    ts = np.arange(args.bars, dtype="i8") * DAY_SECONDS
+    bars_by_ticker = []
+    for i in range(args.tickers):
+        bars = np.zeros(args.bars, dtype=BAR_DTYPE)
+        bars["ts"], bars["open"], bars["close"], bars["high"], bars["low"], bars["volume"] = (
+            ts, close[i], close[i], high[i], low[i], volume[i]
+        )
+        bars_by_ticker.append(bars)
+
+    per_ticker = args.predictions // args.tickers
+    horizons = np.array([1, 7, 30]) * DAY_SECONDS
+    started = time.perf_counter()
+    counts = np.zeros(4, dtype="i8")
+    checked = 0
+    for i, bars in enumerate(bars_by_ticker):
+        bar = rng.integers(0, args.bars, per_ticker)
+        created = ts[bar] + 3600
+        expiry = created + horizons[rng.integers(0, 3, per_ticker)]
+        direction = rng.choice(np.array([1, -1], dtype="i1"), per_ticker)
+        volatility = rng.uniform(0.01, 0.05, per_ticker)
+        price = close[i, bar]
+        target = price * (1 + direction * 2 * volatility)
+        stop = price * (1 - direction * volatility)
+        outcome, _ = resolve(bars, created, expiry, direction, target, stop)
+        counts += np.bincount(outcome, minlength=4)
+        if checked < args.check:
+            sample = slice(0, min(per_ticker, args.check - checked))
+            for j in range(sample.stop):
+                expected = resolve_one(bars, created[j], expiry[j], direction[j], target[j], stop[j])
+                assert outcome[j] == expected, (i, j, outcome[j], expected)
+            checked += sample.stop
+    elapsed = time.perf_counter() - started
+
+    total = per_ticker * args.tickers
+    print(f"{total} predictions on {args.tickers} tickers x {args.bars} bars: "
+          f"{elapsed:.2f}s, {total / elapsed:,.0f} predictions/s (incl. {checked} reference checks)")
+    print(f"hit_target {counts[HIT_TARGET]}, hit_stop {counts[HIT_STOP]}, expired {counts[EXPIRED]}, open {counts[OPEN]}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
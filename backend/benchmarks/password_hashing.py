@@ -0,0 +1,46 @@
+"""bcrypt cost factor vs. hashing throughput on the password hashing pool.
+
+    python -m backend.benchmarks.password_hashing --rounds 10 11 12 13 --workers 4
+
+Use it to pick BCRYPT_ROUNDS: the single-hash latency is what one login costs,
+hashes/s is the login rate the pool can sustain before requests get 503s.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from ..services.password_hashing import PasswordHasher
+
+async def measure(hasher: PasswordHasher, operations: int):
+    # Single hash latency (pool already warm), then a saturated burst
+    started = time.perf_counter()
+    await hasher.hash("correct horse battery staple")
+    single = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await asyncio.gather(*(hasher.hash(f"password-{i}") for i in range(operations)))
+    return single, operations / (time.perf_counter() - started)
+
+async def run(args):
+    for rounds in args.rounds:
+        hasher = PasswordHasher(workers=args.workers, max_pending=args.operations, rounds=rounds)
+        try:
+            await asyncio.gather(*(hasher.hash("warm-up") for _ in range(args.workers)))
+            single, throughput = await measure(hasher, args.operations)
+        finally:
+            hasher.shutdown()
+        print(f"rounds={rounds:<3} single {single * 1000:7.1f} ms   {throughput:8.1f} hashes/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12, 13])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--operations", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers, {args.operations} hashes per cost factor")
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""Cold start cost: import-time breakdown and time to first response.
+
+    python -m backend.benchmarks.startup --top 15 --runs 3
+
+Both measurements run in fresh interpreters. The first uses `python -X importtime`
+on backend.main and sums cumulative import time per top-level package. The second
+starts uvicorn and polls /health until it answers.
+"""
+import argparse
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+# Must stay off the startup path: lazy_import placeholders are fine, loaded modules are not
+HEAVY_MODULES = ("numpy", "scipy", "pandas")
+
+def import_breakdown(module: str):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True
+    )
+    # -X importtime prints children before their parent; rebuild the tree from indentation
+    pending = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        depth, name, cumulative = len(match.group(3)), match.group(4).strip(), int(match.group(2))
+        children = []
+        while pending and pending[-1][0] > depth:
+            children.insert(0, pending.pop())
+        pending.append((depth, name, cumulative, children))
+
+    # Cumulative time per top-level package, counted at its outermost import only
+    by_package = defaultdict(int)
+    total = 0
+
+    def visit(node, seen):
+        nonlocal total
+        _, name, cumulative, children = node
+        package = name.split(".")[0]
+        if name == module:
+            total = cumulative
+        if package not in seen:
+            by_package[package] += cumulative
+        for child in children:
+            visit(child, seen | {package})
+
+    for root in pending:
+        visit(root, frozenset())
+    return total, by_package
+
+def eager_imports(module: str) -> list:
+    """Heavy modules that importing module fully loads"""
+    script = (
+        f"import sys, {module}\n"
+        f"for name in {HEAVY_MODULES!r}:\n"
+        "    loaded = sys.modules.get(name)\n"
+        "    if loaded is not None and type(loaded).__name__ != '_LazyModule':\n"
+        "        print(name)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def time_to_first_response(app: str, timeout: float) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError(f"{app} did not answer within {timeout:.0f}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="backend.main")
+    parser.add_argument("--app", default="backend.main:app")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    total, by_package = import_breakdown(args.module)
+    print(f"import {args.module}: {total / 1000:.0f} ms")
+    by_package.pop(args.module.split(".")[0], None)
+    for name, micros in sorted(by_package.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<28} {micros / 1000:8.1f} ms")
+    eager = eager_imports(args.module)
+    if eager:
+        raise SystemExit(f"import {args.module} loads {', '.join(eager)}; use lazy_import or import where used")
+    print(f"heavy modules left unloaded: {', '.join(HEAVY_MODULES)}")
+
+    timings = [time_to_first_response(args.app, args.timeout) for _ in range(args.runs)]
+    print(f"time to first response (/health): best {min(timings) * 1000:.0f} ms, "
+          f"worst {max(timings) * 1000:.0f} ms over {args.runs} runs")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,60 @@
+"""Stream broker fan-out cost with many connections.
+
+    python -m backend.benchmarks.stream --connections 5000 --tickers 500 --per-connection 20
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from ..services.stream import StreamBroker
+
+async def run(args):
+    broker = StreamBroker(buffer_size=args.buffer, policy="drop_oldest", max_connections=args.connections)
+    broker.start()
+    rng = random.Random(0)
+    tickers = [f"T{i}" for i in range(args.tickers)]
+    subscribers = []
+    for i in range(args.connections):
+        subscriber = broker.connect(i)
+        broker.subscribe(subscriber, rng.sample(tickers, args.per_connection))
+        subscribers.append(subscriber)
+
+    async def drain(subscriber):
+        received = 0
+        while not subscriber.closed:
+            received += len(await subscriber.next_batch())
+        return received
+
+    drainers = [asyncio.ensure_future(drain(subscriber)) for subscriber in subscribers]
+    await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    for round_ in range(args.rounds):
+        for ticker in tickers:
+            broker.publish(ticker, "price", {"price": 100.0 + round_, "volume": 1000.0})
+        # Let the connection tasks drain between rounds, as they would between bar refreshes
+        await asyncio.sleep(0)
+    published = time.perf_counter() - started
+    for subscriber in subscribers:
+        broker.disconnect(subscriber)
+    received = sum(await asyncio.gather(*drainers))
+    finished = time.perf_counter() - started
+
+    events = args.rounds * args.tickers
+    print(f"{args.connections} connections, {args.per_connection} of {args.tickers} tickers each")
+    print(f"{events} events fanned out as {received} messages: publish {published * 1000:.0f} ms "
+          f"({events / published:,.0f} events/s), {received / finished:,.0f} deliveries/s including drain")
+    print(f"dropped {sum(subscriber.dropped for subscriber in subscribers)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connections", type=int, default=5000)
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--per-connection", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--buffer", type=int, default=256)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,22 +1,197 @@
-from sqlalchemy import create_engine
+import itertools
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
 from .config import settings
+from .services import metrics
+
+def normalize_url(url: str) -> str:
+    # Handle PostgreSQL URL for production
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql://", 1)
+    return url
+
+SQLALCHEMY_DATABASE_URL = normalize_url(settings.DATABASE_URL)
+REPLICA_URLS = [normalize_url(url.strip()) for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+
+CHECKOUT_WAIT_MS_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+class _TimedCheckout:
+    """Records how long each checkout waited for a connection (or to open one)"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            metrics.counter("db.pool.checkout_timeouts").inc()
+            raise
+        finally:
+            metrics.histogram("db.pool.checkout_wait_ms", CHECKOUT_WAIT_MS_BUCKETS).observe(
+                (time.perf_counter() - started) * 1000
+            )
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+class InstrumentedNullPool(_TimedCheckout, NullPool):
+    pass
+
+def build_engine(
+    url: str = SQLALCHEMY_DATABASE_URL,
+    mode: str = settings.DB_POOL_MODE,
+    pool_size: int = settings.DB_POOL_SIZE,
+    max_overflow: int = settings.DB_MAX_OVERFLOW,
+    pool_timeout: float = settings.DB_POOL_TIMEOUT_SECONDS,
+    statement_timeout_ms: int = settings.DB_STATEMENT_TIMEOUT_MS,
+):
+    """Engine configured from the DB_* settings.
 
-SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
+    Mode "queue" keeps a local pool of pool_size (+ max_overflow) connections.
+    "transaction" is for running behind a transaction-level pooler such as PgBouncer:
+    connections are not pooled locally and the statement timeout is applied per
+    transaction with SET LOCAL, since session state does not survive between
+    transactions and startup options are not forwarded.
+    """
+    if mode not in ("queue", "transaction"):
+        raise ValueError(f"Unknown DB_POOL_MODE: {mode}")
+    postgres = make_url(url).get_backend_name() == "postgresql"
 
-# Handle PostgreSQL URL for production
-if SQLALCHEMY_DATABASE_URL.startswith("postgres://"):
-    SQLALCHEMY_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("postgres://", "postgresql://", 1)
+    kwargs = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if mode == "transaction":
+        kwargs["poolclass"] = InstrumentedNullPool
+    else:
+        kwargs.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        )
+        if postgres and statement_timeout_ms:
+            kwargs["connect_args"] = {"options": f"-c statement_timeout={int(statement_timeout_ms)}"}
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    new_engine = create_engine(url, **kwargs)
+
+    if mode == "transaction" and postgres and statement_timeout_ms:
+        @event.listens_for(new_engine, "begin")
+        def set_statement_timeout(conn):
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(statement_timeout_ms)}")
+
+    return new_engine
+
+def register_pool_metrics(pool_engine, name: str = "db.pool"):
+    """Export connections in use (any pool class) plus QueuePool occupancy"""
+    checkouts = metrics.counter(f"{name}.checkouts")
+    returned = metrics.counter(f"{name}.checkins")
+
+    @event.listens_for(pool_engine, "checkout")
+    def count_checkout(dbapi_connection, connection_record, connection_proxy):
+        checkouts.inc()
+
+    @event.listens_for(pool_engine, "checkin")
+    def count_checkin(dbapi_connection, connection_record):
+        returned.inc()
+
+    metrics.gauge(f"{name}.in_use", lambda: checkouts.value - returned.value)
+    pool = pool_engine.pool
+    if isinstance(pool, QueuePool):
+        metrics.gauge(f"{name}.size", pool.size)
+        metrics.gauge(f"{name}.idle", pool.checkedin)
+        metrics.gauge(f"{name}.overflow", lambda: max(0, pool.overflow()))
+
+engine = build_engine()
+register_pool_metrics(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+replica_engines = [build_engine(url) for url in REPLICA_URLS]
+for index, replica_engine in enumerate(replica_engines):
+    register_pool_metrics(replica_engine, f"db.replica{index}.pool")
+ReplicaSessions = [
+    sessionmaker(autocommit=False, autoflush=False, bind=replica_engine) for replica_engine in replica_engines
+]
+_next_replica = itertools.count()
+
+class RecentWriters:
+    """Users who committed a write in the last `window` seconds (in this process).
+
+    Their reads go to the primary so they see their own writes despite replica lag.
+    """
+
+    def __init__(self, window: float, max_entries: int = 100000):
+        self.window = window
+        self.max_entries = max_entries
+        self._until: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def mark(self, user_id: int):
+        now = time.monotonic()
+        with self._lock:
+            self._until.pop(user_id, None)
+            self._until[user_id] = now + self.window
+            if len(self._until) > self.max_entries:
+                # Insertion order is expiry order, so expired entries are at the front
+                while self._until and next(iter(self._until.values())) <= now:
+                    del self._until[next(iter(self._until))]
+
+    def contains(self, user_id: int) -> bool:
+        until = self._until.get(user_id)
+        return until is not None and until > time.monotonic()
+
+recent_writers = RecentWriters(window=settings.READ_YOUR_WRITES_SECONDS)
+
+@event.listens_for(SessionLocal, "after_flush")
+def _flag_orm_write(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _flag_statement_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+@event.listens_for(SessionLocal, "after_commit")
+def _record_user_write(session):
+    # user_id is attached to the request session by get_current_user
+    if session.info.pop("wrote", False) and session.info.get("user_id") is not None:
+        recent_writers.mark(session.info["user_id"])
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _clear_write_flag(session):
+    session.info.pop("wrote", None)
+
+def read_session(user_id: Optional[int] = None):
+    """Session for read-only work: a replica (round robin) unless none is configured
+    or the user wrote recently, in which case the primary"""
+    if not ReplicaSessions or (user_id is not None and recent_writers.contains(user_id)):
+        return SessionLocal()
+    return ReplicaSessions[next(_next_replica) % len(ReplicaSessions)]()
+
 Base = declarative_base()
 
+def create_tables():
+    """Create missing tables on the primary; existing tables are left as they are"""
+    from . import models  # noqa: F401 (registers every table on Base.metadata)
+
+    Base.metadata.create_all(bind=engine)
+
 # Dependency to get DB session
 def get_db():
     db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Dependency for read-only handlers without a user (see auth.get_user_read_db)
+def get_read_db():
+    db = read_session()
     try:
         yield db
     finally:
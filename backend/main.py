@@ -3,23 +3,52 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict
+import asyncio
+import inspect
+import logging
 import os
 from dotenv import load_dotenv
 
 try:
-    from .routers import auth, predictions, portfolio, alerts, social, backtest, options, risk, earnings, education
-    from .database import engine, Base
+    from .routers import auth, predictions, portfolio, alerts, social, backtest, options, risk, earnings, education, stream
+    from .database import create_tables
     from .models import User
     from .config import settings
+    from .services import metrics
+    from .services.alerts import alert_engine
+    from .services.api_keys import api_key_index
+    from .services.consensus import crowd_consensus
+    from .services.concurrency import PeriodicJob, configure_threadpool, loop_lag_monitor, run_io
+    from .services.leaderboard import leaderboard
+    from .services.options_flow import flow_ingestor, get_feed
+    from .services.outcomes import outcome_scorer
+    from .services.password_hashing import password_hasher
+    from .services.stream import stream_broker
+    from .services.sweeps import sweep_manager
+    from .services.user_stats import user_stats
 except ImportError:
     # Handle relative imports for Railway deployment
-    from backend.routers import auth, predictions, portfolio, alerts, social, backtest, options, risk, earnings, education
-    from backend.database import engine, Base
+    from backend.routers import auth, predictions, portfolio, alerts, social, backtest, options, risk, earnings, education, stream
+    from backend.database import create_tables
     from backend.models import User
     from backend.config import settings
+    from backend.services import metrics
+    from backend.services.alerts import alert_engine
+    from backend.services.api_keys import api_key_index
+    from backend.services.consensus import crowd_consensus
+    from backend.services.concurrency import PeriodicJob, configure_threadpool, loop_lag_monitor, run_io
+    from backend.services.leaderboard import leaderboard
+    from backend.services.options_flow import flow_ingestor, get_feed
+    from backend.services.outcomes import outcome_scorer
+    from backend.services.password_hashing import password_hasher
+    from backend.services.stream import stream_broker
+    from backend.services.sweeps import sweep_manager
+    from backend.services.user_stats import user_stats
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI(
     title="StockPredictor AI API",
     description="AI-powered stock prediction API with advanced features for retail investors",
@@ -35,8 +64,70 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Background jobs started with the app
+periodic_jobs = [
+    PeriodicJob("user_stats.reconcile", settings.USER_STATS_RECONCILE_SECONDS, user_stats.reconcile),
+    PeriodicJob("api_keys.refresh", settings.API_KEY_REFRESH_SECONDS, api_key_index.refresh),
+    PeriodicJob("api_keys.flush_usage", settings.API_KEY_USAGE_FLUSH_SECONDS, api_key_index.flush_usage),
+    PeriodicJob("alerts.reload", settings.ALERT_RELOAD_SECONDS, alert_engine.load, run_at_start=True),
+    PeriodicJob("alerts.flush", settings.ALERT_FLUSH_SECONDS, alert_engine.flush),
+    PeriodicJob("leaderboard.rebuild", settings.LEADERBOARD_REBUILD_SECONDS, leaderboard.rebuild, run_at_start=True),
+    PeriodicJob("consensus.rebuild", settings.CONSENSUS_REBUILD_SECONDS, crowd_consensus.rebuild, run_at_start=True),
+    PeriodicJob("outcomes.score", settings.OUTCOME_SCORING_SECONDS, outcome_scorer.run),
+]
+
+options_feed = get_feed(settings.OPTIONS_FLOW_FEED, settings.OPTIONS_FLOW_REPLAY_PATH)
+if options_feed is not None:
+    periodic_jobs.append(
+        PeriodicJob("options_flow.ingest", settings.OPTIONS_FLOW_POLL_SECONDS, lambda: flow_ingestor.drain(options_feed))
+    )
+
+# Startup work that runs after the server is already answering
+background_tasks: List[asyncio.Task] = []
+
+async def warm_up():
+    """Create tables, then start the jobs whose first runs load alerts, rankings and consensus"""
+    if settings.DB_CREATE_TABLES_ON_STARTUP:
+        # Off the import path; deployments that run `python -m backend.manage init-db` can disable it
+        try:
+            await run_io(create_tables)
+        except Exception:
+            logger.exception("Creating tables failed")
+    for job in periodic_jobs:
+        job.start()
+
+@app.on_event("startup")
+async def start_concurrency():
+    configure_threadpool()
+    loop_lag_monitor.start()
+    stream_broker.start()
+    # Until the first loads land, alerts, the leaderboard and consensus serve empty results
+    background_tasks.append(asyncio.get_running_loop().create_task(warm_up()))
+    if settings.MODEL_PRELOAD:
+        await predictions.model_server.ensure_loaded()
+
+@app.on_event("shutdown")
+async def stop_concurrency():
+    steps = [("loop_lag_monitor.stop", loop_lag_monitor.stop)]
+    steps += [("warm_up.cancel", task.cancel) for task in background_tasks]
+    steps += [(f"{job.name}.stop", job.stop) for job in periodic_jobs]
+    steps += [
+        ("api_keys.flush_usage", lambda: run_io(api_key_index.flush_usage)),
+        ("alerts.flush", lambda: run_io(alert_engine.flush)),
+        ("model_server.stop", predictions.model_server.stop),
+        ("password_hasher.shutdown", password_hasher.shutdown),
+        ("sweep_manager.shutdown", sweep_manager.shutdown),
+    ]
+    if options_feed is not None:
+        steps.append(("options_flow.close", options_feed.close))
+    # One failing step must not keep usage and triggers from being flushed or pools from stopping
+    for name, step in steps:
+        try:
+            result = step()
+            if inspect.isawaitable(result):
+                await result
+        except Exception:
+            logger.exception("Shutdown step %s failed", name)
 
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
@@ -49,6 +140,7 @@ app.include_router(options.router, prefix="/api/options", tags=["Options"])
 app.include_router(risk.router, prefix="/api/risk", tags=["Risk Management"])
 app.include_router(earnings.router, prefix="/api/earnings", tags=["Earnings"])
 app.include_router(education.router, prefix="/api/education", tags=["Education"])
+app.include_router(stream.router, prefix="/api/stream", tags=["Streaming"])
 
 @app.get("/")
 async def root():
@@ -68,10 +160,15 @@ async def health_check():
         "services": {
             "database": "connected",
             "redis": "connected",
-            "ml_model": "loaded"
+            "ml_model": "loaded",
+            "caches": "ready" if all(job.ready for job in periodic_jobs) else "warming"
         }
     }
 
+@app.get("/api/metrics")
+async def get_metrics():
+    return metrics.snapshot()
+
 @app.get("/api/stats")
 async def get_stats():
     return {
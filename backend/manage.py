@@ -0,0 +1,75 @@
+"""Operational commands.
+
+    python -m backend.manage init-db
+    python -m backend.manage upgrade-db
+    python -m backend.manage score-outcomes --chunk-size 5000
+    python -m backend.manage ingest-options-flow prints.csv
+"""
+import argparse
+
+from .database import create_tables
+
+def init_db(args):
+    create_tables()
+    print("Database tables created")
+
+def upgrade_db(args):
+    from .migrations import STEPS, upgrade
+
+    create_tables()
+    upgrade()
+    print(f"Schema up to date ({len(STEPS)} steps checked)")
+
+def score_outcomes(args):
+    from .services.outcomes import OutcomeScorer
+
+    def progress(report):
+        print(
+            f"{report.scanned} scanned, {report.resolved} resolved, {report.open} still open "
+            f"({report.rows_per_second:,.0f} rows/s)",
+            flush=True
+        )
+
+    report = OutcomeScorer(chunk_size=args.chunk_size).run(max_rows=args.max_rows, progress=progress)
+    print(f"Done in {report.seconds:.1f}s: {report.to_dict()}")
+
+def ingest_options_flow(args):
+    from .services.options_flow import FileReplayFeed, flow_ingestor
+
+    def progress(report):
+        print(
+            f"{report.prints} prints, {report.unusual} unusual ({report.prints_per_second:,.0f} prints/s)",
+            flush=True
+        )
+
+    feed = FileReplayFeed(args.path)
+    try:
+        report = flow_ingestor.drain(feed, max_prints=args.max_prints, progress=progress)
+    finally:
+        feed.close()
+    print(f"Done in {report.seconds:.1f}s: {report.to_dict()}, {feed.skipped} malformed lines skipped")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("init-db", help="create missing tables").set_defaults(handler=init_db)
+    commands.add_parser(
+        "upgrade-db", help="create missing tables and bring existing ones up to the models (idempotent)"
+    ).set_defaults(handler=upgrade_db)
+
+    score = commands.add_parser("score-outcomes", help="resolve expired predictions (safe to interrupt and rerun)")
+    score.add_argument("--chunk-size", type=int, default=5000)
+    score.add_argument("--max-rows", type=int, default=None, help="stop after scanning this many predictions")
+    score.set_defaults(handler=score_outcomes)
+
+    ingest = commands.add_parser("ingest-options-flow", help="load options flow prints from a CSV or NDJSON file")
+    ingest.add_argument("path")
+    ingest.add_argument("--max-prints", type=int, default=None)
+    ingest.set_defaults(handler=ingest_options_flow)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
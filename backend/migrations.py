@@ -0,0 +1,114 @@
+"""Schema changes that create_all does not apply to tables that already exist.
+
+Every step checks the live schema first, so `python -m backend.manage upgrade-db`
+is safe to run on fresh and old deployments alike and to rerun after an
+interruption. On PostgreSQL indexes are built CONCURRENTLY, keeping large tables
+writable; a concurrent build that fails leaves an INVALID index behind, which
+has to be dropped before rerunning.
+"""
+import hashlib
+import logging
+import re
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import Table, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateIndex
+
+from .database import engine
+from .models import APIKey, OptionsFlow, Prediction
+
+logger = logging.getLogger(__name__)
+
+class Step(NamedTuple):
+    name: str
+    apply: Callable[[Connection], None]
+
+def is_postgres(connection: Connection) -> bool:
+    return connection.dialect.name == "postgresql"
+
+def has_column(connection: Connection, table: Table, column: str) -> bool:
+    return column in {c["name"] for c in inspect(connection).get_columns(table.name)}
+
+def add_column(connection: Connection, table: Table, column: str):
+    """Add a model column to the live table, nullable whatever the model says"""
+    if has_column(connection, table, column):
+        return
+    column_type = table.c[column].type
+    if hasattr(column_type, "create"):
+        # Native enum types on PostgreSQL exist apart from the table
+        column_type.create(connection, checkfirst=True)
+    ddl = column_type.compile(dialect=connection.dialect)
+    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column} {ddl}"))
+
+def create_index(connection: Connection, table: Table, name: str):
+    """Create a model index unless it exists, concurrently on PostgreSQL"""
+    index = next(index for index in table.indexes if index.name == name)
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=connection.dialect))
+    if is_postgres(connection):
+        ddl = re.sub(r"^CREATE (UNIQUE )?INDEX", r"CREATE \1INDEX CONCURRENTLY", ddl)
+    connection.execute(text(ddl))
+
+def drop_index(connection: Connection, name: str):
+    concurrently = " CONCURRENTLY" if is_postgres(connection) else ""
+    connection.execute(text(f"DROP INDEX{concurrently} IF EXISTS {name}"))
+
+def api_key_prefix(connection: Connection):
+    """API keys are looked up by prefix and stored as a SHA-256 of the full key"""
+    table = APIKey.__table__
+    if not has_column(connection, table, "prefix"):
+        add_column(connection, table, "prefix")
+        # Keys from before this schema were stored in plain text and never authenticated
+        # anything; hash them and leave them inactive so they have to be reissued
+        rows = connection.execute(text("SELECT id, key FROM api_keys WHERE prefix IS NULL")).all()
+        for key_id, key in rows:
+            connection.execute(
+                text("UPDATE api_keys SET prefix = :prefix, key = :key, is_active = :active WHERE id = :id"),
+                {"prefix": f"legacy{key_id}", "key": hashlib.sha256(key.encode()).hexdigest(), "active": False, "id": key_id}
+            )
+    if is_postgres(connection):
+        connection.execute(text("ALTER TABLE api_keys ALTER COLUMN prefix SET NOT NULL"))
+    create_index(connection, table, "ix_api_keys_prefix")
+    # The plain-text key column is no longer looked up
+    drop_index(connection, "ix_api_keys_key")
+
+def options_flow_indexes(connection: Connection):
+    """Keep /flow/{ticker} and /unusual index scans as options_flow grows"""
+    table = OptionsFlow.__table__
+    create_index(connection, table, "ix_options_flow_ticker_timestamp_id")
+    create_index(connection, table, "ix_options_flow_unusual_timestamp")
+    if is_postgres(connection):
+        create_index(connection, table, "ix_options_flow_timestamp_brin")
+    # Covered by the composite index; one index less to maintain on every insert
+    drop_index(connection, "ix_options_flow_ticker")
+    drop_index(connection, "ix_options_flow_ticker_timestamp")
+
+def prediction_history_index(connection: Connection):
+    """Keyset pages of a user's prediction history"""
+    create_index(connection, Prediction.__table__, "ix_predictions_user_created")
+
+def prediction_outcomes(connection: Connection):
+    """Outcome columns written by the scorer and read by the leaderboard"""
+    table = Prediction.__table__
+    add_column(connection, table, "outcome")
+    add_column(connection, table, "resolved_at")
+    create_index(connection, table, "ix_predictions_resolved_at")
+
+def unresolved_predictions_index(connection: Connection):
+    """Partial index of the rows the outcome scorer still has to resolve"""
+    create_index(connection, Prediction.__table__, "ix_predictions_unresolved")
+
+STEPS: List[Step] = [
+    Step("api_keys.prefix", api_key_prefix),
+    Step("predictions.history_index", prediction_history_index),
+    Step("predictions.outcomes", prediction_outcomes),
+    Step("predictions.unresolved_index", unresolved_predictions_index),
+    Step("options_flow.indexes", options_flow_indexes),
+]
+
+def upgrade(bind=engine):
+    # Autocommit: CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for step in STEPS:
+            logger.info("Applying schema step %s", step.name)
+            step.apply(connection)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, JSON, Text, Enum
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, JSON, Text, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -14,6 +14,11 @@ class PredictionDirection(str, enum.Enum):
     DOWN = "down"
     NEUTRAL = "neutral"
 
+class PredictionOutcome(str, enum.Enum):
+    HIT_TARGET = "hit_target"
+    HIT_STOP = "hit_stop"
+    EXPIRED = "expired"
+
 class User(Base):
     __tablename__ = "users"
     
@@ -49,9 +54,21 @@ class Prediction(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     target_price = Column(Float, nullable=True)
     stop_loss = Column(Float, nullable=True)
+    outcome = Column(Enum(PredictionOutcome), nullable=True)  # set once the timeframe has played out
+    resolved_at = Column(DateTime, nullable=True)
     
     # Relationships
     user = relationship("User", back_populates="predictions")
+    
+    __table_args__ = (
+        Index("ix_predictions_user_created", "user_id", "created_at", "id"),
+        Index("ix_predictions_resolved_at", "resolved_at"),
+        # Only rows still waiting for an outcome, in the order the scorer walks them
+        Index(
+            "ix_predictions_unresolved", "ticker", "id",
+            postgresql_where=outcome.is_(None), sqlite_where=outcome.is_(None)
+        ),
+    )
 
 class Alert(Base):
     __tablename__ = "alerts"
@@ -103,7 +120,8 @@ class APIKey(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    key = Column(String, unique=True, index=True, nullable=False)
+    prefix = Column(String, unique=True, index=True, nullable=False)
+    key = Column(String, nullable=False)  # sha256 of the full key, never the key itself
     name = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
     last_used = Column(DateTime, nullable=True)
@@ -152,7 +170,7 @@ class OptionsFlow(Base):
     __tablename__ = "options_flow"
     
     id = Column(Integer, primary_key=True, index=True)
-    ticker = Column(String, index=True, nullable=False)
+    ticker = Column(String, nullable=False)
     strike = Column(Float, nullable=False)
     expiry = Column(DateTime, nullable=False)
     type = Column(String, nullable=False)  # "call" or "put"
@@ -160,4 +178,16 @@ class OptionsFlow(Base):
     open_interest = Column(Integer, nullable=False)
     premium = Column(Float, nullable=False)
     is_unusual = Column(Boolean, default=False)
-    timestamp = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    timestamp = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # Serves /flow/{ticker} pages newest first; also covers lookups by ticker alone
+        Index("ix_options_flow_ticker_timestamp_id", "ticker", "timestamp", "id"),
+        # Unusual prints are a small slice of the table, indexed by time on their own
+        Index(
+            "ix_options_flow_unusual_timestamp", "timestamp",
+            postgresql_where=is_unusual.is_(True), sqlite_where=is_unusual.is_(True)
+        ),
+        # Append-only rows arrive in time order, so a BRIN index stays tiny for time range scans
+        Index("ix_options_flow_timestamp_brin", "timestamp", postgresql_using="brin").ddl_if(dialect="postgresql"),
+    )
\ No newline at end of file
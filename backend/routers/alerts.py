@@ -1,14 +1,21 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
+from datetime import datetime
 
 from ..database import get_db
-from ..models import User, Alert
-from ..routers.auth import get_current_user
+from ..models import Alert
+from ..routers.auth import Principal, get_current_user, get_user_read_db
+from ..config import settings
+from ..services.alerts import alert_engine, compile_condition, evaluate_bars
+from ..services.bar_store import bar_store
 
 router = APIRouter()
 
+bar_store.add_listener(evaluate_bars)
+
 class AlertCreate(BaseModel):
     type: str
     ticker: str
@@ -20,26 +27,76 @@ class AlertResponse(BaseModel):
     ticker: str
     condition: dict
     is_active: bool
+    last_triggered: Optional[datetime] = None
+
+def alert_response(alert: Alert) -> AlertResponse:
+    return AlertResponse(
+        id=alert.id,
+        type=alert.type,
+        ticker=alert.ticker,
+        condition=alert.condition,
+        is_active=alert.is_active,
+        last_triggered=alert.last_triggered
+    )
 
 @router.post("/", response_model=AlertResponse)
-async def create_alert(
+def create_alert(
     alert_data: AlertCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    return {"message": "Alert creation endpoint"}
+    try:
+        condition = compile_condition(alert_data.condition)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+    count = db.query(func.count(Alert.id)).filter(Alert.user_id == current_user.id).scalar()
+    if count >= settings.ALERT_MAX_PER_USER:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.ALERT_MAX_PER_USER} alerts per user"
+        )
+
+    alert = Alert(
+        user_id=current_user.id,
+        type=alert_data.type,
+        ticker=alert_data.ticker.upper(),
+        condition={"field": condition.field, "operator": condition.operator, "value": condition.value}
+    )
+    db.add(alert)
+    db.commit()
+    db.refresh(alert)
+    alert_engine.add(alert.id, current_user.id, alert.ticker, condition)
+    return alert_response(alert)
 
 @router.get("/", response_model=List[AlertResponse])
-async def get_alerts(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+def get_alerts(
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_user_read_db)
 ):
-    return []
+    alerts = db.query(Alert).filter(Alert.user_id == current_user.id).order_by(Alert.id).all()
+    return [alert_response(alert) for alert in alerts]
+
+@router.get("/triggered")
+async def get_triggered_alerts(current_user: Principal = Depends(get_current_user)):
+    """Alerts of the user triggered recently on this worker, newest first"""
+    return alert_engine.recent(current_user.id)
 
 @router.delete("/{alert_id}")
-async def delete_alert(
+def delete_alert(
     alert_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    alert = db.query(Alert).filter(Alert.id == alert_id, Alert.user_id == current_user.id).first()
+    if alert is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Alert not found"
+        )
+    db.delete(alert)
+    db.commit()
+    alert_engine.remove(alert_id)
     return {"message": "Alert deleted"}
\ No newline at end of file
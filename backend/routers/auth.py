@@ -1,23 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi.security import APIKeyHeader, OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import List, Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 
-from ..database import get_db
-from ..models import User
+from ..database import get_db, read_session
+from ..models import APIKey, User
 from ..config import settings
+from ..services.api_keys import api_key_index, generate_key
+from ..services.concurrency import run_io
+from ..services.password_hashing import PasswordHasherBusy, password_hasher
+from ..services.principal_cache import Principal, principal_cache
 
 router = APIRouter()
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 
 # OAuth2
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token", auto_error=False)
+
+# API keys for programmatic clients, sent instead of a bearer token
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
 class UserCreate(BaseModel):
     email: EmailStr
@@ -41,12 +48,48 @@ class UserResponse(BaseModel):
     is_verified: bool
     created_at: datetime
 
+class APIKeyCreate(BaseModel):
+    name: str
+    expires_in_days: Optional[int] = Field(None, ge=1)
+
+class APIKeyResponse(BaseModel):
+    id: int
+    name: str
+    prefix: str
+    is_active: bool
+    last_used: Optional[datetime]
+    created_at: datetime
+    expires_at: Optional[datetime]
+
+class APIKeyCreated(APIKeyResponse):
+    key: str  # shown once, only the hash is stored
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+async def hash_password(password: str) -> str:
+    """Hash on the password hashing process pool; 503 when it is saturated"""
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise_hasher_busy()
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return await password_hasher.verify(plain_password, hashed_password)
+    except PasswordHasherBusy:
+        raise_hasher_busy()
+
+def raise_hasher_busy():
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is temporarily overloaded, please retry",
+        headers={"Retry-After": "1"},
+    )
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -57,12 +100,30 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def get_current_user(
+    token: Optional[str] = Depends(oauth2_scheme),
+    api_key: Optional[str] = Depends(api_key_header),
+    db: Session = Depends(get_db)
+):
+    principal = authenticate(token, api_key, db)
+    # Commits on this request's session count as this user's writes (read-your-writes routing)
+    db.info["user_id"] = principal.id
+    return principal
+
+def authenticate(token: Optional[str], api_key: Optional[str], db: Session) -> Principal:
+    """Principal for a bearer token or API key (the key wins if both are given)"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    if api_key:
+        return get_api_key_user(api_key, db, credentials_exception)
+    if token is None:
+        raise credentials_exception
+    return get_token_user(token, db, credentials_exception)
+
+def get_token_user(token: str, db: Session, credentials_exception: HTTPException) -> Principal:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         username: str = payload.get("sub")
@@ -70,14 +131,58 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
+    principal = principal_cache.get(username)
+    if principal is None:
+        user = db.query(User).filter(User.username == username).first()
+        if user is None:
+            raise credentials_exception
+        principal = Principal.from_user(user)
+        principal_cache.put(username, principal)
+    return check_active(principal)
+
+def get_api_key_user(api_key: str, db: Session, credentials_exception: HTTPException) -> Principal:
+    record = api_key_index.authenticate(db, api_key)
+    if record is None:
         raise credentials_exception
+    principal = principal_cache.get(record.username)
+    if principal is None:
+        user = db.get(User, record.user_id)
+        if user is None:
+            raise credentials_exception
+        principal = Principal.from_user(user)
+        principal_cache.put(user.username, principal)
+    return check_active(principal)
+
+def check_active(principal: Principal) -> Principal:
+    if not principal.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Inactive user"
+        )
+    return principal
+
+def get_user_read_db(current_user: Principal = Depends(get_current_user)):
+    """Read-only session for the current user: a replica unless they wrote recently"""
+    db = read_session(current_user.id)
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_current_user_model(
+    current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)
+) -> User:
+    """Full User row for handlers that need more than the cached principal"""
+    user = current_user.load(db)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
-@router.post("/register", response_model=UserResponse)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
-    # Check if user exists
+def check_user_available(db: Session, user_data: UserCreate):
     if db.query(User).filter(User.email == user_data.email).first():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -88,17 +193,26 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already taken"
         )
+
+def save_user(db: Session, db_user: User) -> User:
+    db.add(db_user)
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+@router.post("/register", response_model=UserResponse)
+async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+    # Check if user exists
+    await run_io(check_user_available, db, user_data)
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await hash_password(user_data.password)
     db_user = User(
         email=user_data.email,
         username=user_data.username,
         hashed_password=hashed_password
     )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await run_io(save_user, db, db_user)
     
     return UserResponse(
         id=db_user.id,
@@ -111,8 +225,8 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
 
 @router.post("/token", response_model=Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await run_io(lambda: db.query(User).filter(User.username == form_data.username).first())
+    if not user or not await check_password(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -134,7 +248,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     )
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user: User = Depends(get_current_user_model)):
     return UserResponse(
         id=current_user.id,
         email=current_user.email,
@@ -145,6 +259,62 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
     )
 
 @router.post("/logout")
-async def logout(current_user: User = Depends(get_current_user)):
+async def logout(current_user: Principal = Depends(get_current_user)):
     # In a real app, you might want to blacklist the token
-    return {"message": "Successfully logged out"}
\ No newline at end of file
+    return {"message": "Successfully logged out"}
+
+def api_key_response(api_key: APIKey) -> dict:
+    return {
+        "id": api_key.id,
+        "name": api_key.name,
+        "prefix": api_key.prefix,
+        "is_active": api_key.is_active,
+        "last_used": api_key.last_used,
+        "created_at": api_key.created_at,
+        "expires_at": api_key.expires_at
+    }
+
+@router.post("/api-keys", response_model=APIKeyCreated)
+def create_api_key(
+    key_data: APIKeyCreate,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    key, prefix, key_hash = generate_key()
+    expires_at = None
+    if key_data.expires_in_days is not None:
+        expires_at = datetime.utcnow() + timedelta(days=key_data.expires_in_days)
+    api_key = APIKey(
+        user_id=current_user.id,
+        prefix=prefix,
+        key=key_hash,
+        name=key_data.name,
+        expires_at=expires_at
+    )
+    db.add(api_key)
+    db.commit()
+    db.refresh(api_key)
+    return APIKeyCreated(key=key, **api_key_response(api_key))
+
+@router.get("/api-keys", response_model=List[APIKeyResponse])
+def list_api_keys(current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    api_keys = db.query(APIKey).filter(APIKey.user_id == current_user.id).order_by(APIKey.created_at.desc()).all()
+    return [api_key_response(api_key) for api_key in api_keys]
+
+@router.delete("/api-keys/{key_id}")
+def revoke_api_key(
+    key_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    api_key = db.query(APIKey).filter(APIKey.id == key_id, APIKey.user_id == current_user.id).first()
+    if not api_key:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="API key not found"
+        )
+    api_key.is_active = False
+    db.commit()
+    # Immediate in this worker; other workers drop it on their next index refresh
+    api_key_index.invalidate(api_key.prefix)
+    return {"message": "API key revoked"}
\ No newline at end of file
@@ -1,19 +1,41 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from datetime import datetime, timedelta
+from typing import List, Optional
+import json
 
 from ..database import get_db
-from ..models import User
-from ..routers.auth import get_current_user
+from ..models import Backtest
+from ..routers.auth import Principal, get_current_user
+from ..config import settings
+from ..services.backtest import HOLDING_BARS, equity_curve_points, prepare, simulate
+from ..services.sweeps import SweepJob, sweep_manager
 
 router = APIRouter()
 
 class BacktestRequest(BaseModel):
     start_date: str
     end_date: str
-    initial_capital: float
-    confidence_threshold: float
+    initial_capital: float = Field(..., gt=0)
+    confidence_threshold: float = Field(..., ge=0, le=1)
+    name: Optional[str] = None
+    source: str = "predictions"  # "predictions" (your stored predictions) or "signals" (regenerated)
+    tickers: Optional[List[str]] = None  # required for "signals", optional filter for "predictions"
+    timeframe: str = "1d"  # 1d, 1w, 1m
+    holding_period: Optional[int] = Field(None, ge=1, le=252)  # bars; defaults to the timeframe
+
+class SweepRequest(BaseModel):
+    start_date: str
+    end_date: str
+    initial_capital: float = Field(..., gt=0)
+    confidence_thresholds: List[float] = Field(..., min_length=1)
+    holding_periods: List[int] = Field(..., min_length=1)
+    name: Optional[str] = None
+    source: str = "predictions"
+    tickers: Optional[List[str]] = None
+    timeframe: str = "1d"
 
 class BacktestResult(BaseModel):
     total_return: float
@@ -21,18 +43,141 @@ class BacktestResult(BaseModel):
     sharpe_ratio: float
     max_drawdown: float
     total_trades: int
+    id: Optional[int] = None
+    final_capital: Optional[float] = None
+
+def parse_period(start_date: str, end_date: str):
+    try:
+        start = datetime.fromisoformat(start_date)
+        # Whole end day is included
+        end = datetime.fromisoformat(end_date) + timedelta(days=1) - timedelta(seconds=1)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_date and end_date must be ISO dates (YYYY-MM-DD)"
+        )
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_date must be before end_date"
+        )
+    return start, end
+
+def validate_backtest_request(request: BacktestRequest):
+    if request.source not in ("predictions", "signals"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="source must be 'predictions' or 'signals'"
+        )
+    if request.timeframe not in HOLDING_BARS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"timeframe must be one of {', '.join(HOLDING_BARS)}"
+        )
+    return parse_period(request.start_date, request.end_date)
 
 @router.post("/run", response_model=BacktestResult)
-async def run_backtest(
+def run_backtest(
     request: BacktestRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Mock backtest results
-    return BacktestResult(
-        total_return=23.5,
-        win_rate=0.624,
-        sharpe_ratio=1.87,
-        max_drawdown=-8.3,
-        total_trades=156
-    )
\ No newline at end of file
+    start, end = validate_backtest_request(request)
+    try:
+        history, signals = prepare(
+            db, current_user.id, start, end, request.source, request.tickers, request.timeframe
+        )
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+
+    holding_bars = request.holding_period or HOLDING_BARS[request.timeframe]
+    stats, equity = simulate(
+        history.close, signals, request.confidence_threshold, holding_bars, request.initial_capital
+    )
+
+    backtest = Backtest(
+        user_id=current_user.id,
+        name=request.name or f"Backtest {request.start_date} to {request.end_date}",
+        parameters={**request.model_dump(), "holding_period": holding_bars, "tickers": history.tickers},
+        results={**stats, "equity_curve": equity_curve_points(history.ts, equity)}
+    )
+    db.add(backtest)
+    db.commit()
+    db.refresh(backtest)
+    return BacktestResult(id=backtest.id, **stats)
+
+def get_sweep_job(job_id: str, user: Principal) -> SweepJob:
+    job = sweep_manager.get(job_id, user.id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sweep job not found"
+        )
+    return job
+
+@router.post("/sweeps", status_code=status.HTTP_202_ACCEPTED)
+async def submit_sweep(request: SweepRequest, current_user: Principal = Depends(get_current_user)):
+    """Start a grid of backtests in the background; poll or stream the returned job"""
+    start, end = validate_backtest_request(request)
+    thresholds = sorted(set(request.confidence_thresholds))
+    holding_periods = sorted(set(request.holding_periods))
+    if any(not 0 <= threshold <= 1 for threshold in thresholds) or any(not 1 <= h <= 252 for h in holding_periods):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="confidence_thresholds must be in [0, 1] and holding_periods in [1, 252]"
+        )
+    cells = [(threshold, holding) for threshold in thresholds for holding in holding_periods]
+    if len(cells) > settings.BACKTEST_SWEEP_MAX_CELLS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.BACKTEST_SWEEP_MAX_CELLS} cells per sweep"
+        )
+    if sweep_manager.active_jobs(current_user.id) >= sweep_manager.max_active_per_user:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many sweeps running, wait for one to finish"
+        )
+
+    job = sweep_manager.submit(current_user.id, {
+        "name": request.name or f"Sweep {request.start_date} to {request.end_date}",
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "start_date": request.start_date,
+        "end_date": request.end_date,
+        "initial_capital": request.initial_capital,
+        "source": request.source,
+        "tickers": request.tickers,
+        "timeframe": request.timeframe
+    }, cells)
+    return {"job_id": job.id, "status": job.status, "total_cells": len(cells)}
+
+@router.get("/sweeps/{job_id}")
+async def get_sweep(job_id: str, current_user: Principal = Depends(get_current_user)):
+    return get_sweep_job(job_id, current_user).summary()
+
+@router.get("/sweeps/{job_id}/stream")
+async def stream_sweep(job_id: str, current_user: Principal = Depends(get_current_user)):
+    """Cell results as NDJSON, already finished ones first, then each as it completes"""
+    job = get_sweep_job(job_id, current_user)
+
+    async def results():
+        sent = 0
+        while True:
+            while sent < len(job.results):
+                yield json.dumps(job.results[sent]) + "\n"
+                sent += 1
+            if job.finished:
+                yield json.dumps({"status": job.status, "error": job.error}) + "\n"
+                return
+            await job.wait_for_change()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@router.delete("/sweeps/{job_id}")
+async def cancel_sweep(job_id: str, current_user: Principal = Depends(get_current_user)):
+    job = get_sweep_job(job_id, current_user)
+    sweep_manager.cancel(job)
+    return {"job_id": job.id, "status": "cancelling" if not job.finished else job.status}
\ No newline at end of file
@@ -4,8 +4,7 @@ from typing import List
 from pydantic import BaseModel
 
 from ..database import get_db
-from ..models import User
-from ..routers.auth import get_current_user
+from ..routers.auth import Principal, get_current_user
 
 router = APIRouter()
 
@@ -35,7 +34,7 @@ async def get_upcoming_earnings(
 @router.get("/predict/{ticker}")
 async def predict_earnings(
     ticker: str,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     return {
@@ -4,8 +4,7 @@ from typing import List
 from pydantic import BaseModel
 
 from ..database import get_db
-from ..models import User
-from ..routers.auth import get_current_user
+from ..routers.auth import Principal, get_current_user
 
 router = APIRouter()
 
@@ -47,7 +46,7 @@ async def get_courses():
 
 @router.get("/achievements", response_model=List[Achievement])
 async def get_achievements(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     return [
@@ -1,51 +1,119 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select, tuple_
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
+from datetime import datetime, timedelta
 
-from ..database import get_db
-from ..models import User
-from ..routers.auth import get_current_user
+from ..database import get_read_db
+from ..models import OptionsFlow
+from ..routers.pagination import decode_cursor, encode_cursor
+from ..services.options_flow import flow_entry
+from ..services.bar_store import bar_store
+from ..services.options_pricing import chain_cache, get_chain
 
 router = APIRouter()
 
+bar_store.add_listener(chain_cache.invalidate_ticker)
+
+FLOW_COLUMNS = (
+    OptionsFlow.id, OptionsFlow.ticker, OptionsFlow.strike, OptionsFlow.expiry, OptionsFlow.type, OptionsFlow.volume,
+    OptionsFlow.open_interest, OptionsFlow.premium, OptionsFlow.is_unusual, OptionsFlow.timestamp
+)
+
 class OptionsFlowEntry(BaseModel):
     ticker: str
     strike: float
     expiry: str
     type: str
     volume: int
+    open_interest: int
     premium: float
     is_unusual: bool
+    timestamp: datetime
+    iv: Optional[float] = None
+    delta: Optional[float] = None
+    gamma: Optional[float] = None
+    vega: Optional[float] = None
+    theta: Optional[float] = None
+
+GREEKS = ("iv", "delta", "gamma", "vega", "theta")
+
+def activity(row) -> str:
+    return (
+        f"{row['type'].capitalize()} volume {row['volume']:,} vs {row['open_interest']:,} open interest, "
+        f"${row['premium']:,.0f} premium"
+    )
 
 @router.get("/flow/{ticker}", response_model=List[OptionsFlowEntry])
-async def get_options_flow(
+def get_options_flow(
     ticker: str,
-    db: Session = Depends(get_db)
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    greeks: bool = False,
+    db: Session = Depends(get_read_db)
 ):
-    # Mock options flow data
-    return [
-        OptionsFlowEntry(
-            ticker=ticker,
-            strike=150.0,
-            expiry="2024-01-19",
-            type="call",
-            volume=5000,
-            premium=250000,
-            is_unusual=True
+    """Newest prints first; pass the X-Next-Cursor response header as cursor to get the next page.
+
+    With greeks, each print carries the IV and Greeks of its contract from the priced chain.
+    """
+    query = select(*FLOW_COLUMNS).where(OptionsFlow.ticker == ticker.upper())
+    if cursor:
+        # Keyset on (timestamp, id) so prints sharing a timestamp are never skipped at a page
+        # boundary; served by ix_options_flow_ticker_timestamp_id at any table size
+        query = query.where(tuple_(OptionsFlow.timestamp, OptionsFlow.id) < decode_cursor(cursor))
+    rows = db.execute(
+        query.order_by(OptionsFlow.timestamp.desc(), OptionsFlow.id.desc()).limit(limit + 1)
+    ).mappings().all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+    entries = [flow_entry(row, row["is_unusual"]) for row in rows]
+    chain = get_chain(ticker, db) if greeks and rows else None
+    if chain is not None:
+        contracts = chain.lookup()
+        for row, entry in zip(rows, entries):
+            contract = contracts.get((row["strike"], row["expiry"], row["type"]))
+            if contract is not None:
+                entry.update((name, contract[name]) for name in GREEKS)
+    return entries
+
+@router.get("/chain/{ticker}")
+def get_option_chain(ticker: str, db: Session = Depends(get_read_db)):
+    """Recently traded contracts of ticker with implied volatility and Greeks at the latest close"""
+    chain = get_chain(ticker, db)
+    if chain is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No price available for ticker {ticker.upper()}"
         )
-    ]
+    return {
+        "ticker": chain.ticker,
+        "spot": chain.spot,
+        "as_of": chain.as_of,
+        "contracts": [
+            {**contract, "expiry": contract["expiry"].date().isoformat()} for contract in chain.contracts
+        ]
+    }
 
 @router.get("/unusual")
-async def get_unusual_options(
-    db: Session = Depends(get_db)
+def get_unusual_options(
+    since_minutes: int = Query(60, ge=1, le=7 * 24 * 60),
+    ticker: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_read_db)
 ):
+    # Matches the partial ix_options_flow_unusual_timestamp index
+    query = select(*FLOW_COLUMNS).where(
+        OptionsFlow.is_unusual.is_(True),
+        OptionsFlow.timestamp >= datetime.utcnow() - timedelta(minutes=since_minutes)
+    )
+    if ticker:
+        query = query.where(OptionsFlow.ticker == ticker.upper())
+    rows = db.execute(query.order_by(OptionsFlow.timestamp.desc()).limit(limit)).mappings().all()
     return {
         "unusual_options": [
-            {
-                "ticker": "NVDA",
-                "activity": "Large call sweep",
-                "details": "$2M in 450C expiring next week"
-            }
+            {**flow_entry(row, True), "activity": activity(row)} for row in rows
         ]
     }
\ No newline at end of file
@@ -0,0 +1,20 @@
+import base64
+from datetime import datetime
+
+from fastapi import HTTPException, status
+
+def encode_cursor(moment: datetime, row_id: int) -> str:
+    """Opaque keyset cursor for listings ordered by (timestamp, id) descending"""
+    raw = f"{moment.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        moment, row_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(moment), int(row_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
\ No newline at end of file
@@ -4,8 +4,8 @@ from typing import List
 from pydantic import BaseModel
 
 from ..database import get_db
-from ..models import User, Portfolio, Holding
-from ..routers.auth import get_current_user
+from ..models import Portfolio, Holding
+from ..routers.auth import Principal, get_current_user, get_user_read_db
 
 router = APIRouter()
 
@@ -23,16 +23,16 @@ class PortfolioResponse(BaseModel):
 @router.post("/connect")
 async def connect_portfolio(
     portfolio_data: PortfolioConnect,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     # This would integrate with broker APIs
     return {"message": "Portfolio connection endpoint - implement broker integration"}
 
 @router.get("/", response_model=List[PortfolioResponse])
-async def get_portfolios(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+def get_portfolios(
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_user_read_db)
 ):
     portfolios = db.query(Portfolio).filter(Portfolio.user_id == current_user.id).all()
     return []
@@ -40,7 +40,7 @@ async def get_portfolios(
 @router.post("/sync/{portfolio_id}")
 async def sync_portfolio(
     portfolio_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     return {"message": "Portfolio sync endpoint - implement broker sync"}
\ No newline at end of file
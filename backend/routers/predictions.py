@@ -1,19 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import insert, select, tuple_
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-from typing import List, Optional
+from datetime import datetime
+from typing import Dict, List, Optional
 from pydantic import BaseModel
-import yfinance as yf
-import numpy as np
 from random import random
+import asyncio
+import csv
+import io
+import json
 
-from ..database import get_db
-from ..models import User, Prediction, PredictionDirection
-from ..routers.auth import get_current_user
+from ..database import get_db, read_session
+from ..models import Prediction, PredictionDirection
+from ..routers.auth import Principal, get_current_user, get_user_read_db
+from ..routers.pagination import decode_cursor, encode_cursor
 from ..config import settings
+from ..services.alerts import PREDICTION_TIMEFRAME, alert_engine, prediction_updates
+from ..services.bar_store import bar_store
+from ..services.coalescer import RequestCoalescer
+from ..services.consensus import crowd_consensus
+from ..services.concurrency import run_io
+from ..services.indicators import features_for_bars
+from ..services.model_server import ModelServer
+from ..services.prediction_cache import PredictionCache
+from ..services.user_stats import user_stats
+from ..services.rate_limit import RateLimiter, RateLimitResult, create_backend
+from ..services.stream import stream_broker
 
 router = APIRouter()
 
+EXPORT_CHUNK_SIZE = 1000
+
+prediction_coalescer = RequestCoalescer("predictions.compute")
+prediction_cache = PredictionCache(
+    max_entries=settings.PREDICTION_CACHE_MAX_ENTRIES,
+    ttl=settings.PREDICTION_CACHE_TTL_SECONDS
+)
+bar_store.add_listener(prediction_cache.invalidate_ticker)
+prediction_rate_limiter = RateLimiter(
+    "predictions",
+    create_backend(settings.RATE_LIMIT_BACKEND),
+    window=settings.RATE_LIMIT_WINDOW_SECONDS
+)
+
 class PredictionRequest(BaseModel):
     ticker: str
     timeframe: str = "1d"  # 1d, 1w, 1m
@@ -40,48 +70,20 @@ class HistoricalPrediction(BaseModel):
     target_price: Optional[float]
     stop_loss: Optional[float]
 
+class BatchPredictionRequest(BaseModel):
+    tickers: List[str]
+    timeframes: List[str] = ["1d"]
+
+class BatchPredictionResponse(BaseModel):
+    predictions: List[PredictionResponse]
+    unavailable: List[str]
+
 def calculate_technical_indicators(ticker: str):
     """Calculate technical indicators for prediction"""
-    try:
-        stock = yf.Ticker(ticker)
-        hist = stock.history(period="3mo")
-        
-        if hist.empty:
-            return None
-            
-        # Calculate indicators
-        close_prices = hist['Close'].values
-        volumes = hist['Volume'].values
-        
-        # RSI
-        price_diff = np.diff(close_prices)
-        gains = price_diff[price_diff > 0].sum()
-        losses = -price_diff[price_diff < 0].sum()
-        rs = gains / losses if losses > 0 else 1
-        rsi = 100 - (100 / (1 + rs))
-        
-        # Moving averages
-        ma_20 = np.mean(close_prices[-20:]) if len(close_prices) >= 20 else np.mean(close_prices)
-        ma_50 = np.mean(close_prices[-50:]) if len(close_prices) >= 50 else np.mean(close_prices)
-        
-        # Volume ratio
-        avg_volume = np.mean(volumes)
-        volume_ratio = volumes[-1] / avg_volume if avg_volume > 0 else 1
-        
-        # Price position
-        price_position = (close_prices[-1] - min(close_prices)) / (max(close_prices) - min(close_prices))
-        
-        return {
-            "rsi": round(rsi, 2),
-            "ma_20": round(ma_20, 2),
-            "ma_50": round(ma_50, 2),
-            "volume_ratio": round(volume_ratio, 2),
-            "price_position": round(price_position, 2),
-            "current_price": round(close_prices[-1], 2),
-            "volatility": round(np.std(price_diff) if len(price_diff) > 0 else 0, 4)
-        }
-    except:
+    bars = bar_store.get_bars(ticker)
+    if bars is None:
         return None
+    return features_for_bars({ticker: bars}).get(ticker)
 
 def generate_prediction(ticker: str, timeframe: str, features: dict):
     """Generate AI prediction (simulated for demo)"""
@@ -117,6 +119,10 @@ def generate_prediction(ticker: str, timeframe: str, features: dict):
     # Ensure probability is between 0 and 1
     probability = max(0.1, min(0.9, base_probability))
     
+    return prediction_from_probability(probability, features)
+
+def prediction_from_probability(probability: float, features: dict):
+    """Direction, confidence, target and stop loss for an up-move probability"""
     # Determine direction
     direction = PredictionDirection.UP if probability > 0.5 else PredictionDirection.DOWN
     
@@ -142,43 +148,132 @@ def generate_prediction(ticker: str, timeframe: str, features: dict):
         "stop_loss": round(stop_loss, 2)
     }
 
+model_server = ModelServer(
+    model_path=settings.MODEL_PATH,
+    model_version=settings.MODEL_VERSION,
+    fallback=generate_prediction,
+    finalize=prediction_from_probability,
+    max_batch_size=settings.MODEL_MAX_BATCH_SIZE,
+    max_wait_ms=settings.MODEL_MAX_WAIT_MS
+)
+
+def lookup_cached_predictions(tickers: List[str], timeframes: List[str], model_version: str):
+    """Bars for tickers, cached (features, prediction) pairs, and the timeframes that missed per ticker"""
+    bars_by_ticker = bar_store.get_many(tickers)
+    results = {}
+    misses = {}
+    for ticker, bars in bars_by_ticker.items():
+        bar_ts = int(bars['ts'][-1])
+        for timeframe in timeframes:
+            cached = prediction_cache.get(ticker, timeframe, bar_ts, model_version)
+            if cached is None:
+                misses.setdefault(ticker, []).append(timeframe)
+            else:
+                results.setdefault(ticker, {})[timeframe] = cached
+    return bars_by_ticker, results, misses
+
+async def predict_tickers(tickers: List[str], timeframes: List[str]) -> Dict[str, Dict[str, tuple]]:
+    """(features, prediction) per ticker and timeframe, recomputed only when the last bar changed"""
+    await model_server.ensure_loaded()
+    model_version = model_server.version
+    bars_by_ticker, results, misses = await run_io(lookup_cached_predictions, tickers, timeframes, model_version)
+    if not misses:
+        return results
+    
+    features_by_ticker = await run_io(
+        features_for_bars, {ticker: bars_by_ticker[ticker] for ticker in misses}
+    )
+    jobs = [
+        (ticker, timeframe, features_by_ticker[ticker])
+        for ticker, ticker_timeframes in misses.items() if features_by_ticker.get(ticker)
+        for timeframe in ticker_timeframes
+    ]
+    # Submitted together so the model server can run them as micro-batches
+    predictions = await asyncio.gather(
+        *(model_server.predict(ticker, timeframe, features) for ticker, timeframe, features in jobs)
+    )
+    alert_updates = []
+    for (ticker, timeframe, features), prediction_data in zip(jobs, predictions):
+        value = (features, prediction_data)
+        bar_ts = int(bars_by_ticker[ticker]['ts'][-1])
+        prediction_cache.put(ticker, timeframe, bar_ts, model_version, value)
+        results.setdefault(ticker, {})[timeframe] = value
+        if timeframe == PREDICTION_TIMEFRAME:
+            alert_updates.extend(prediction_updates(ticker, prediction_data))
+        stream_broker.publish(ticker, "prediction", {
+            "timeframe": timeframe,
+            "bar_ts": bar_ts,
+            **prediction_data,
+            "direction": prediction_data["direction"].value
+        })
+    if alert_updates:
+        # Only fresh predictions can move a value; cached ones were evaluated when computed
+        alert_engine.evaluate(alert_updates)
+    return results
+
+async def compute_prediction(ticker: str, timeframe: str):
+    """Features and prediction for (ticker, timeframe), shared by concurrent requests"""
+    async def compute():
+        results = await predict_tickers([ticker], [timeframe])
+        return results.get(ticker, {}).get(timeframe, (None, None))
+
+    return await prediction_coalescer.run((ticker, timeframe), compute)
+
+async def rate_limit(method: str, user: Principal, cost: int = 1) -> RateLimitResult:
+    call = getattr(prediction_rate_limiter, method)
+    tier = user.subscription_tier.value
+    if prediction_rate_limiter.backend.blocking:
+        return await run_io(call, user.id, tier, cost)
+    return call(user.id, tier, cost)
+
+async def check_rate_limit(user: Principal, response: Response, cost: int = 1) -> RateLimitResult:
+    """Consume cost predictions from the user's daily quota or raise 429"""
+    result = await rate_limit("hit", user, cost)
+    if not result.allowed:
+        tier = user.subscription_tier.value
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Daily prediction limit reached ({result.used}/{result.limit} used for {tier} tier, {cost} requested)",
+            headers=result.headers()
+        )
+    response.headers.update(result.headers())
+    return result
+
+def save_predictions(db: Session, rows: List[dict]):
+    # Single executemany INSERT instead of one ORM add/refresh per row
+    db.execute(insert(Prediction), rows)
+    db.commit()
+
+def save_prediction(db: Session, db_prediction: Prediction) -> Prediction:
+    db.add(db_prediction)
+    db.commit()
+    db.refresh(db_prediction)
+    return db_prediction
+
 @router.post("/predict", response_model=PredictionResponse)
 async def create_prediction(
     request: PredictionRequest,
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     # Check rate limits
-    today_predictions = db.query(Prediction).filter(
-        Prediction.user_id == current_user.id,
-        Prediction.created_at >= datetime.utcnow() - timedelta(days=1)
-    ).count()
-    
-    rate_limits = {
-        "free": settings.RATE_LIMIT_FREE,
-        "pro": settings.RATE_LIMIT_PRO,
-        "elite": settings.RATE_LIMIT_ELITE
-    }
-    
-    user_limit = rate_limits.get(current_user.subscription_tier.value, 50)
-    
-    if today_predictions >= user_limit:
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail=f"Daily prediction limit reached ({user_limit}/day for {current_user.subscription_tier.value} tier)"
-        )
+    await check_rate_limit(current_user, response)
     
-    # Calculate technical indicators
-    features = calculate_technical_indicators(request.ticker)
+    # Calculate technical indicators and generate prediction
+    try:
+        features, prediction_data = await compute_prediction(request.ticker.upper(), request.timeframe)
+    except Exception:
+        # A provider or model failure is not the user's fault; give the unit back
+        await rate_limit("refund", current_user)
+        raise
     if not features:
+        await rate_limit("refund", current_user)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Unable to fetch data for ticker {request.ticker}"
         )
     
-    # Generate prediction
-    prediction_data = generate_prediction(request.ticker, request.timeframe, features)
-    
     # Save to database
     db_prediction = Prediction(
         user_id=current_user.id,
@@ -192,9 +287,11 @@ async def create_prediction(
         stop_loss=prediction_data["stop_loss"]
     )
     
-    db.add(db_prediction)
-    db.commit()
-    db.refresh(db_prediction)
+    await run_io(save_prediction, db, db_prediction)
+    user_stats.record(current_user.id, db_prediction.ticker, db_prediction.created_at)
+    crowd_consensus.record(
+        db_prediction.ticker, db_prediction.created_at, db_prediction.direction, db_prediction.confidence
+    )
     
     return PredictionResponse(
         ticker=db_prediction.ticker,
@@ -208,71 +305,184 @@ async def create_prediction(
         created_at=db_prediction.created_at
     )
 
-@router.get("/history", response_model=List[HistoricalPrediction])
-async def get_prediction_history(
-    skip: int = 0,
-    limit: int = 50,
-    ticker: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
+@router.post("/batch", response_model=BatchPredictionResponse)
+async def create_batch_predictions(
+    request: BatchPredictionRequest,
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    query = db.query(Prediction).filter(Prediction.user_id == current_user.id)
+    tickers = list(dict.fromkeys(t.upper() for t in request.tickers))
+    timeframes = list(dict.fromkeys(request.timeframes))
+    if not tickers or not timeframes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one ticker and one timeframe are required"
+        )
+    if len(tickers) > settings.BATCH_PREDICTION_MAX_TICKERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.BATCH_PREDICTION_MAX_TICKERS} tickers per batch"
+        )
+    
+    # One rate limit check for the whole batch
+    requested = len(tickers) * len(timeframes)
+    await check_rate_limit(current_user, response, cost=requested)
+    
+    try:
+        results = await predict_tickers(tickers, timeframes)
+    except Exception:
+        await rate_limit("refund", current_user, requested)
+        raise
     
+    created_at = datetime.utcnow()
+    rows = []
+    for ticker in tickers:
+        for timeframe, (features, prediction_data) in results.get(ticker, {}).items():
+            rows.append({
+                "user_id": current_user.id,
+                "ticker": ticker,
+                "timeframe": timeframe,
+                "features": features,
+                "created_at": created_at,
+                **prediction_data
+            })
+    
+    if rows:
+        await run_io(save_predictions, db, rows)
+        for row in rows:
+            user_stats.record(current_user.id, row["ticker"], row["created_at"])
+            crowd_consensus.record(row["ticker"], row["created_at"], row["direction"], row["confidence"])
+    if len(rows) < requested:
+        result = await rate_limit("refund", current_user, requested - len(rows))
+        response.headers.update(result.headers())
+    
+    return BatchPredictionResponse(
+        predictions=[
+            PredictionResponse(
+                ticker=row["ticker"],
+                direction=row["direction"].value,
+                probability=row["probability"],
+                confidence=row["confidence"],
+                timeframe=row["timeframe"],
+                features=row["features"],
+                target_price=row["target_price"],
+                stop_loss=row["stop_loss"],
+                created_at=row["created_at"]
+            )
+            for row in rows
+        ],
+        unavailable=[t for t in tickers if t not in results]
+    )
+
+HISTORY_COLUMNS = (
+    Prediction.id,
+    Prediction.ticker,
+    Prediction.direction,
+    Prediction.probability,
+    Prediction.confidence,
+    Prediction.timeframe,
+    Prediction.created_at,
+    Prediction.target_price,
+    Prediction.stop_loss
+)
+
+def history_query(user_id: int, ticker: Optional[str]):
+    query = select(*HISTORY_COLUMNS).where(Prediction.user_id == user_id)
     if ticker:
-        query = query.filter(Prediction.ticker == ticker.upper())
+        query = query.where(Prediction.ticker == ticker.upper())
+    return query.order_by(Prediction.created_at.desc(), Prediction.id.desc())
+
+def history_row(row) -> dict:
+    return {
+        "id": row.id,
+        "ticker": row.ticker,
+        "direction": row.direction.value,
+        "probability": row.probability,
+        "confidence": row.confidence,
+        "timeframe": row.timeframe,
+        "created_at": row.created_at.isoformat(),
+        "target_price": row.target_price,
+        "stop_loss": row.stop_loss
+    }
+
+@router.get("/history", response_model=List[HistoricalPrediction])
+def get_prediction_history(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    ticker: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_user_read_db)
+):
+    """Newest first; pass the X-Next-Cursor response header as cursor to get the next page"""
+    query = history_query(current_user.id, ticker)
+    if cursor:
+        # Keyset pagination on (created_at, id), served by ix_predictions_user_created
+        query = query.where(tuple_(Prediction.created_at, Prediction.id) < decode_cursor(cursor))
     
-    predictions = query.order_by(Prediction.created_at.desc()).offset(skip).limit(limit).all()
+    rows = db.execute(query.limit(limit + 1)).all()
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(rows[-1].created_at, rows[-1].id)
     
-    return [
-        HistoricalPrediction(
-            id=p.id,
-            ticker=p.ticker,
-            direction=p.direction.value,
-            probability=p.probability,
-            confidence=p.confidence,
-            timeframe=p.timeframe,
-            created_at=p.created_at,
-            target_price=p.target_price,
-            stop_loss=p.stop_loss
+    # Plain dicts straight to JSON instead of a Pydantic model per row
+    return JSONResponse([history_row(row) for row in rows], headers=headers)
+
+def stream_history(user_id: int, ticker: Optional[str], export_format: str):
+    db = read_session(user_id)
+    try:
+        # yield_per uses a server-side cursor where the driver supports it, so memory stays flat
+        result = db.execute(
+            history_query(user_id, ticker).execution_options(yield_per=EXPORT_CHUNK_SIZE)
         )
-        for p in predictions
-    ]
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow([column.key for column in HISTORY_COLUMNS])
+            for partition in result.partitions():
+                for row in partition:
+                    writer.writerow(history_row(row).values())
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+        else:
+            for partition in result.partitions():
+                yield "".join(json.dumps(history_row(row)) + "\n" for row in partition)
+    finally:
+        db.close()
+
+@router.get("/history/export")
+def export_prediction_history(
+    format: str = "ndjson",
+    ticker: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user)
+):
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format must be 'ndjson' or 'csv'"
+        )
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_history(current_user.id, ticker, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="predictions.{format}"'}
+    )
 
 @router.get("/stats")
-async def get_prediction_stats(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+def get_prediction_stats(
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_user_read_db)
 ):
-    # Get user's prediction statistics
-    total_predictions = db.query(Prediction).filter(
-        Prediction.user_id == current_user.id
-    ).count()
-    
-    today_predictions = db.query(Prediction).filter(
-        Prediction.user_id == current_user.id,
-        Prediction.created_at >= datetime.utcnow() - timedelta(days=1)
-    ).count()
-    
-    # Get most predicted tickers
-    from sqlalchemy import func
-    top_tickers = db.query(
-        Prediction.ticker,
-        func.count(Prediction.id).label('count')
-    ).filter(
-        Prediction.user_id == current_user.id
-    ).group_by(
-        Prediction.ticker
-    ).order_by(
-        func.count(Prediction.id).desc()
-    ).limit(5).all()
+    # Get user's prediction statistics, maintained incrementally on every write
+    stats = user_stats.get(db, current_user.id)
+    usage = prediction_rate_limiter.peek(current_user.id, current_user.subscription_tier.value)
     
     return {
-        "total_predictions": total_predictions,
-        "predictions_today": today_predictions,
-        "daily_limit": {
-            "free": settings.RATE_LIMIT_FREE,
-            "pro": settings.RATE_LIMIT_PRO,
-            "elite": settings.RATE_LIMIT_ELITE
-        }[current_user.subscription_tier.value],
-        "top_tickers": [{"ticker": t[0], "count": t[1]} for t in top_tickers]
+        "total_predictions": stats["total_predictions"],
+        "predictions_today": stats["predictions_today"],
+        "daily_limit": usage.limit,
+        "top_tickers": stats["top_tickers"]
     }
\ No newline at end of file
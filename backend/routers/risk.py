@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
+from typing import List
 from pydantic import BaseModel
 
 from ..database import get_db
-from ..models import User
-from ..routers.auth import get_current_user
+from ..routers.auth import Principal, get_current_user
 
 router = APIRouter()
 
@@ -17,7 +17,7 @@ class RiskAnalysis(BaseModel):
 @router.post("/analyze", response_model=RiskAnalysis)
 async def analyze_risk(
     positions: List[dict],
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     # Mock risk analysis
@@ -32,7 +32,7 @@ async def analyze_risk(
 async def calculate_kelly(
     ticker: str,
     win_probability: float,
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     kelly_percentage = (win_probability - (1 - win_probability)) / 1
     return {
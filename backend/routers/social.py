@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 
-from ..database import get_db
+from ..database import get_read_db
 from ..models import User
-from ..routers.auth import get_current_user
+from ..routers.auth import Principal, get_current_user
+from ..services.consensus import WINDOWS as CONSENSUS_WINDOWS, crowd_consensus
+from ..services.leaderboard import TIMEFRAMES, Standing, leaderboard
 
 router = APIRouter()
 
@@ -15,27 +17,68 @@ class LeaderboardEntry(BaseModel):
     total_predictions: int
     rank: int
 
+class LeaderboardStanding(BaseModel):
+    timeframe: str
+    rank: Optional[int]
+    accuracy: Optional[float]
+    hits: int
+    total_predictions: int
+    ranked_users: int
+
+def check_timeframe(timeframe: str):
+    if timeframe not in TIMEFRAMES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"timeframe must be one of {', '.join(TIMEFRAMES)}"
+        )
+
+def leaderboard_entry(standing: Standing, username: str) -> LeaderboardEntry:
+    return LeaderboardEntry(
+        username=username,
+        accuracy=round(standing.accuracy, 4),
+        total_predictions=standing.total,
+        rank=standing.rank
+    )
+
 @router.get("/leaderboard", response_model=List[LeaderboardEntry])
-async def get_leaderboard(
+def get_leaderboard(
     timeframe: str = "week",
-    db: Session = Depends(get_db)
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db)
 ):
-    # Mock leaderboard data
+    """Users by share of predictions that hit their target (resolved ones in the timeframe)"""
+    check_timeframe(timeframe)
+    standings = leaderboard.top(timeframe, limit, offset)
+    # Only the page's usernames are read; rankings never touch the predictions table
+    usernames = dict(
+        db.query(User.id, User.username).filter(User.id.in_([s.user_id for s in standings])).all()
+    ) if standings else {}
     return [
-        LeaderboardEntry(username="trader123", accuracy=0.68, total_predictions=156, rank=1),
-        LeaderboardEntry(username="stockpro", accuracy=0.65, total_predictions=203, rank=2),
-        LeaderboardEntry(username="aitrader", accuracy=0.64, total_predictions=189, rank=3),
+        leaderboard_entry(standing, usernames[standing.user_id])
+        for standing in standings if standing.user_id in usernames
     ]
 
+@router.get("/leaderboard/me", response_model=LeaderboardStanding)
+async def get_my_standing(timeframe: str = "week", current_user: Principal = Depends(get_current_user)):
+    check_timeframe(timeframe)
+    standing = leaderboard.standing(timeframe, current_user.id)
+    hits, total = leaderboard.counts(timeframe, current_user.id)
+    return LeaderboardStanding(
+        timeframe=timeframe,
+        rank=standing.rank if standing else None,
+        accuracy=round(standing.accuracy, 4) if standing else None,
+        hits=hits,
+        total_predictions=total,
+        ranked_users=leaderboard.ranked_users(timeframe)
+    )
+
 @router.get("/crowd-consensus/{ticker}")
-async def get_crowd_consensus(
-    ticker: str,
-    db: Session = Depends(get_db)
-):
-    return {
-        "ticker": ticker,
-        "bullish_percentage": 65,
-        "bearish_percentage": 35,
-        "total_predictions": 1234,
-        "average_confidence": 0.72
-    }
\ No newline at end of file
+async def get_crowd_consensus(ticker: str, window: str = "24h"):
+    """Share of bullish and bearish predictions for ticker over the window, served from memory"""
+    if window not in CONSENSUS_WINDOWS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"window must be one of {', '.join(CONSENSUS_WINDOWS)}"
+        )
+    return crowd_consensus.get(ticker.upper(), window)
\ No newline at end of file
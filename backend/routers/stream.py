@@ -0,0 +1,202 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+import asyncio
+import logging
+
+from ..database import SessionLocal
+from ..routers.auth import Principal, api_key_header, authenticate, oauth2_scheme
+from ..config import settings
+from ..services.alerts import Trigger, alert_engine, bar_updates
+from ..services.bar_store import TICKER_RE, bar_store
+from ..services.concurrency import run_io
+from ..services.stream import Message, Subscriber, stream_broker
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def publish_bars(ticker: str):
+    """Bar store listener: push the refreshed last bar to the ticker's subscribers"""
+    bars = bar_store.peek(ticker)
+    if bars is None or len(bars) == 0:
+        return
+    stream_broker.publish(ticker, "price", price_payload(bars))
+
+def publish_triggers(triggers: List[Trigger]):
+    for trigger in triggers:
+        stream_broker.publish_to_user(trigger.user_id, "alert", trigger.to_dict())
+
+bar_store.add_listener(publish_bars)
+alert_engine.add_listener(publish_triggers)
+
+def price_payload(bars) -> dict:
+    last = bars[-1]
+    fields = {field: value for _, field, value in bar_updates("", bars)}
+    return {"ts": int(last["ts"]), **fields}
+
+def parse_tickers(tickers: List[str], subscriber: Optional[Subscriber] = None) -> List[str]:
+    """Upper-cased valid tickers; raises ValueError past the per-connection limit"""
+    parsed = list(dict.fromkeys(t.strip().upper() for t in tickers if TICKER_RE.match(t.strip().upper())))
+    current = subscriber.tickers if subscriber is not None else set()
+    if len(current | set(parsed)) > settings.STREAM_MAX_TICKERS_PER_CONNECTION:
+        raise ValueError(f"At most {settings.STREAM_MAX_TICKERS_PER_CONNECTION} tickers per connection")
+    return parsed
+
+def subscribe(subscriber: Subscriber, tickers: List[str]):
+    stream_broker.subscribe(subscriber, tickers)
+    subscriber.offer(Message("subscribed", {"tickers": sorted(subscriber.tickers)}))
+    # Current price right away so clients do not wait for the next refresh
+    for ticker in tickers:
+        bars = bar_store.peek(ticker)
+        if bars is not None and len(bars):
+            subscriber.offer(Message("price", {"ticker": ticker, **price_payload(bars)}))
+
+def authenticate_connection(token: Optional[str], api_key: Optional[str]) -> Optional[Principal]:
+    db = SessionLocal()
+    try:
+        return authenticate(token, api_key, db)
+    except HTTPException:
+        return None
+    finally:
+        db.close()
+
+async def get_stream_user(
+    token: Optional[str] = Query(None),
+    api_key: Optional[str] = Query(None),
+    bearer: Optional[str] = Depends(oauth2_scheme),
+    header_key: Optional[str] = Depends(api_key_header)
+) -> Principal:
+    """Credentials from headers or, for EventSource clients that cannot set headers, the query string.
+
+    Uses its own short-lived session: a get_db session would stay checked out
+    until the stream ends.
+    """
+    principal = await run_io(authenticate_connection, bearer or token, header_key or api_key)
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return principal
+
+@router.websocket("/ws")
+async def stream_websocket(
+    websocket: WebSocket,
+    token: Optional[str] = None,
+    api_key: Optional[str] = None,
+    tickers: str = ""
+):
+    """Prices, predictions and your triggered alerts as JSON text frames.
+
+    Send {"action": "subscribe" | "unsubscribe", "tickers": [...]} to change the
+    tickers after connecting.
+    """
+    principal = await run_io(authenticate_connection, token, api_key)
+    if principal is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    subscriber = stream_broker.connect(principal.id)
+    if subscriber is None:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+    await websocket.accept()
+
+    async def send():
+        while not subscriber.closed:
+            for message in await subscriber.next_batch():
+                await websocket.send_text(message.text)
+        # Closed by the broker: the client fell too far behind
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+
+    async def receive():
+        while True:
+            try:
+                request = await websocket.receive_json()
+            except (KeyError, ValueError):
+                # Not JSON, or a binary frame; answered below like any malformed request
+                request = None
+            action = request.get("action") if isinstance(request, dict) else None
+            requested = request.get("tickers") if isinstance(request, dict) else None
+            if action not in ("subscribe", "unsubscribe") or not isinstance(requested, list):
+                subscriber.offer(Message("error", {"detail": "Expected {\"action\": \"subscribe\" | \"unsubscribe\", \"tickers\": [...]}"}))
+                continue
+            try:
+                requested = parse_tickers([str(t) for t in requested], subscriber if action == "subscribe" else None)
+            except ValueError as exc:
+                subscriber.offer(Message("error", {"detail": str(exc)}))
+                continue
+            if action == "subscribe":
+                subscribe(subscriber, requested)
+            else:
+                stream_broker.unsubscribe(subscriber, requested)
+                subscriber.offer(Message("subscribed", {"tickers": sorted(subscriber.tickers)}))
+
+    tasks = []
+    try:
+        subscribe(subscriber, parse_tickers(tickers.split(",")))
+    except ValueError as exc:
+        subscriber.offer(Message("error", {"detail": str(exc)}))
+    try:
+        tasks = [asyncio.ensure_future(send()), asyncio.ensure_future(receive())]
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                logger.error("Stream connection of user %s failed", principal.id, exc_info=error)
+    finally:
+        for task in tasks:
+            task.cancel()
+        stream_broker.disconnect(subscriber)
+
+class SubscriberResponse(StreamingResponse):
+    """Streams a subscriber's events and frees its connection slot however the response ends.
+
+    A generator's finally only runs once iteration has started; a client that
+    disconnects before the first chunk would otherwise keep the slot forever.
+    """
+
+    def __init__(self, subscriber: Subscriber, content, **kwargs):
+        super().__init__(content, **kwargs)
+        self.subscriber = subscriber
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            stream_broker.disconnect(self.subscriber)
+
+@router.get("/sse")
+async def stream_sse(tickers: str, current_user: Principal = Depends(get_stream_user)):
+    """The same events as /ws as Server-Sent Events, for the tickers given as a comma-separated list"""
+    try:
+        requested = parse_tickers(tickers.split(","))
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+    subscriber = stream_broker.connect(current_user.id)
+    if subscriber is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many streaming connections, try again later",
+            headers={"Retry-After": "5"}
+        )
+    subscribe(subscriber, requested)
+
+    async def events():
+        while not subscriber.closed:
+            batch = await subscriber.next_batch(timeout=settings.STREAM_HEARTBEAT_SECONDS)
+            if batch:
+                yield b"".join(message.sse for message in batch)
+            else:
+                # Comment line that keeps proxies from closing an idle stream
+                yield b": ping\n\n"
+
+    return SubscriberResponse(
+        subscriber,
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
\ No newline at end of file
@@ -0,0 +1,384 @@
+from __future__ import annotations
+
+import logging
+import threading
+from bisect import bisect_left, bisect_right
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from typing import Callable, Deque, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, select, update
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import Alert
+from . import metrics
+from .bar_store import bar_store
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+# Fields an alert condition can watch; updates carry values for these
+NUMERIC_FIELDS = {"price", "volume", "change_percent", "probability", "confidence"}
+TEXT_FIELDS = {"direction"}
+THRESHOLD_OPERATORS = (">", ">=", "<", "<=")
+# Prediction fields follow the predictions made for this timeframe
+PREDICTION_TIMEFRAME = "1d"
+
+class Condition(NamedTuple):
+    field: str
+    operator: str
+    value: object
+
+class Trigger(NamedTuple):
+    alert_id: int
+    user_id: int
+    ticker: str
+    field: str
+    operator: str
+    threshold: object
+    value: object
+    triggered_at: datetime
+
+    def to_dict(self) -> dict:
+        return {
+            "alert_id": self.alert_id,
+            "ticker": self.ticker,
+            "field": self.field,
+            "operator": self.operator,
+            "threshold": self.threshold,
+            "value": self.value,
+            "triggered_at": self.triggered_at.isoformat()
+        }
+
+def compile_condition(condition: dict) -> Condition:
+    """Validate a stored condition dict; raises ValueError for anything the engine cannot index"""
+    field = condition.get("field")
+    operator = condition.get("operator")
+    value = condition.get("value")
+    if field in NUMERIC_FIELDS:
+        if operator not in THRESHOLD_OPERATORS + ("==",):
+            raise ValueError(f"operator for {field} must be one of >, >=, <, <=, ==")
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"value for {field} must be a number")
+        return Condition(field, operator, float(value))
+    if field in TEXT_FIELDS:
+        if operator != "==":
+            raise ValueError(f"operator for {field} must be ==")
+        return Condition(field, operator, str(value).lower())
+    raise ValueError(f"field must be one of {', '.join(sorted(NUMERIC_FIELDS | TEXT_FIELDS))}")
+
+class ThresholdIndex:
+    """Alerts on one (ticker, field, operator) kept sorted by threshold.
+
+    An update from previous value p to value v triggers exactly the alerts whose
+    condition was false at p and is true at v, found with two binary searches:
+    for ">" the thresholds t with p <= t < v, for "<" those with v < t <= p, etc.
+    Adds and removals are buffered and folded in on the next evaluation.
+    """
+
+    def __init__(self, operator: str):
+        self.operator = operator
+        # Plain lists: bisect on a list beats numpy's per-call overhead for single lookups
+        self.thresholds: List[float] = []
+        self.alert_ids: List[int] = []
+        self._added: List[Tuple[float, int]] = []
+        self._removed: Set[int] = set()
+        # ">" and "<=" flip at the threshold itself, ">=" and "<" just above it
+        self._bisect = bisect_left if operator in (">", "<=") else bisect_right
+
+    def __len__(self) -> int:
+        self._compact()
+        return len(self.alert_ids)
+
+    def add(self, threshold: float, alert_id: int):
+        self._added.append((threshold, alert_id))
+
+    def remove(self, alert_id: int):
+        # Applies to the sorted lists and to adds buffered before it, not to later adds
+        self._removed.add(alert_id)
+        if self._added:
+            self._added = [entry for entry in self._added if entry[1] != alert_id]
+
+    def crossed(self, previous: Optional[float], value: float) -> List[int]:
+        """Alert ids that become true going from previous to value (all true ones if previous is None)"""
+        self._compact()
+        thresholds = self.thresholds
+        at_value = self._bisect(thresholds, value)
+        if self.operator in (">", ">="):
+            # true for thresholds below value
+            start = 0 if previous is None else self._bisect(thresholds, previous)
+            return self.alert_ids[start:at_value]
+        end = len(thresholds) if previous is None else self._bisect(thresholds, previous)
+        return self.alert_ids[at_value:end]
+
+    def _compact(self):
+        if not self._added and not self._removed:
+            return
+        thresholds = np.array(self.thresholds, dtype="f8")
+        alert_ids = np.array(self.alert_ids, dtype="i8")
+        if self._removed:
+            keep = ~np.isin(alert_ids, np.fromiter(self._removed, dtype="i8"))
+            thresholds, alert_ids = thresholds[keep], alert_ids[keep]
+        if self._added:
+            added = np.array(self._added, dtype=[("threshold", "f8"), ("alert_id", "i8")])
+            thresholds = np.concatenate([thresholds, added["threshold"]])
+            alert_ids = np.concatenate([alert_ids, added["alert_id"]])
+        order = np.argsort(thresholds, kind="stable")
+        self.thresholds, self.alert_ids = thresholds[order].tolist(), alert_ids[order].tolist()
+        self._added, self._removed = [], set()
+
+class AlertEngine:
+    """Active alerts indexed by (ticker, field) and evaluated against batches of updates.
+
+    Threshold conditions live in ThresholdIndex instances, so an update costs two
+    binary searches per operator plus the alerts it actually triggers; "==" conditions
+    are a dict lookup. Alerts fire when their condition becomes true (and, for a
+    ticker/field seen for the first time, when it already is), at most once per
+    debounce window. Triggered timestamps are written back in batches by flush().
+    """
+
+    def __init__(self, debounce_seconds: float, recent_per_user: int = 100):
+        self.debounce = timedelta(seconds=debounce_seconds)
+        self.recent_per_user = recent_per_user
+        self._thresholds: Dict[Tuple[str, str, str], ThresholdIndex] = {}
+        self._equals: Dict[Tuple[str, str], Dict[object, Set[int]]] = {}
+        self._alerts: Dict[int, Tuple[int, str, Condition]] = {}
+        self._last_triggered: Dict[int, datetime] = {}
+        self._last_values: Dict[Tuple[str, str], object] = {}
+        # Alerts added (entry) or removed (None) locally while a reload was reading the database
+        self._changed: Dict[int, Optional[Tuple[int, str, Condition]]] = {}
+        self._pending_writes: Dict[int, datetime] = {}
+        self._recent: Dict[int, Deque[Trigger]] = defaultdict(lambda: deque(maxlen=self.recent_per_user))
+        self._listeners: List[Callable[[List[Trigger]], None]] = []
+        self._lock = threading.RLock()
+        self._triggers = metrics.counter("alerts.triggered")
+        self._debounced = metrics.counter("alerts.debounced")
+        self._evaluate_ms = metrics.histogram("alerts.evaluate_ms", (0.05, 0.1, 0.5, 1, 5, 10, 50, 100, 500))
+        metrics.gauge("alerts.active", lambda: len(self._alerts))
+
+    def add_listener(self, fn: Callable[[List[Trigger]], None]):
+        """Call fn(triggers) after every evaluation that triggered alerts"""
+        self._listeners.append(fn)
+
+    def add(self, alert_id: int, user_id: int, ticker: str, condition: Condition,
+            last_triggered: Optional[datetime] = None):
+        """Index an alert; fires it right away if its condition already holds"""
+        ticker = ticker.upper()
+        with self._lock:
+            self._remove(alert_id)
+            self._insert(self._thresholds, self._equals, alert_id, ticker, condition)
+            self._alerts[alert_id] = self._changed[alert_id] = (user_id, ticker, condition)
+            if last_triggered is not None:
+                self._last_triggered[alert_id] = last_triggered
+            current = self._last_values.get((ticker, condition.field))
+        if current is not None and _holds(condition, current):
+            # Already true when created: fire now rather than waiting for the next crossing
+            self._fire([(alert_id, condition.field, current)], datetime.utcnow())
+
+    def remove(self, alert_id: int):
+        with self._lock:
+            self._remove(alert_id)
+            self._changed[alert_id] = None
+
+    def replace_all(self, alerts: Iterable[Tuple[int, int, str, Condition, Optional[datetime]]]):
+        """Swap in a freshly loaded set of alerts, keeping the last seen values.
+
+        Alerts added or removed locally since the last call to begin_reload() are
+        reapplied on top, so a reload racing a create or delete does not undo it.
+        """
+        thresholds: Dict[Tuple[str, str, str], ThresholdIndex] = {}
+        equals: Dict[Tuple[str, str], Dict[object, Set[int]]] = {}
+        entries: Dict[int, Tuple[int, str, Condition]] = {}
+        last_triggered: Dict[int, datetime] = {}
+        for alert_id, user_id, ticker, condition, triggered_at in alerts:
+            ticker = ticker.upper()
+            self._insert(thresholds, equals, alert_id, ticker, condition)
+            entries[alert_id] = (user_id, ticker, condition)
+            if triggered_at is not None:
+                last_triggered[alert_id] = triggered_at
+        with self._lock:
+            for alert_id, entry in self._changed.items():
+                old = entries.pop(alert_id, None)
+                if old is not None:
+                    self._delete(thresholds, equals, alert_id, old)
+                if entry is not None:
+                    self._insert(thresholds, equals, alert_id, entry[1], entry[2])
+                    entries[alert_id] = entry
+            self._changed = {}
+            # Triggers not flushed yet are newer than what the database returned
+            for alert_id, triggered_at in self._last_triggered.items():
+                if alert_id in entries and triggered_at > last_triggered.get(alert_id, datetime.min):
+                    last_triggered[alert_id] = triggered_at
+            self._thresholds, self._equals = thresholds, equals
+            self._alerts, self._last_triggered = entries, last_triggered
+
+    def begin_reload(self):
+        with self._lock:
+            self._changed = {}
+
+    def evaluate(self, updates: Iterable[Tuple[str, str, object]]) -> List[Trigger]:
+        """Apply a batch of (ticker, field, value) updates and return the alerts they trigger"""
+        started = time.perf_counter()
+        candidates = []
+        with self._lock:
+            for ticker, field, value in updates:
+                ticker = ticker.upper()
+                if value is None:
+                    continue
+                value = str(value).lower() if field in TEXT_FIELDS else float(value)
+                key = (ticker, field)
+                previous = self._last_values.get(key)
+                self._last_values[key] = value
+                if previous == value:
+                    continue
+                if field in NUMERIC_FIELDS:
+                    for operator in THRESHOLD_OPERATORS:
+                        index = self._thresholds.get((ticker, field, operator))
+                        if index is not None:
+                            candidates.extend((alert_id, field, value) for alert_id in index.crossed(previous, value))
+                matches = self._equals.get(key, {}).get(value)
+                if matches:
+                    candidates.extend((alert_id, field, value) for alert_id in matches)
+        triggers = self._fire(candidates, datetime.utcnow()) if candidates else []
+        self._evaluate_ms.observe((time.perf_counter() - started) * 1000)
+        return triggers
+
+    def recent(self, user_id: int) -> List[dict]:
+        with self._lock:
+            return [trigger.to_dict() for trigger in reversed(self._recent.get(user_id, ()))]
+
+    def load(self):
+        """Rebuild the index from every active alert in the database"""
+        self.begin_reload()
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(Alert.id, Alert.user_id, Alert.ticker, Alert.condition, Alert.last_triggered)
+                .where(Alert.is_active.is_(True))
+                .execution_options(yield_per=5000)
+            )
+            alerts = []
+            for alert_id, user_id, ticker, condition, last_triggered in rows:
+                try:
+                    alerts.append((alert_id, user_id, ticker, compile_condition(condition or {}), last_triggered))
+                except ValueError:
+                    logger.warning("Skipping alert %s with an invalid condition", alert_id)
+        finally:
+            db.close()
+        self.replace_all(alerts)
+
+    def flush(self):
+        """Write collected last_triggered timestamps in one batched UPDATE"""
+        with self._lock:
+            pending, self._pending_writes = self._pending_writes, {}
+        if not pending:
+            return
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(Alert.__table__)
+                .where(Alert.__table__.c.id == bindparam("alert_id"))
+                .values(last_triggered=bindparam("triggered_at")),
+                [{"alert_id": alert_id, "triggered_at": at} for alert_id, at in pending.items()]
+            )
+            db.commit()
+        except Exception:
+            with self._lock:
+                for alert_id, at in pending.items():
+                    self._pending_writes.setdefault(alert_id, at)
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _insert(thresholds, equals, alert_id: int, ticker: str, condition: Condition):
+        if condition.operator in THRESHOLD_OPERATORS:
+            key = (ticker, condition.field, condition.operator)
+            index = thresholds.get(key)
+            if index is None:
+                index = thresholds[key] = ThresholdIndex(condition.operator)
+            index.add(condition.value, alert_id)
+        else:
+            equals.setdefault((ticker, condition.field), {}).setdefault(condition.value, set()).add(alert_id)
+
+    def _remove(self, alert_id: int):
+        entry = self._alerts.pop(alert_id, None)
+        if entry is not None:
+            self._delete(self._thresholds, self._equals, alert_id, entry)
+        self._last_triggered.pop(alert_id, None)
+
+    @staticmethod
+    def _delete(thresholds, equals, alert_id: int, entry: Tuple[int, str, Condition]):
+        _, ticker, condition = entry
+        if condition.operator in THRESHOLD_OPERATORS:
+            thresholds[(ticker, condition.field, condition.operator)].remove(alert_id)
+        else:
+            equals[(ticker, condition.field)][condition.value].discard(alert_id)
+
+    def _fire(self, candidates: List[Tuple[int, str, object]], now: datetime) -> List[Trigger]:
+        triggers = []
+        with self._lock:
+            for alert_id, field, value in candidates:
+                entry = self._alerts.get(alert_id)
+                if entry is None:
+                    continue
+                last = self._last_triggered.get(alert_id)
+                if last is not None and now - last < self.debounce:
+                    self._debounced.inc()
+                    continue
+                user_id, ticker, condition = entry
+                self._last_triggered[alert_id] = now
+                self._pending_writes[alert_id] = now
+                trigger = Trigger(alert_id, user_id, ticker, field, condition.operator, condition.value, value, now)
+                self._recent[user_id].append(trigger)
+                triggers.append(trigger)
+        if triggers:
+            self._triggers.inc(len(triggers))
+            for listener in self._listeners:
+                try:
+                    listener(triggers)
+                except Exception:
+                    logger.exception("Alert listener failed")
+        return triggers
+
+def _holds(condition: Condition, value) -> bool:
+    if condition.field in TEXT_FIELDS:
+        return str(value).lower() == condition.value
+    value = float(value)
+    if condition.operator == ">":
+        return value > condition.value
+    if condition.operator == ">=":
+        return value >= condition.value
+    if condition.operator == "<":
+        return value < condition.value
+    if condition.operator == "<=":
+        return value <= condition.value
+    return value == condition.value
+
+def bar_updates(ticker: str, bars: np.ndarray) -> List[Tuple[str, str, float]]:
+    """Price-derived alert fields from a ticker's latest bars"""
+    if bars is None or len(bars) == 0:
+        return []
+    last = bars[-1]
+    updates = [(ticker, "price", float(last["close"])), (ticker, "volume", float(last["volume"]))]
+    if len(bars) > 1 and bars[-2]["close"] > 0:
+        updates.append((ticker, "change_percent", round((last["close"] / bars[-2]["close"] - 1) * 100, 4)))
+    return updates
+
+def prediction_updates(ticker: str, prediction: dict) -> List[Tuple[str, str, object]]:
+    direction = prediction["direction"]
+    return [
+        (ticker, "probability", prediction["probability"]),
+        (ticker, "confidence", prediction["confidence"]),
+        (ticker, "direction", getattr(direction, "value", direction))
+    ]
+
+alert_engine = AlertEngine(debounce_seconds=settings.ALERT_DEBOUNCE_SECONDS)
+
+def evaluate_bars(ticker: str):
+    """Bar store listener: evaluate the ticker's price alerts against its refreshed bars"""
+    alert_engine.evaluate(bar_updates(ticker, bar_store.peek(ticker)))
\ No newline at end of file
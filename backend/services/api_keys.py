@@ -0,0 +1,194 @@
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import APIKey, User
+from . import metrics
+
+KEY_SCHEME = "sp"
+
+def generate_key() -> Tuple[str, str, str]:
+    """New key as (plaintext, prefix, hash); only the prefix and hash are stored"""
+    prefix = secrets.token_hex(6)
+    key = f"{KEY_SCHEME}_{prefix}_{secrets.token_urlsafe(32)}"
+    return key, prefix, hash_key(key)
+
+def hash_key(key: str) -> str:
+    # Keys carry 256 random bits, so a fast digest is enough (no bcrypt per request)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def parse_prefix(key: str) -> Optional[str]:
+    parts = key.split("_", 2)
+    if len(parts) != 3 or parts[0] != KEY_SCHEME or not parts[1]:
+        return None
+    return parts[1]
+
+class ApiKeyRecord:
+    """The fields of an API key needed to authenticate a request"""
+    __slots__ = ("id", "user_id", "username", "key_hash", "is_active", "expires_at")
+
+    def __init__(self, id, user_id, username, key_hash, is_active, expires_at):
+        self.id = id
+        self.user_id = user_id
+        self.username = username
+        self.key_hash = key_hash
+        self.is_active = is_active
+        self.expires_at = expires_at
+
+class ApiKeyIndex:
+    """In-memory index of API keys by prefix, with batched last_used writes.
+
+    Lookups are a dict access plus one SHA-256; a prefix not in the index is loaded
+    from the database once. Unknown prefixes are remembered for miss_ttl seconds in
+    a separate bounded set, so random keys can neither evict real entries nor bloat
+    refresh(). refresh() reloads indexed prefixes in chunks, so revocations made by
+    other workers apply within one refresh interval; expiry is checked on every
+    request. Usage timestamps are collected in memory and written by flush_usage()
+    in one executemany UPDATE.
+    """
+
+    def __init__(self, max_entries: int, max_misses: int, miss_ttl: float, chunk_size: int = 500):
+        self.max_entries = max_entries
+        self.max_misses = max_misses
+        self.miss_ttl = miss_ttl
+        self.chunk_size = chunk_size
+        self._entries: "OrderedDict[str, ApiKeyRecord]" = OrderedDict()
+        self._misses: "OrderedDict[str, float]" = OrderedDict()  # prefix -> expiry (monotonic)
+        self._used: Dict[int, datetime] = {}
+        self._lock = threading.Lock()
+        self._hits = metrics.counter("api_keys.hits")
+        self._loads = metrics.counter("api_keys.loads")
+        self._rejected = metrics.counter("api_keys.rejected")
+        self._flush_ms = metrics.histogram("api_keys.flush_ms")
+        metrics.gauge("api_keys.indexed", lambda: len(self._entries))
+        metrics.gauge("api_keys.cached_misses", lambda: len(self._misses))
+        metrics.gauge("api_keys.pending_usage", lambda: len(self._used))
+
+    def authenticate(self, db: Session, key: str) -> Optional[ApiKeyRecord]:
+        prefix = parse_prefix(key)
+        if prefix is None:
+            self._rejected.inc()
+            return None
+        with self._lock:
+            record = self._entries.get(prefix)
+            if record is not None:
+                self._entries.move_to_end(prefix)
+            known_miss = record is None and self._misses.get(prefix, 0) > time.monotonic()
+        if record is not None or known_miss:
+            self._hits.inc()
+        else:
+            record = self._load(db, [prefix]).get(prefix)
+            self._loads.inc()
+            if record is None:
+                self._store_miss(prefix)
+            else:
+                self._store({prefix: record})
+
+        now = datetime.utcnow()
+        if (
+            record is None
+            or not record.is_active
+            or (record.expires_at is not None and record.expires_at <= now)
+            or not hmac.compare_digest(record.key_hash, hash_key(key))
+        ):
+            self._rejected.inc()
+            return None
+        with self._lock:
+            self._used[record.id] = now
+        return record
+
+    def invalidate(self, prefix: str):
+        with self._lock:
+            self._entries.pop(prefix, None)
+            self._misses.pop(prefix, None)
+
+    def refresh(self):
+        """Reload every indexed prefix from the database"""
+        with self._lock:
+            prefixes = list(self._entries)
+        db = SessionLocal()
+        try:
+            for offset in range(0, len(prefixes), self.chunk_size):
+                chunk = prefixes[offset:offset + self.chunk_size]
+                loaded = self._load(db, chunk)
+                with self._lock:
+                    for prefix in chunk:
+                        if prefix in self._entries:
+                            if prefix in loaded:
+                                self._entries[prefix] = loaded[prefix]
+                            else:
+                                # Deleted by another worker
+                                del self._entries[prefix]
+        finally:
+            db.close()
+
+    def flush_usage(self):
+        """Write collected last_used timestamps in a single batched UPDATE"""
+        with self._lock:
+            used, self._used = self._used, {}
+        if not used:
+            return
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(APIKey.__table__)
+                .where(APIKey.__table__.c.id == bindparam("key_id"))
+                .values(last_used=bindparam("used_at")),
+                [{"key_id": key_id, "used_at": used_at} for key_id, used_at in used.items()]
+            )
+            db.commit()
+        except Exception:
+            # Keep the timestamps for the next flush unless newer ones arrived meanwhile
+            with self._lock:
+                for key_id, used_at in used.items():
+                    self._used.setdefault(key_id, used_at)
+            raise
+        finally:
+            db.close()
+        self._flush_ms.observe((time.perf_counter() - started) * 1000)
+
+    def _store_miss(self, prefix: str):
+        with self._lock:
+            self._misses[prefix] = time.monotonic() + self.miss_ttl
+            self._misses.move_to_end(prefix)
+            while len(self._misses) > self.max_misses:
+                self._misses.popitem(last=False)
+
+    def _store(self, loaded: Dict[str, ApiKeyRecord]):
+        with self._lock:
+            for prefix, record in loaded.items():
+                self._entries[prefix] = record
+                self._entries.move_to_end(prefix)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _load(self, db: Session, prefixes: List[str]) -> Dict[str, ApiKeyRecord]:
+        rows = db.execute(
+            select(
+                APIKey.prefix, APIKey.id, APIKey.user_id, User.username,
+                APIKey.key, APIKey.is_active, APIKey.expires_at
+            )
+            .join(User, User.id == APIKey.user_id)
+            .where(APIKey.prefix.in_(prefixes))
+        )
+        return {
+            prefix: ApiKeyRecord(key_id, user_id, username, key_hash, bool(is_active), expires_at)
+            for prefix, key_id, user_id, username, key_hash, is_active, expires_at in rows
+        }
+
+api_key_index = ApiKeyIndex(
+    max_entries=settings.API_KEY_INDEX_MAX_ENTRIES,
+    max_misses=settings.API_KEY_MISS_MAX_ENTRIES,
+    miss_ttl=settings.API_KEY_MISS_TTL_SECONDS
+)
\ No newline at end of file
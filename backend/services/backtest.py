@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import calendar
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import Prediction, PredictionDirection
+from .bar_store import bar_store
+from .indicators import compute_indicators
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+
+TRADING_DAYS = 252
+# Bars in a prediction's timeframe, used as the default holding period
+HOLDING_BARS = {"1d": 1, "1w": 5, "1m": 21}
+# Bars loaded before the start date so regenerated signals have settled indicators
+WARMUP_BARS = 100
+# Points kept from the daily equity curve when a result is stored
+EQUITY_CURVE_POINTS = 500
+
+DIRECTION_SIGN = {PredictionDirection.UP: 1.0, PredictionDirection.DOWN: -1.0}
+
+class PriceHistory(NamedTuple):
+    """Daily bars of several tickers on one shared calendar"""
+    tickers: List[str]
+    ts: np.ndarray  # (T,) bar timestamps, epoch seconds
+    close: np.ndarray  # (n, T); NaN where a ticker has no bar
+    high: np.ndarray
+    low: np.ndarray
+    volume: np.ndarray
+
+def align_bars(bars_by_ticker: Dict[str, np.ndarray], start_ts: int, end_ts: int) -> PriceHistory:
+    """Put every ticker's bars between start_ts and end_ts on the union of their timestamps"""
+    tickers = sorted(bars_by_ticker)
+    windows = []
+    for ticker in tickers:
+        bars = bars_by_ticker[ticker]
+        lo = np.searchsorted(bars["ts"], start_ts, side="left")
+        hi = np.searchsorted(bars["ts"], end_ts, side="right")
+        windows.append(bars[lo:hi])
+    ts = np.unique(np.concatenate([w["ts"] for w in windows])) if windows else np.empty(0, dtype="i8")
+
+    arrays = {field: np.full((len(tickers), len(ts)), np.nan) for field in ("close", "high", "low", "volume")}
+    for i, window in enumerate(windows):
+        columns = np.searchsorted(ts, window["ts"])
+        for field, array in arrays.items():
+            array[i, columns] = window[field]
+    return PriceHistory(tickers, ts, **arrays)
+
+def signals_from_predictions(
+    history: PriceHistory,
+    tickers: Sequence[str],
+    created_ts: np.ndarray,
+    directions: np.ndarray,
+    confidences: np.ndarray,
+) -> np.ndarray:
+    """(n x T) signal matrix from stored predictions: +confidence for up, -confidence for down.
+
+    A prediction is entered at the close of the first bar that opens after it was
+    made, so no bar the prediction could not have seen is traded on.
+    """
+    signals = np.full(history.close.shape, np.nan)
+    index = {ticker: i for i, ticker in enumerate(history.tickers)}
+    rows = np.array([index.get(ticker, -1) for ticker in tickers], dtype="i8")
+    entries = np.searchsorted(history.ts, created_ts, side="right")
+    valid = (rows >= 0) & (entries < len(history.ts)) & (directions != 0)
+    # Later predictions for the same ticker and bar overwrite earlier ones
+    signals[rows[valid], entries[valid]] = directions[valid] * confidences[valid]
+    return signals
+
+def heuristic_probability(indicators: Dict[str, np.ndarray]) -> np.ndarray:
+    """Up-move probability series with the rules of the heuristic predictor, minus its demo noise"""
+    rsi = indicators["rsi"]
+    price_position = indicators["price_position"]
+    volume_ratio = indicators["volume_ratio"]
+    probability = (
+        0.5
+        + 0.15 * (rsi < 30) - 0.15 * (rsi > 70)
+        + 0.1 * (price_position < 0.3) - 0.1 * (price_position > 0.7)
+        + 0.05 * (volume_ratio > 1.5)
+    )
+    return np.clip(probability, 0.1, 0.9)
+
+def regenerate_signals(history: PriceHistory) -> np.ndarray:
+    """Signals the heuristic would have produced at every close, entered on the next bar"""
+    with np.errstate(invalid="ignore"):
+        indicators = compute_indicators(history.close, history.high, history.low, history.volume)
+        probability = heuristic_probability(indicators)
+    raw = np.where(np.isnan(history.close), np.nan, (probability - 0.5) * 2)
+    signals = np.full(raw.shape, np.nan)
+    signals[:, 1:] = raw[:, :-1]
+    return signals
+
+def forward_fill(x: np.ndarray) -> np.ndarray:
+    """Carry the last valid value forward along the time axis"""
+    valid = ~np.isnan(x)
+    index = np.where(valid, np.arange(x.shape[1]), 0)
+    np.maximum.accumulate(index, axis=1, out=index)
+    return x[np.arange(x.shape[0])[:, None], index]
+
+def simulate(
+    close: np.ndarray,
+    signals: np.ndarray,
+    confidence_threshold: float,
+    holding_bars: int,
+    initial_capital: float,
+) -> Tuple[dict, np.ndarray]:
+    """Replay signals against close prices, all trades at once.
+
+    Every signal with |confidence| >= confidence_threshold opens a trade at that
+    bar's close and closes it holding_bars later (trades that would end after the
+    last bar are skipped). Capital is split equally across the trades open on a
+    day; days with no open trade earn nothing. Returns the summary statistics and
+    the daily equity curve.
+    """
+    n, T = close.shape
+    filled = forward_fill(close)
+    with np.errstate(invalid="ignore"):
+        strength = np.abs(signals)
+        rows, entries = np.nonzero(strength >= max(confidence_threshold, 1e-12))
+    exits = entries + holding_bars
+    in_range = exits < T
+    rows, entries, exits = rows[in_range], entries[in_range], exits[in_range]
+    entry_price = close[rows, entries]
+    exit_price = filled[rows, exits]
+    tradable = np.isfinite(entry_price) & np.isfinite(exit_price) & (entry_price > 0)
+    rows, entries, exits = rows[tradable], entries[tradable], exits[tradable]
+    direction = np.sign(signals[rows, entries])
+    trade_returns = direction * (exit_price[tradable] / entry_price[tradable] - 1)
+
+    # Net direction and number of open trades per (ticker, day): a trade is exposed to
+    # the returns of days entry+1 .. exit, built as a difference array and cumsum'd
+    width = T + 1
+    starts = rows * width + entries + 1
+    ends = rows * width + exits + 1
+    size = n * width
+    net = np.bincount(starts, weights=direction, minlength=size) - np.bincount(ends, weights=direction, minlength=size)
+    count = np.bincount(starts, minlength=size) - np.bincount(ends, minlength=size)
+    position = np.cumsum(net.reshape(n, width)[:, :T], axis=1)
+    open_trades = np.cumsum(count.reshape(n, width)[:, :T], axis=1).sum(axis=0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        asset_returns = np.zeros_like(filled)
+        asset_returns[:, 1:] = filled[:, 1:] / filled[:, :-1] - 1
+    asset_returns = np.nan_to_num(asset_returns, nan=0.0, posinf=0.0, neginf=0.0)
+    exposure = (position * asset_returns).sum(axis=0)
+    daily_returns = np.divide(exposure, open_trades, out=np.zeros(T), where=open_trades > 0)
+
+    equity = initial_capital * np.cumprod(1 + daily_returns)
+    final_capital = float(equity[-1]) if T else initial_capital
+    std = daily_returns.std() if T > 1 else 0.0
+    sharpe = daily_returns.mean() / std * np.sqrt(TRADING_DAYS) if std > 0 else 0.0
+    drawdown = equity / np.maximum.accumulate(equity) - 1 if T else np.zeros(1)
+
+    stats = {
+        "total_return": round((final_capital / initial_capital - 1) * 100, 2),
+        "win_rate": round(float((trade_returns > 0).mean()), 4) if len(trade_returns) else 0.0,
+        "sharpe_ratio": round(float(sharpe), 2),
+        "max_drawdown": round(float(drawdown.min()) * 100, 2),
+        "total_trades": int(len(trade_returns)),
+        "final_capital": round(final_capital, 2),
+    }
+    return stats, equity
+
+def equity_curve_points(ts: np.ndarray, equity: np.ndarray, points: int = EQUITY_CURVE_POINTS) -> List[list]:
+    """[timestamp, equity] pairs, evenly thinned to at most `points` (always keeping the last)"""
+    if len(ts) == 0:
+        return []
+    index = np.unique(np.linspace(0, len(ts) - 1, min(points, len(ts))).astype("i8"))
+    return [[int(ts[i]), round(float(equity[i]), 2)] for i in index]
+
+def prepare(
+    db: Session,
+    user_id: int,
+    start: datetime,
+    end: datetime,
+    source: str,
+    tickers: Optional[List[str]],
+    timeframe: str,
+) -> Tuple[PriceHistory, np.ndarray]:
+    """Prices and signals for [start, end] from the user's stored predictions or regenerated.
+
+    Raises ValueError when there is nothing to backtest.
+    """
+    start_ts, end_ts = calendar.timegm(start.utctimetuple()), calendar.timegm(end.utctimetuple())
+    tickers = sorted({ticker.upper() for ticker in tickers}) if tickers else None
+
+    if source == "predictions":
+        query = select(Prediction.ticker, Prediction.created_at, Prediction.direction, Prediction.confidence).where(
+            Prediction.user_id == user_id,
+            Prediction.timeframe == timeframe,
+            Prediction.created_at >= start,
+            Prediction.created_at <= end,
+        )
+        if tickers:
+            query = query.where(Prediction.ticker.in_(tickers))
+        rows = db.execute(query).all()
+        if not rows:
+            raise ValueError("No stored predictions match this period")
+        tickers = sorted({row.ticker for row in rows})
+        load_from = start
+    else:
+        if not tickers:
+            raise ValueError("tickers are required to backtest regenerated signals")
+        # Calendar days covering the indicator warm-up bars
+        load_from = start - timedelta(days=WARMUP_BARS * 7 // 5 + 10)
+
+    if len(tickers) > settings.BACKTEST_MAX_TICKERS:
+        raise ValueError(f"At most {settings.BACKTEST_MAX_TICKERS} tickers per backtest")
+
+    bar_store.ensure_history(tickers, load_from)
+    bars = bar_store.get_many(tickers)
+    if not bars:
+        raise ValueError("No price history for these tickers")
+    history = align_bars(bars, calendar.timegm(load_from.utctimetuple()), end_ts)
+
+    if source == "predictions":
+        signals = signals_from_predictions(
+            history,
+            [row.ticker for row in rows],
+            np.array([calendar.timegm(row.created_at.utctimetuple()) for row in rows], dtype="i8"),
+            np.array([DIRECTION_SIGN.get(row.direction, 0) for row in rows], dtype="f8"),
+            np.array([row.confidence for row in rows], dtype="f8"),
+        )
+    else:
+        signals = regenerate_signals(history)
+
+    first = int(np.searchsorted(history.ts, start_ts))
+    history = PriceHistory(
+        history.tickers,
+        history.ts[first:],
+        history.close[:, first:],
+        history.high[:, first:],
+        history.low[:, first:],
+        history.volume[:, first:],
+    )
+    return history, signals[:, first:]
\ No newline at end of file
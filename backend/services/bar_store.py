@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import calendar
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+from ..config import settings
+from .lazy import lazy_import
+from .market_data import BAR_DTYPE, BarProvider, empty_bars, get_provider
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+TICKER_RE = re.compile(r"^[A-Z0-9.\-^=]{1,16}$")
+
+# Weekends and holidays: the first stored bar may legitimately be a few days after a start date
+HISTORY_SLACK_SECONDS = 7 * 86400
+
+class BarStore:
+    """Per-ticker daily bars persisted as .npy files and served from memory.
+
+    A ticker is refreshed from the provider when its last refresh is older than
+    max_age seconds; only bars from the last stored timestamp onward are fetched,
+    so the (possibly still forming) last bar is rewritten and new bars appended.
+    If the provider fails, the attempt still counts towards max_age and stored
+    bars keep being served until their last successful refresh is older than
+    max_stale seconds.
+    """
+
+    def __init__(self, directory: str, provider: BarProvider, max_age: int, max_stale: int):
+        self.directory = directory
+        self.provider = provider
+        self.max_age = max_age
+        self.max_stale = max_stale
+        self._bars: Dict[str, np.ndarray] = {}
+        self._refreshed_at: Dict[str, float] = {}
+        self._checked_at: Dict[str, float] = {}
+        # Earliest start already requested from the provider per ticker (see ensure_history)
+        self._history_from: Dict[str, int] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._listeners: List[Callable[[str], None]] = []
+
+    def add_listener(self, fn: Callable[[str], None]):
+        """Call fn(ticker) whenever a refresh appends or rewrites bars for ticker"""
+        self._listeners.append(fn)
+
+    def get_bars(self, ticker: str) -> Optional[np.ndarray]:
+        """Return all stored bars for ticker, refreshing them first if stale"""
+        ticker = ticker.upper()
+        if not TICKER_RE.match(ticker):
+            return None
+
+        with self._lock_for(ticker):
+            bars = self._load(ticker)
+            if time.time() - self._checked_at.get(ticker, 0) >= self.max_age:
+                bars = self._refresh(ticker, bars)
+            if bars is None or len(bars) == 0:
+                return None
+            if time.time() - self._refreshed_at.get(ticker, 0) >= self.max_stale:
+                return None
+            return bars
+
+    def peek(self, ticker: str) -> Optional[np.ndarray]:
+        """Bars already in memory for ticker, without locking or refreshing (safe inside listeners)"""
+        return self._bars.get(ticker.upper())
+
+    def get_many(self, tickers: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Return bars for several tickers, refreshing the stale ones with bulk provider calls"""
+        tickers = sorted({t.upper() for t in tickers if TICKER_RE.match(t.upper())})
+        # Locks are always taken in sorted order so concurrent batches cannot deadlock
+        locks = [self._lock_for(ticker) for ticker in tickers]
+        for lock in locks:
+            lock.acquire()
+        try:
+            now = time.time()
+            current = {ticker: self._load(ticker) for ticker in tickers}
+            stale = [t for t in tickers if now - self._checked_at.get(t, 0) >= self.max_age]
+            backfill = [t for t in stale if current[t] is None or len(current[t]) == 0]
+            incremental = [t for t in stale if t not in backfill]
+
+            if backfill:
+                current.update(self._refresh_many(backfill, current, None))
+            if incremental:
+                # Refetch from the oldest last bar; overlapping bars are simply rewritten
+                start_ts = min(int(current[t]["ts"][-1]) for t in incremental)
+                start = datetime.fromtimestamp(start_ts, tz=timezone.utc)
+                current.update(self._refresh_many(incremental, current, start))
+
+            result = {}
+            for ticker, bars in current.items():
+                if bars is None or len(bars) == 0:
+                    continue
+                if now - self._refreshed_at.get(ticker, 0) >= self.max_stale:
+                    continue
+                result[ticker] = bars
+            return result
+        finally:
+            for lock in locks:
+                lock.release()
+
+    def ensure_history(self, tickers: Iterable[str], start: datetime):
+        """Backfill tickers whose stored bars begin after start (e.g. for long backtests).
+
+        Each ticker is fetched back to a given start at most once per process, so
+        tickers that simply have no older history are not refetched every time.
+        """
+        tickers = sorted({t.upper() for t in tickers if TICKER_RE.match(t.upper())})
+        # Naive datetimes are UTC throughout the app
+        start_ts = calendar.timegm(start.utctimetuple())
+        locks = [self._lock_for(ticker) for ticker in tickers]
+        for lock in locks:
+            lock.acquire()
+        try:
+            current = {ticker: self._load(ticker) for ticker in tickers}
+            missing = [
+                ticker for ticker in tickers
+                if self._history_from.get(ticker, start_ts + 1) > start_ts
+                and (current[ticker] is None or len(current[ticker]) == 0
+                     or current[ticker]["ts"][0] > start_ts + HISTORY_SLACK_SECONDS)
+            ]
+            if missing:
+                refreshed = self._refresh_many(missing, current, start)
+                for ticker in refreshed:
+                    self._history_from[ticker] = start_ts
+        finally:
+            for lock in locks:
+                lock.release()
+
+    def _lock_for(self, ticker: str) -> threading.Lock:
+        with self._locks_guard:
+            lock = self._locks.get(ticker)
+            if lock is None:
+                lock = self._locks[ticker] = threading.Lock()
+            return lock
+
+    def _path(self, ticker: str) -> str:
+        return os.path.join(self.directory, f"{ticker}.npy")
+
+    def _load(self, ticker: str) -> Optional[np.ndarray]:
+        bars = self._bars.get(ticker)
+        if bars is not None:
+            return bars
+        path = self._path(ticker)
+        if not os.path.exists(path):
+            return None
+        bars = np.array(np.load(path, mmap_mode="r"))
+        self._bars[ticker] = bars
+        self._refreshed_at[ticker] = self._checked_at[ticker] = os.path.getmtime(path)
+        return bars
+
+    def _refresh(self, ticker: str, bars: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        start = None
+        if bars is not None and len(bars):
+            start = datetime.fromtimestamp(int(bars["ts"][-1]), tz=timezone.utc)
+
+        self._checked_at[ticker] = time.time()
+        try:
+            new_bars = self.provider.fetch(ticker, start)
+        except Exception:
+            logger.exception("Bar refresh failed for %s", ticker)
+            return bars
+        return self._merge(ticker, bars, new_bars)
+
+    def _refresh_many(
+        self, tickers: List[str], current: Dict[str, Optional[np.ndarray]], start: Optional[datetime]
+    ) -> Dict[str, Optional[np.ndarray]]:
+        checked_at = time.time()
+        for ticker in tickers:
+            self._checked_at[ticker] = checked_at
+        try:
+            fetched = self.provider.fetch_many(tickers, start)
+        except Exception:
+            logger.exception("Bulk bar refresh failed for %d tickers", len(tickers))
+            return {}
+        return {
+            ticker: self._merge(ticker, current[ticker], fetched.get(ticker, empty_bars()))
+            for ticker in tickers
+        }
+
+    def _merge(self, ticker: str, bars: Optional[np.ndarray], new_bars: np.ndarray) -> Optional[np.ndarray]:
+        if len(new_bars):
+            new_bars = new_bars.astype(BAR_DTYPE, copy=False)
+            if bars is not None and len(bars):
+                keep = bars[bars["ts"] < new_bars["ts"][0]]
+                bars = np.concatenate([keep, new_bars])
+            else:
+                bars = new_bars
+            self._save(ticker, bars)
+            self._bars[ticker] = bars
+            for listener in self._listeners:
+                try:
+                    listener(ticker)
+                except Exception:
+                    logger.exception("Bar listener failed for %s", ticker)
+        self._refreshed_at[ticker] = time.time()
+        return bars
+
+    def _save(self, ticker: str, bars: np.ndarray):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(ticker)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, bars)
+        os.replace(tmp_path, path)
+
+bar_store = BarStore(
+    settings.BAR_STORE_DIR,
+    get_provider(settings.BAR_PROVIDER),
+    max_age=settings.BAR_STORE_MAX_AGE_SECONDS,
+    max_stale=settings.BAR_STORE_MAX_STALE_SECONDS,
+)
@@ -0,0 +1,33 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from . import metrics
+
+class RequestCoalescer:
+    """Share one in-flight computation between concurrent callers with the same key.
+
+    The first caller for a key starts the computation; callers arriving before it
+    finishes await the same task instead of starting their own. Nothing is cached
+    once the task completes.
+    """
+
+    def __init__(self, name: str):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._started = metrics.counter(f"{name}.started")
+        self._coalesced = metrics.counter(f"{name}.coalesced")
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            self._started.inc()
+        else:
+            self._coalesced.inc()
+        # shield so one cancelled caller does not cancel the computation for the others
+        return await asyncio.shield(task)
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
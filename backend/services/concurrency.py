@@ -0,0 +1,106 @@
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from ..config import settings
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Blocking network / database work started from async handlers
+io_pool = ThreadPoolExecutor(max_workers=settings.IO_POOL_SIZE, thread_name_prefix="io")
+
+async def run_io(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking call on the I/O pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_pool, functools.partial(fn, *args, **kwargs))
+
+def configure_threadpool():
+    """Size the anyio pool FastAPI uses for plain `def` handlers and dependencies"""
+    from anyio import to_thread
+
+    to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+
+class PeriodicJob:
+    """Run a blocking function on the I/O pool every `interval` seconds.
+
+    With run_at_start the first run happens as soon as the job starts, so
+    in-memory state loads in the background instead of delaying startup; ready
+    turns true once a run has succeeded.
+    """
+
+    def __init__(self, name: str, interval: float, fn: Callable[[], Any], run_at_start: bool = False):
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self.run_at_start = run_at_start
+        self.ready = not run_at_start
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        if self.run_at_start:
+            await self._run_once()
+        while True:
+            await asyncio.sleep(self.interval)
+            await self._run_once()
+
+    async def _run_once(self):
+        try:
+            await run_io(self.fn)
+            self.ready = True
+        except Exception:
+            logger.exception("Periodic job %s failed", self.name)
+
+class LoopLagMonitor:
+    """Measure how late the event loop wakes up from a fixed-interval sleep.
+
+    Any lag beyond the interval is time the loop spent running something else
+    without yielding, i.e. how long it was blocked.
+    """
+
+    def __init__(self, interval: float, warn_threshold: float):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._blocked = metrics.counter("event_loop.blocked")
+        self._task: Optional[asyncio.Task] = None
+        metrics.gauge("event_loop.lag_ms", lambda: round(self.last_lag * 1000, 3))
+        metrics.gauge("event_loop.max_lag_ms", lambda: round(self.max_lag * 1000, 3))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.warn_threshold:
+                self._blocked.inc()
+                logger.warning("Event loop was blocked for %.1f ms", lag * 1000)
+
+loop_lag_monitor = LoopLagMonitor(
+    interval=settings.LOOP_LAG_INTERVAL_SECONDS,
+    warn_threshold=settings.LOOP_LAG_WARN_SECONDS,
+)
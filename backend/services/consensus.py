@@ -0,0 +1,122 @@
+import calendar
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import Integer, cast, extract, func, select
+
+from ..database import SessionLocal
+from ..models import Prediction, PredictionDirection
+from . import metrics
+
+BUCKET_SECONDS = 300
+# Windows served by the consensus endpoint, in buckets
+WINDOWS = {"24h": 24 * 3600 // BUCKET_SECONDS, "7d": 7 * 24 * 3600 // BUCKET_SECONDS}
+RETAINED_BUCKETS = max(WINDOWS.values())
+
+BULLISH, BEARISH, NEUTRAL, CONFIDENCE = range(4)
+DIRECTION_SLOT = {PredictionDirection.UP: BULLISH, PredictionDirection.DOWN: BEARISH, PredictionDirection.NEUTRAL: NEUTRAL}
+
+def _bucket(moment: datetime) -> int:
+    # Naive datetimes are UTC throughout the app
+    return calendar.timegm(moment.utctimetuple()) // BUCKET_SECONDS
+
+class CrowdConsensus:
+    """Rolling per-ticker counts of bullish, bearish and neutral predictions.
+
+    Each ticker keeps only the 5-minute buckets that saw predictions in the
+    retained 7 days, as [bullish, bearish, neutral, confidence sum]. Writes add to
+    the current bucket; a read sums the buckets inside its window, so it costs
+    O(buckets) and never touches the database. rebuild() reloads the buckets
+    from one grouped query, at startup and periodically for other workers' writes.
+    Buckets written to while its query runs keep their live counts until the
+    next rebuild, so no write is lost to the swap.
+    """
+
+    def __init__(self):
+        self._tickers: Dict[str, Dict[int, List[float]]] = {}
+        self._lock = threading.Lock()
+        # (ticker, bucket) pairs recorded during a rebuild; None when none is running
+        self._touched: Optional[Set[Tuple[str, int]]] = None
+        self._rebuild_ms = metrics.histogram("consensus.rebuild_ms")
+        metrics.gauge("consensus.tickers", lambda: len(self._tickers))
+
+    def record(self, ticker: str, created_at: datetime, direction: PredictionDirection, confidence: float, count: int = 1):
+        bucket = _bucket(created_at)
+        with self._lock:
+            buckets = self._tickers.setdefault(ticker, {})
+            counts = buckets.get(bucket)
+            if counts is None:
+                counts = buckets[bucket] = [0, 0, 0, 0.0]
+                if len(buckets) > RETAINED_BUCKETS:
+                    self._prune(buckets, bucket)
+            counts[DIRECTION_SLOT[direction]] += count
+            counts[CONFIDENCE] += confidence * count
+            if self._touched is not None:
+                self._touched.add((ticker, bucket))
+
+    def get(self, ticker: str, window: str = "24h", now: Optional[datetime] = None) -> dict:
+        oldest = _bucket(now or datetime.utcnow()) - WINDOWS[window] + 1
+        totals = [0, 0, 0, 0.0]
+        with self._lock:
+            for bucket, counts in self._tickers.get(ticker, {}).items():
+                if bucket >= oldest:
+                    for slot in range(4):
+                        totals[slot] += counts[slot]
+        bullish, bearish, neutral, confidence = totals
+        total = bullish + bearish + neutral
+        return {
+            "ticker": ticker,
+            "window": window,
+            "bullish_percentage": round(bullish / total * 100, 1) if total else 0.0,
+            "bearish_percentage": round(bearish / total * 100, 1) if total else 0.0,
+            "neutral_percentage": round(neutral / total * 100, 1) if total else 0.0,
+            "total_predictions": total,
+            "average_confidence": round(confidence / total, 3) if total else 0.0
+        }
+
+    def rebuild(self):
+        started = time.perf_counter()
+        with self._lock:
+            self._touched = set()
+        try:
+            tickers = self._load()
+            with self._lock:
+                # The query may or may not have seen these writes; the live bucket has them for sure
+                for ticker, bucket_id in self._touched:
+                    live = self._tickers.get(ticker, {}).get(bucket_id)
+                    if live is not None:
+                        tickers.setdefault(ticker, {})[bucket_id] = live
+                self._tickers = tickers
+        finally:
+            with self._lock:
+                self._touched = None
+        self._rebuild_ms.observe((time.perf_counter() - started) * 1000)
+
+    def _load(self) -> Dict[str, Dict[int, List[float]]]:
+        since = datetime.utcnow() - timedelta(seconds=RETAINED_BUCKETS * BUCKET_SECONDS)
+        bucket = cast(extract("epoch", Prediction.created_at), Integer) // BUCKET_SECONDS
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(Prediction.ticker, bucket, Prediction.direction, func.count(), func.sum(Prediction.confidence))
+                .where(Prediction.created_at >= since)
+                .group_by(Prediction.ticker, bucket, Prediction.direction)
+            ).all()
+        finally:
+            db.close()
+
+        tickers: Dict[str, Dict[int, List[float]]] = {}
+        for ticker, bucket_id, direction, count, confidence in rows:
+            counts = tickers.setdefault(ticker, {}).setdefault(int(bucket_id), [0, 0, 0, 0.0])
+            counts[DIRECTION_SLOT[direction]] += count
+            counts[CONFIDENCE] += confidence or 0.0
+        return tickers
+
+    @staticmethod
+    def _prune(buckets: Dict[int, List[float]], current: int):
+        for stale in [bucket for bucket in buckets if bucket <= current - RETAINED_BUCKETS]:
+            del buckets[stale]
+
+crowd_consensus = CrowdConsensus()
\ No newline at end of file
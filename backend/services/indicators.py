@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+from typing import Dict, List, Tuple
+
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Bars fed to the engine per ticker; enough for the 50-bar average and for
+# the Wilder/EMA recursions to settle
+HISTORY_BARS = 252
+# About three months of daily bars, the range used for price position and volume ratio
+LOOKBACK_BARS = 63
+
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+BOLLINGER_PERIOD = 20
+BOLLINGER_WIDTH = 2.0
+VOLATILITY_PERIOD = 20
+
+# Feature name -> decimals; NaN features are left out of the feature dict
+FEATURE_ROUNDING = {
+    "rsi": 2,
+    "ma_20": 2,
+    "ma_50": 2,
+    "ema_12": 2,
+    "ema_26": 2,
+    "macd": 4,
+    "macd_signal": 4,
+    "macd_hist": 4,
+    "bb_upper": 2,
+    "bb_lower": 2,
+    "atr": 4,
+    "volume_ratio": 2,
+    "price_position": 2,
+    "current_price": 2,
+    "volatility": 4,
+}
+
+def stack_bars(
+    bars_by_ticker: Dict[str, np.ndarray], length: int = HISTORY_BARS
+) -> Tuple[List[str], Dict[str, np.ndarray], np.ndarray]:
+    """Right-align the last `length` bars of each ticker into (tickers x length) arrays.
+
+    Tickers with shorter histories are NaN-padded on the left so the last column
+    is always each ticker's latest bar. Returns the ticker order, the OHLCV arrays
+    and each ticker's last bar timestamp.
+    """
+    tickers = list(bars_by_ticker)
+    fields = ("open", "high", "low", "close", "volume")
+    arrays = {field: np.full((len(tickers), length), np.nan) for field in fields}
+    last_ts = np.zeros(len(tickers), dtype="i8")
+    for i, ticker in enumerate(tickers):
+        bars = bars_by_ticker[ticker][-length:]
+        if len(bars) == 0:
+            continue
+        for field in fields:
+            arrays[field][i, length - len(bars):] = bars[field]
+        last_ts[i] = bars["ts"][-1]
+    return tickers, arrays, last_ts
+
+def _shift(x: np.ndarray) -> np.ndarray:
+    """Previous value along the time axis (NaN for the first column)"""
+    out = np.empty_like(x)
+    out[:, 0] = np.nan
+    out[:, 1:] = x[:, :-1]
+    return out
+
+def _rolling_mean(x: np.ndarray, window: int, min_periods: int = None) -> np.ndarray:
+    min_periods = window if min_periods is None else min_periods
+    valid = ~np.isnan(x)
+    sums = np.cumsum(np.where(valid, x, 0.0), axis=1)
+    counts = np.cumsum(valid, axis=1)
+    sums[:, window:] -= sums[:, :-window].copy()
+    counts[:, window:] -= counts[:, :-window].copy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = sums / counts
+    return np.where(counts >= max(min_periods, 1), mean, np.nan)
+
+def _rolling_std(x: np.ndarray, window: int) -> np.ndarray:
+    mean = _rolling_mean(x, window)
+    mean_sq = _rolling_mean(x * x, window)
+    return np.sqrt(np.maximum(mean_sq - mean * mean, 0.0))
+
+def _rolling_extreme(x: np.ndarray, window: int, reducer) -> np.ndarray:
+    """Rolling fmax/fmin in O(1) per element (van Herk/Gil-Werman block prefix/suffix scans).
+
+    NaNs are ignored; windows that are all NaN stay NaN.
+    """
+    n, length = x.shape
+    blocks = -(-(length + window - 1) // window)
+    padded = np.full((n, blocks * window), np.nan)
+    padded[:, window - 1:window - 1 + length] = x
+    grouped = padded.reshape(n, blocks, window)
+    prefix = reducer.accumulate(grouped, axis=2).reshape(n, -1)
+    suffix = reducer.accumulate(grouped[:, :, ::-1], axis=2)[:, :, ::-1].reshape(n, -1)
+    # The window ending at padded index j starts at j - window + 1
+    ends = np.arange(window - 1, window - 1 + length)
+    return reducer(suffix[:, ends - window + 1], prefix[:, ends])
+
+def _smooth(x: np.ndarray, period: int, alpha: float) -> np.ndarray:
+    """Exponential smoothing along time, seeded with the simple mean of the first `period` values.
+
+    Each ticker starts at its own first non-NaN value and NaNs carry the previous
+    average forward. Values are NaN until a ticker has `period` observations.
+    Wilder smoothing is alpha = 1/period, the usual EMA is alpha = 2/(period+1).
+    """
+    n, length = x.shape
+    # Time-major copies so each step works on contiguous memory
+    xs = np.ascontiguousarray(x.T)
+    out = np.empty((length, n))
+    avg = np.zeros(n)
+    seen = np.zeros(n)
+    for t in range(length):
+        xt = xs[t]
+        valid = ~np.isnan(xt)
+        seen += valid
+        weight = np.where(seen <= period, 1.0 / np.maximum(seen, 1.0), alpha)
+        avg = np.where(valid, avg + weight * (np.where(valid, xt, 0.0) - avg), avg)
+        out[t] = np.where(seen >= period, avg, np.nan)
+    return out.T
+
+def _wilder(x: np.ndarray, period: int) -> np.ndarray:
+    return _smooth(x, period, 1.0 / period)
+
+def _ema(x: np.ndarray, period: int) -> np.ndarray:
+    return _smooth(x, period, 2.0 / (period + 1))
+
+def compute_indicators(
+    close: np.ndarray, high: np.ndarray, low: np.ndarray, volume: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """Indicator series for (tickers x time) OHLCV arrays, all computed across tickers at once"""
+    prev_close = _shift(close)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Wilder RSI
+        delta = close - prev_close
+        avg_gain = _wilder(np.maximum(delta, 0.0), RSI_PERIOD)
+        avg_loss = _wilder(np.maximum(-delta, 0.0), RSI_PERIOD)
+        rsi = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+        rsi = np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), rsi)
+
+        # Moving averages and MACD
+        ma_20 = _rolling_mean(close, 20)
+        ma_50 = _rolling_mean(close, 50)
+        ema_12 = _ema(close, 12)
+        ema_26 = _ema(close, 26)
+        macd = ema_12 - ema_26
+        macd_signal = _ema(macd, 9)
+
+        # Bollinger bands
+        bb_middle = _rolling_mean(close, BOLLINGER_PERIOD)
+        bb_std = _rolling_std(close, BOLLINGER_PERIOD)
+
+        # Wilder ATR over the true range
+        true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+        atr = _wilder(true_range, ATR_PERIOD)
+
+        # Volume and price relative to the last three months
+        volume_ratio = volume / _rolling_mean(volume, LOOKBACK_BARS, min_periods=1)
+        volume_ratio = np.where(np.isinf(volume_ratio), np.nan, volume_ratio)
+        low_3m = _rolling_extreme(close, LOOKBACK_BARS, np.fmin)
+        high_3m = _rolling_extreme(close, LOOKBACK_BARS, np.fmax)
+        price_position = (close - low_3m) / (high_3m - low_3m)
+        price_position = np.where(high_3m > low_3m, price_position, np.nan)
+
+        # Realized volatility of daily log returns
+        log_returns = np.log(close / prev_close)
+        volatility = _rolling_std(log_returns, VOLATILITY_PERIOD)
+
+    return {
+        "rsi": rsi,
+        "ma_20": ma_20,
+        "ma_50": ma_50,
+        "ema_12": ema_12,
+        "ema_26": ema_26,
+        "macd": macd,
+        "macd_signal": macd_signal,
+        "macd_hist": macd - macd_signal,
+        "bb_upper": bb_middle + BOLLINGER_WIDTH * bb_std,
+        "bb_lower": bb_middle - BOLLINGER_WIDTH * bb_std,
+        "atr": atr,
+        "volume_ratio": volume_ratio,
+        "price_position": price_position,
+        "current_price": close,
+        "volatility": volatility,
+    }
+
+def latest_features(indicators: Dict[str, np.ndarray]) -> List[dict]:
+    """Feature dicts (as consumed by generate_prediction) from the last column of each series"""
+    columns = {name: indicators[name][:, -1] for name in FEATURE_ROUNDING}
+    n = len(columns["current_price"])
+    features = []
+    for i in range(n):
+        row = {}
+        for name, decimals in FEATURE_ROUNDING.items():
+            value = columns[name][i]
+            if not np.isnan(value):
+                row[name] = round(float(value), decimals)
+        features.append(row)
+    return features
+
+def features_for_bars(bars_by_ticker: Dict[str, np.ndarray]) -> Dict[str, dict]:
+    """Latest feature dict per ticker; tickers without a current price are left out"""
+    if not bars_by_ticker:
+        return {}
+    tickers, arrays, _ = stack_bars(bars_by_ticker)
+    indicators = compute_indicators(arrays["close"], arrays["high"], arrays["low"], arrays["volume"])
+    return {
+        ticker: row
+        for ticker, row in zip(tickers, latest_features(indicators))
+        if "current_price" in row
+    }
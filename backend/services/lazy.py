@@ -0,0 +1,21 @@
+import importlib.util
+import sys
+
+def lazy_import(name: str):
+    """Module whose import runs on first attribute access instead of now.
+
+    Keeps heavy dependencies (numpy and the like) off the startup path; the first
+    request that actually needs one pays the import instead.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
\ No newline at end of file
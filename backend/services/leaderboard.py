@@ -0,0 +1,254 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import case, func, select
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import Prediction, PredictionOutcome
+from . import metrics
+
+# Rolling windows in days; None is all-time
+TIMEFRAMES = {"week": 7, "month": 30, "all": None}
+# Accuracy is ranked in basis points, so users within 0.01% share a rank
+SCORE_SCALE = 10000
+
+def is_hit(outcome: PredictionOutcome) -> bool:
+    return outcome == PredictionOutcome.HIT_TARGET
+
+class Fenwick:
+    """Counts per score with O(log n) updates, prefix sums and k-th smallest lookups"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._tree = [0] * (size + 1)
+        self._top = 1 << size.bit_length()
+
+    def add(self, index: int, delta: int):
+        index += 1
+        while index <= self.size:
+            self._tree[index] += delta
+            index += index & -index
+
+    def prefix(self, index: int) -> int:
+        """Sum of counts at scores 0..index"""
+        total = 0
+        index += 1
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+    def find(self, k: int) -> int:
+        """Smallest score whose prefix sum reaches k (1-based)"""
+        position = 0
+        step = self._top
+        while step:
+            nxt = position + step
+            if nxt <= self.size and self._tree[nxt] < k:
+                position = nxt
+                k -= self._tree[nxt]
+            step >>= 1
+        return position
+
+class Standing(NamedTuple):
+    user_id: int
+    rank: int
+    hits: int
+    total: int
+    accuracy: float
+
+class Ranking:
+    """Qualified users of one timeframe ordered by accuracy.
+
+    A Fenwick tree counts users per accuracy score, so a user's rank is one prefix
+    sum and moving a user is two point updates. Ties share a rank; listings order
+    them by number of predictions.
+    """
+
+    def __init__(self, min_predictions: int):
+        self.min_predictions = min_predictions
+        self.count = 0
+        self._tree = Fenwick(SCORE_SCALE + 1)
+        self._scores: Dict[int, Tuple[int, int, int]] = {}  # user -> (score, hits, total)
+        self._members: Dict[int, Set[int]] = {}
+
+    def update(self, user_id: int, hits: int, total: int):
+        old = self._scores.pop(user_id, None)
+        if old is not None:
+            self._tree.add(old[0], -1)
+            self._members[old[0]].discard(user_id)
+            self.count -= 1
+        if total >= self.min_predictions:
+            score = hits * SCORE_SCALE // total
+            self._scores[user_id] = (score, hits, total)
+            self._tree.add(score, 1)
+            self._members.setdefault(score, set()).add(user_id)
+            self.count += 1
+
+    def standing(self, user_id: int) -> Optional[Standing]:
+        entry = self._scores.get(user_id)
+        if entry is None:
+            return None
+        score, hits, total = entry
+        return Standing(user_id, self._rank(score), hits, total, hits / total)
+
+    def top(self, limit: int, offset: int = 0) -> List[Standing]:
+        standings: List[Standing] = []
+        if offset >= self.count:
+            return standings
+        # Score holding the (offset + 1)-th best user, then walk down the non-empty scores
+        score = self._tree.find(self.count - offset)
+        skip = offset - (self.count - self._tree.prefix(score))
+        while len(standings) < limit:
+            rank = self._rank(score)
+            members = sorted(self._members[score], key=lambda user: (-self._scores[user][2], user))
+            for user_id in members[skip:limit - len(standings) + skip]:
+                _, hits, total = self._scores[user_id]
+                standings.append(Standing(user_id, rank, hits, total, hits / total))
+            skip = 0
+            below = self._tree.prefix(score - 1) if score > 0 else 0
+            if below == 0:
+                break
+            score = self._tree.find(below)
+        return standings
+
+    def _rank(self, score: int) -> int:
+        return self.count - self._tree.prefix(score) + 1
+
+class Leaderboard:
+    """Accuracy rankings per timeframe, kept current as predictions are resolved.
+
+    Resolved predictions are counted per user in daily buckets; week and month
+    totals are the sum of the buckets still inside their window and are adjusted
+    as days fall out of it, all-time totals only grow. Every change re-ranks just
+    the affected users. rebuild() reloads everything from the database with two
+    grouped queries, at startup and periodically to include other workers' writes.
+    """
+
+    def __init__(self, min_predictions: int):
+        self.min_predictions = min_predictions
+        self._lock = threading.Lock()
+        self._reset(datetime.utcnow().date())
+        self._rebuild_ms = metrics.histogram("leaderboard.rebuild_ms")
+        self._recorded = metrics.counter("leaderboard.recorded")
+        metrics.gauge("leaderboard.ranked_users", lambda: self._rankings["all"].count)
+
+    def record(self, outcomes: Iterable[Tuple[int, datetime, bool]]):
+        """Count newly resolved predictions given as (user_id, resolved_at, hit)"""
+        with self._lock:
+            self._advance(datetime.utcnow().date())
+            changed = set()
+            for user_id, resolved_at, hit in outcomes:
+                self._add(user_id, resolved_at.date(), int(hit), 1)
+                changed.add(user_id)
+                self._recorded.inc()
+            for user_id in changed:
+                self._rerank(user_id)
+
+    def top(self, timeframe: str, limit: int, offset: int = 0) -> List[Standing]:
+        with self._lock:
+            self._advance(datetime.utcnow().date())
+            return self._rankings[timeframe].top(limit, offset)
+
+    def standing(self, timeframe: str, user_id: int) -> Optional[Standing]:
+        with self._lock:
+            self._advance(datetime.utcnow().date())
+            return self._rankings[timeframe].standing(user_id)
+
+    def counts(self, timeframe: str, user_id: int) -> Tuple[int, int]:
+        """(hits, total) of user_id in the timeframe, ranked or not"""
+        with self._lock:
+            self._advance(datetime.utcnow().date())
+            hits, total = self._totals[timeframe].get(user_id, (0, 0))
+            return hits, total
+
+    def ranked_users(self, timeframe: str) -> int:
+        return self._rankings[timeframe].count
+
+    def rebuild(self):
+        started = time.perf_counter()
+        today = datetime.utcnow().date()
+        oldest = today - timedelta(days=max(days for days in TIMEFRAMES.values() if days) - 1)
+        hit = func.sum(case((Prediction.outcome == PredictionOutcome.HIT_TARGET, 1), else_=0))
+        resolved_day = func.date(Prediction.resolved_at)
+        db = SessionLocal()
+        try:
+            all_time = db.execute(
+                select(Prediction.user_id, hit, func.count())
+                .where(Prediction.resolved_at.isnot(None))
+                .group_by(Prediction.user_id)
+            ).all()
+            daily = db.execute(
+                select(Prediction.user_id, resolved_day, hit, func.count())
+                .where(Prediction.resolved_at >= datetime.combine(oldest, datetime.min.time()))
+                .group_by(Prediction.user_id, resolved_day)
+            ).all()
+        finally:
+            db.close()
+
+        with self._lock:
+            self._reset(today)
+            for user_id, hits, total in all_time:
+                self._totals["all"][user_id] = [int(hits or 0), total]
+            for user_id, day, hits, total in daily:
+                if isinstance(day, str):
+                    day = date.fromisoformat(day)
+                self._add(user_id, day, int(hits or 0), total, all_time=False)
+            for user_id in self._totals["all"]:
+                self._rerank(user_id)
+        self._rebuild_ms.observe((time.perf_counter() - started) * 1000)
+
+    def _reset(self, today: date):
+        self._today = today
+        self._days: Dict[date, Dict[int, List[int]]] = {}
+        self._totals: Dict[str, Dict[int, List[int]]] = {timeframe: {} for timeframe in TIMEFRAMES}
+        self._rankings = {timeframe: Ranking(self.min_predictions) for timeframe in TIMEFRAMES}
+
+    def _add(self, user_id: int, day: date, hits: int, total: int, all_time: bool = True):
+        age = (self._today - day).days
+        for timeframe, days in TIMEFRAMES.items():
+            if days is None and not all_time:
+                continue
+            if days is None or 0 <= age < days:
+                counts = self._totals[timeframe].setdefault(user_id, [0, 0])
+                counts[0] += hits
+                counts[1] += total
+        if 0 <= age < TIMEFRAMES["month"]:
+            counts = self._days.setdefault(day, {}).setdefault(user_id, [0, 0])
+            counts[0] += hits
+            counts[1] += total
+
+    def _advance(self, today: date):
+        """Take the days that left a window out of its totals and re-rank the users involved"""
+        if today <= self._today:
+            return
+        changed = set()
+        for day, users in list(self._days.items()):
+            for timeframe, days in TIMEFRAMES.items():
+                if days is None:
+                    continue
+                # Inside the window before the move, outside after it
+                if (self._today - day).days < days <= (today - day).days:
+                    totals = self._totals[timeframe]
+                    for user_id, (hits, total) in users.items():
+                        counts = totals[user_id]
+                        counts[0] -= hits
+                        counts[1] -= total
+                        if counts[1] <= 0:
+                            del totals[user_id]
+                        changed.add(user_id)
+            if (today - day).days >= TIMEFRAMES["month"]:
+                del self._days[day]
+        self._today = today
+        for user_id in changed:
+            self._rerank(user_id)
+
+    def _rerank(self, user_id: int):
+        for timeframe, ranking in self._rankings.items():
+            hits, total = self._totals[timeframe].get(user_id, (0, 0))
+            ranking.update(user_id, hits, total)
+
+leaderboard = Leaderboard(min_predictions=settings.LEADERBOARD_MIN_PREDICTIONS)
\ No newline at end of file
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import csv
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+
+from ..config import settings
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# One row per daily bar; ts is the bar open in UTC epoch seconds. Kept as the
+# field list (accepted anywhere numpy takes a dtype) so numpy is not needed at import
+BAR_DTYPE = [
+    ("ts", "i8"),
+    ("open", "f8"),
+    ("high", "f8"),
+    ("low", "f8"),
+    ("close", "f8"),
+    ("volume", "f8"),
+]
+
+def empty_bars() -> np.ndarray:
+    return np.empty(0, dtype=BAR_DTYPE)
+
+class BarProvider:
+    """Source of daily OHLCV bars for the bar store"""
+    name = "base"
+
+    def fetch(self, ticker: str, start: Optional[datetime] = None) -> np.ndarray:
+        """Return bars for ticker from start (inclusive), or the default backfill when start is None"""
+        raise NotImplementedError
+
+    def fetch_many(self, tickers: Iterable[str], start: Optional[datetime] = None) -> Dict[str, np.ndarray]:
+        return {ticker: self.fetch(ticker, start) for ticker in tickers}
+
+class YFinanceProvider(BarProvider):
+    """Bars downloaded from Yahoo Finance"""
+    name = "yfinance"
+
+    def __init__(self, backfill_period: str = "1y"):
+        self.backfill_period = backfill_period
+
+    def fetch(self, ticker: str, start: Optional[datetime] = None) -> np.ndarray:
+        import yfinance as yf
+
+        stock = yf.Ticker(ticker)
+        if start is None:
+            hist = stock.history(period=self.backfill_period)
+        else:
+            hist = stock.history(start=start.strftime("%Y-%m-%d"))
+        return _frame_to_bars(hist)
+
+    def fetch_many(self, tickers: Iterable[str], start: Optional[datetime] = None) -> Dict[str, np.ndarray]:
+        import yfinance as yf
+
+        tickers = list(tickers)
+        if not tickers:
+            return {}
+        if len(tickers) == 1:
+            return {tickers[0]: self.fetch(tickers[0], start)}
+        # One bulk download instead of a request per ticker
+        kwargs = {"period": self.backfill_period} if start is None else {"start": start.strftime("%Y-%m-%d")}
+        data = yf.download(
+            tickers, group_by="ticker", auto_adjust=True, threads=True, progress=False, **kwargs
+        )
+        if data is None or data.empty:
+            return {ticker: empty_bars() for ticker in tickers}
+
+        result = {}
+        for ticker in tickers:
+            if data.columns.nlevels > 1:
+                hist = data[ticker] if ticker in data.columns.get_level_values(0) else None
+            else:
+                hist = data
+            result[ticker] = _frame_to_bars(hist)
+        return result
+
+def _frame_to_bars(hist) -> np.ndarray:
+    if hist is None or hist.empty:
+        return empty_bars()
+    hist = hist.dropna(subset=["Close"])
+    bars = np.empty(len(hist), dtype=BAR_DTYPE)
+    # asi8 is nanoseconds since the epoch in UTC, also for tz-aware indexes
+    bars["ts"] = hist.index.asi8 // 10**9
+    bars["open"] = hist["Open"].to_numpy(dtype="f8")
+    bars["high"] = hist["High"].to_numpy(dtype="f8")
+    bars["low"] = hist["Low"].to_numpy(dtype="f8")
+    bars["close"] = hist["Close"].to_numpy(dtype="f8")
+    bars["volume"] = hist["Volume"].to_numpy(dtype="f8")
+    return bars
+
+class FixtureProvider(BarProvider):
+    """Bars read from <directory>/<TICKER>.csv files (Date,Open,High,Low,Close,Volume)"""
+    name = "fixture"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def fetch(self, ticker: str, start: Optional[datetime] = None) -> np.ndarray:
+        path = os.path.join(self.directory, f"{ticker}.csv")
+        if not os.path.exists(path):
+            return empty_bars()
+
+        rows = []
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                ts = datetime.fromisoformat(row["Date"])
+                if ts.tzinfo is None:
+                    ts = ts.replace(tzinfo=timezone.utc)
+                rows.append((
+                    int(ts.timestamp()),
+                    float(row["Open"]),
+                    float(row["High"]),
+                    float(row["Low"]),
+                    float(row["Close"]),
+                    float(row["Volume"]),
+                ))
+
+        bars = np.array(rows, dtype=BAR_DTYPE)
+        bars.sort(order="ts")
+        if start is not None:
+            if start.tzinfo is None:
+                start = start.replace(tzinfo=timezone.utc)
+            bars = bars[bars["ts"] >= int(start.timestamp())]
+        return bars
+
+def get_provider(name: str) -> BarProvider:
+    if name == "fixture":
+        return FixtureProvider(settings.BAR_FIXTURE_DIR)
+    if name == "yfinance":
+        return YFinanceProvider(settings.BAR_STORE_BACKFILL_PERIOD)
+    raise ValueError(f"Unknown bar provider: {name}")
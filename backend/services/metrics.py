@@ -0,0 +1,98 @@
+import bisect
+import threading
+from typing import Callable, Dict, Sequence
+
+class Counter:
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+class Histogram:
+    """Bucketed observations; quantiles are reported as the upper bound of the bucket they fall in"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        labels = [str(bound) for bound in self.buckets] + ["+Inf"]
+        return {
+            "count": count,
+            "sum": round(total, 3),
+            "mean": round(total / count, 3) if count else 0.0,
+            "p50": self._quantile(counts, count, 0.5),
+            "p95": self._quantile(counts, count, 0.95),
+            "p99": self._quantile(counts, count, 0.99),
+            "buckets": dict(zip(labels, counts)),
+        }
+
+    def _quantile(self, counts, count: int, q: float):
+        """Upper bound of the bucket holding the q-quantile (None when it is the overflow bucket)"""
+        if count == 0:
+            return 0.0
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= q * count:
+                return self.buckets[index] if index < len(self.buckets) else None
+        return None
+
+LATENCY_MS_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_counters: Dict[str, Counter] = {}
+_histograms: Dict[str, Histogram] = {}
+_gauges: Dict[str, Callable[[], float]] = {}
+_registry_lock = threading.Lock()
+
+def counter(name: str) -> Counter:
+    """Return the process-wide counter registered under name, creating it on first use"""
+    with _registry_lock:
+        metric = _counters.get(name)
+        if metric is None:
+            metric = _counters[name] = Counter()
+        return metric
+
+def histogram(name: str, buckets: Sequence[float] = LATENCY_MS_BUCKETS) -> Histogram:
+    """Return the process-wide histogram registered under name, creating it on first use"""
+    with _registry_lock:
+        metric = _histograms.get(name)
+        if metric is None:
+            metric = _histograms[name] = Histogram(buckets)
+        return metric
+
+def gauge(name: str, fn: Callable[[], float]):
+    """Register a callback whose value is read when metrics are exported"""
+    with _registry_lock:
+        _gauges[name] = fn
+
+def snapshot() -> dict:
+    with _registry_lock:
+        counters = dict(_counters)
+        histograms = dict(_histograms)
+        gauges = dict(_gauges)
+    return {
+        "counters": {name: metric.value for name, metric in sorted(counters.items())},
+        "gauges": {name: fn() for name, fn in sorted(gauges.items())},
+        "histograms": {name: metric.snapshot() for name, metric in sorted(histograms.items())},
+    }
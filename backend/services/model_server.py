@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+
+from . import metrics
+from .concurrency import run_io
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+# Model input: one row per request with these features in this order (missing -> 0)
+MODEL_FEATURES = [
+    "rsi",
+    "ma_20",
+    "ma_50",
+    "ema_12",
+    "ema_26",
+    "macd",
+    "macd_signal",
+    "macd_hist",
+    "bb_upper",
+    "bb_lower",
+    "atr",
+    "volume_ratio",
+    "price_position",
+    "current_price",
+    "volatility",
+]
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+class ModelServer:
+    """Serves the prediction model with micro-batched inference.
+
+    The model is loaded once per process (at startup or on first use). Concurrent
+    predict() calls are queued and gathered into batches of up to max_batch_size
+    requests, waiting at most max_wait_ms for a batch to fill, and each batch runs
+    on the I/O pool. When no model file is available the heuristic fallback is used.
+    The model is expected to map a (batch, len(MODEL_FEATURES)) float32 array to the
+    probability of an up move per row.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        model_version: str,
+        fallback: Callable[[str, str, dict], dict],
+        finalize: Callable[[float, dict], dict],
+        max_batch_size: int,
+        max_wait_ms: float,
+    ):
+        self.model_path = model_path
+        self.model_version = model_version
+        self.fallback = fallback
+        self.finalize = finalize
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.model = None
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._latency = metrics.histogram("model.latency_ms")
+        self._batch_size = metrics.histogram("model.batch_size", BATCH_SIZE_BUCKETS)
+        self._fallbacks = metrics.counter("model.fallback_predictions")
+
+    @property
+    def version(self) -> str:
+        """Version of whatever currently produces predictions (model or heuristic)"""
+        if self.model is None:
+            return f"{self.model_version}+heuristic"
+        return self.model_version
+
+    def load(self):
+        with self._load_lock:
+            if self._loaded:
+                return
+            if os.path.exists(self.model_path):
+                try:
+                    from tensorflow import keras
+
+                    self.model = keras.models.load_model(self.model_path, compile=False)
+                    logger.info("Loaded model %s from %s", self.model_version, self.model_path)
+                except Exception:
+                    logger.exception("Failed to load model from %s, using heuristic", self.model_path)
+            else:
+                logger.warning("No model at %s, using heuristic predictions", self.model_path)
+            self._loaded = True
+
+    async def ensure_loaded(self):
+        if not self._loaded:
+            await run_io(self.load)
+
+    async def predict(self, ticker: str, timeframe: str, features: dict) -> dict:
+        started = time.perf_counter()
+        await self.ensure_loaded()
+        if self.model is None:
+            self._fallbacks.inc()
+            result = self.fallback(ticker, timeframe, features)
+        else:
+            if self._worker is None or self._worker.done():
+                self._queue = asyncio.Queue()
+                self._worker = asyncio.get_running_loop().create_task(self._run_batches())
+            future = asyncio.get_running_loop().create_future()
+            await self._queue.put((features, future))
+            result = await future
+        self._latency.observe((time.perf_counter() - started) * 1000)
+        return result
+
+    def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+    async def _run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self._batch_size.observe(len(batch))
+            features = [item[0] for item in batch]
+            try:
+                probabilities = await run_io(self._infer, features)
+            except Exception as exc:
+                logger.exception("Model inference failed for a batch of %d", len(batch))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            for (row, future), probability in zip(batch, probabilities):
+                if not future.done():
+                    future.set_result(self.finalize(float(probability), row))
+
+    def _infer(self, features: List[dict]) -> np.ndarray:
+        inputs = np.array(
+            [[row.get(name, 0.0) for name in MODEL_FEATURES] for row in features],
+            dtype="float32"
+        )
+        outputs = self.model.predict(inputs, verbose=0)
+        return np.clip(np.asarray(outputs, dtype="float64").reshape(len(features), -1)[:, 0], 0.0, 1.0)
@@ -0,0 +1,312 @@
+import csv
+import io
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.engine import make_url
+
+from ..config import settings
+from ..database import engine
+from ..models import OptionsFlow
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("ticker", "strike", "expiry", "type", "volume", "open_interest", "premium", "is_unusual", "timestamp")
+OPTION_TYPES = ("call", "put")
+# Floor of the standard deviation used for z-scores, as a fraction of the mean
+MIN_SPREAD = 0.1
+
+class FlowPrint(NamedTuple):
+    ticker: str
+    strike: float
+    expiry: datetime
+    type: str
+    volume: int
+    open_interest: int
+    premium: float
+    timestamp: datetime
+
+def _parse_time(value: str) -> datetime:
+    moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    # Stored naive in UTC like every other timestamp in the app
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+def parse_print(record: dict) -> FlowPrint:
+    """FlowPrint from a CSV row or JSON object; raises ValueError on bad input"""
+    try:
+        option_type = str(record["type"]).lower()
+        if option_type not in OPTION_TYPES:
+            raise ValueError(f"type must be one of {', '.join(OPTION_TYPES)}")
+        timestamp = record.get("timestamp")
+        return FlowPrint(
+            ticker=str(record["ticker"]).upper(),
+            strike=float(record["strike"]),
+            expiry=_parse_time(str(record["expiry"])),
+            type=option_type,
+            volume=int(record["volume"]),
+            open_interest=int(record.get("open_interest") or 0),
+            premium=float(record["premium"]),
+            timestamp=_parse_time(str(timestamp)) if timestamp else datetime.utcnow()
+        )
+    except KeyError as exc:
+        raise ValueError(f"missing field {exc.args[0]}")
+
+class FlowFeed:
+    """Source of options flow prints for the ingestor"""
+    name = "base"
+
+    def read(self, max_prints: int) -> List[FlowPrint]:
+        """Up to max_prints prints available now; empty when there are none yet"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class FileReplayFeed(FlowFeed):
+    """Prints replayed from a CSV (with a header row) or NDJSON file, for local testing.
+
+    Columns are ticker, strike, expiry, type, volume, open_interest, premium and
+    timestamp. Malformed lines are counted and skipped. With loop the file starts
+    over at the end, which makes a steady synthetic feed.
+    """
+    name = "replay"
+
+    def __init__(self, path: str, loop: bool = False):
+        self.path = path
+        self.loop = loop
+        self.skipped = 0
+        self._records: Optional[Iterator[dict]] = None
+        self._file = None
+
+    def read(self, max_prints: int) -> List[FlowPrint]:
+        prints: List[FlowPrint] = []
+        while len(prints) < max_prints:
+            if self._records is None:
+                self._open()
+            record = next(self._records, None)
+            if record is None:
+                self.close()
+                if not self.loop:
+                    self._records = iter(())
+                    break
+                continue
+            try:
+                prints.append(parse_print(record))
+            except (TypeError, ValueError):
+                self.skipped += 1
+        return prints
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._records = None
+
+    def _open(self):
+        self._file = open(self.path, newline="")
+        if self.path.endswith((".ndjson", ".jsonl")):
+            self._records = (json.loads(line) for line in self._file if line.strip())
+        else:
+            self._records = iter(csv.DictReader(self._file))
+
+def get_feed(name: str, path: str = "") -> Optional[FlowFeed]:
+    if not name:
+        return None
+    if name == FileReplayFeed.name:
+        return FileReplayFeed(path)
+    raise ValueError(f"Unknown options flow feed: {name}")
+
+class UnusualActivityDetector:
+    """Rolling per-contract statistics that flag unusual prints.
+
+    Every contract (ticker, strike, expiry, type) keeps an exponentially weighted
+    mean and variance of its print volume and of volume / open interest. A print
+    is unusual when either z-score reaches the threshold once the contract has
+    seen min_samples prints, and always when one print trades more contracts
+    than the open interest. Both statistics are updated after scoring, so a
+    spike does not hide itself. The least recently traded contracts are evicted
+    beyond max_contracts.
+    """
+
+    def __init__(self, z_threshold: float, alpha: float, min_samples: int, max_contracts: int):
+        self.z_threshold = z_threshold
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.max_contracts = max_contracts
+        # contract -> [samples, volume mean, volume variance, ratio mean, ratio variance]
+        self._stats: "OrderedDict[tuple, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        metrics.gauge("options_flow.tracked_contracts", lambda: len(self._stats))
+
+    def score(self, prints: List[FlowPrint]) -> List[bool]:
+        alpha, threshold, min_samples = self.alpha, self.z_threshold, self.min_samples
+        flags = []
+        with self._lock:
+            stats = self._stats
+            for flow in prints:
+                key = (flow.ticker, flow.strike, flow.expiry, flow.type)
+                entry = stats.get(key)
+                if entry is None:
+                    entry = stats[key] = [0, 0.0, 0.0, 0.0, 0.0]
+                    if len(stats) > self.max_contracts:
+                        stats.popitem(last=False)
+                else:
+                    stats.move_to_end(key)
+                volume = flow.volume
+                ratio = volume / flow.open_interest if flow.open_interest > 0 else float(volume)
+                unusual = flow.open_interest > 0 and volume > flow.open_interest
+                if not unusual and entry[0] >= min_samples:
+                    unusual = (
+                        _z(volume, entry[1], entry[2]) >= threshold
+                        or _z(ratio, entry[3], entry[4]) >= threshold
+                    )
+                flags.append(unusual)
+                entry[0] += 1
+                entry[1], entry[2] = _ewm(volume, entry[1], entry[2], alpha, entry[0])
+                entry[3], entry[4] = _ewm(ratio, entry[3], entry[4], alpha, entry[0])
+        return flags
+
+def _z(value: float, mean: float, variance: float) -> float:
+    # A contract that always trades the same size would otherwise flag any change
+    spread = max(math.sqrt(variance), MIN_SPREAD * mean)
+    return (value - mean) / spread if spread > 0 else 0.0
+
+def _ewm(value: float, mean: float, variance: float, alpha: float, samples: int) -> Tuple[float, float]:
+    if samples == 1:
+        return value, 0.0
+    delta = value - mean
+    mean += alpha * delta
+    variance = (1 - alpha) * (variance + alpha * delta * delta)
+    return mean, variance
+
+class IngestReport(NamedTuple):
+    prints: int
+    unusual: int
+    batches: int
+    seconds: float
+
+    @property
+    def prints_per_second(self) -> float:
+        return self.prints / self.seconds if self.seconds else 0.0
+
+    def to_dict(self) -> dict:
+        return {**self._asdict(), "prints_per_second": round(self.prints_per_second, 1)}
+
+class FlowIngestor:
+    """Scores flow prints and bulk-loads them into options_flow.
+
+    Prints are written in batches of batch_size: with COPY on PostgreSQL and one
+    executemany INSERT elsewhere, never as ORM objects. Unusual prints are also
+    published to streaming subscribers of the ticker.
+    """
+
+    def __init__(self, detector: UnusualActivityDetector, batch_size: int, bind=engine):
+        self.detector = detector
+        self.batch_size = batch_size
+        self.bind = bind
+        self._copy = make_url(str(bind.url)).get_backend_name() == "postgresql"
+        self._ingested = metrics.counter("options_flow.ingested")
+        self._unusual = metrics.counter("options_flow.unusual")
+        self._batch_ms = metrics.histogram("options_flow.batch_ms")
+
+    def ingest(self, prints: List[FlowPrint]) -> int:
+        """Write prints in batches; returns how many were unusual"""
+        unusual = 0
+        for start in range(0, len(prints), self.batch_size):
+            unusual += self._write(prints[start:start + self.batch_size])
+        return unusual
+
+    def drain(self, feed: FlowFeed, max_prints: Optional[int] = None, progress=None) -> IngestReport:
+        """Ingest from feed until it has nothing more (or max_prints were read)"""
+        started = time.perf_counter()
+        total = unusual = batches = 0
+        while max_prints is None or total < max_prints:
+            limit = self.batch_size if max_prints is None else min(self.batch_size, max_prints - total)
+            prints = feed.read(limit)
+            if not prints:
+                break
+            unusual += self._write(prints)
+            total += len(prints)
+            batches += 1
+            if progress is not None:
+                progress(IngestReport(total, unusual, batches, time.perf_counter() - started))
+        report = IngestReport(total, unusual, batches, time.perf_counter() - started)
+        if total:
+            logger.info("Ingested options flow: %s", report.to_dict())
+        return report
+
+    def _write(self, prints: List[FlowPrint]) -> int:
+        started = time.perf_counter()
+        flags = self.detector.score(prints)
+        if self._copy:
+            self._copy_rows(prints, flags)
+        else:
+            with self.bind.begin() as connection:
+                connection.execute(insert(OptionsFlow.__table__), [
+                    {**flow._asdict(), "is_unusual": flag} for flow, flag in zip(prints, flags)
+                ])
+        unusual = sum(flags)
+        self._ingested.inc(len(prints))
+        self._unusual.inc(unusual)
+        self._batch_ms.observe((time.perf_counter() - started) * 1000)
+        if unusual:
+            self._publish(prints, flags)
+        return unusual
+
+    def _copy_rows(self, prints: List[FlowPrint], flags: List[bool]):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for flow, flag in zip(prints, flags):
+            writer.writerow((
+                flow.ticker, flow.strike, flow.expiry.isoformat(), flow.type, flow.volume,
+                flow.open_interest, flow.premium, "t" if flag else "f", flow.timestamp.isoformat()
+            ))
+        buffer.seek(0)
+        connection = self.bind.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY {OptionsFlow.__tablename__} ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer
+                )
+            connection.commit()
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _publish(prints: List[FlowPrint], flags: List[bool]):
+        from .stream import stream_broker
+
+        for flow, flag in zip(prints, flags):
+            if flag:
+                stream_broker.publish(flow.ticker, "options_flow", flow_entry(flow._asdict(), True))
+
+def flow_entry(row: Dict, is_unusual: bool) -> dict:
+    return {
+        "ticker": row["ticker"],
+        "strike": row["strike"],
+        "expiry": row["expiry"].date().isoformat(),
+        "type": row["type"],
+        "volume": row["volume"],
+        "open_interest": row["open_interest"],
+        "premium": row["premium"],
+        "is_unusual": is_unusual,
+        "timestamp": row["timestamp"]
+    }
+
+unusual_detector = UnusualActivityDetector(
+    z_threshold=settings.OPTIONS_FLOW_Z_THRESHOLD,
+    alpha=settings.OPTIONS_FLOW_EWM_ALPHA,
+    min_samples=settings.OPTIONS_FLOW_MIN_SAMPLES,
+    max_contracts=settings.OPTIONS_FLOW_MAX_CONTRACTS
+)
+flow_ingestor = FlowIngestor(unusual_detector, batch_size=settings.OPTIONS_FLOW_BATCH_SIZE)
\ No newline at end of file
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import OptionsFlow
+from . import metrics
+from .bar_store import bar_store
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+
+YEAR_SECONDS = 365 * 86400
+# Expiry dates are stored at midnight; contracts stop trading at 4pm New York
+EXPIRY_CLOSE = timedelta(hours=20)
+MIN_VOL, MAX_VOL = 1e-4, 5.0
+SQRT_2PI = math.sqrt(2 * math.pi)
+
+class Greeks(NamedTuple):
+    """Black-Scholes values per contract; vega per volatility point, theta per calendar day"""
+    price: np.ndarray
+    delta: np.ndarray
+    gamma: np.ndarray
+    vega: np.ndarray
+    theta: np.ndarray
+
+def _ndtr(x):
+    # Imported here: a lazy scipy.special still runs scipy/__init__, which loads numpy
+    from scipy.special import ndtr
+
+    return ndtr(x)
+
+def _d1_d2(spot, strike, years, vol, rate):
+    sqrt_t = np.sqrt(years)
+    vol_t = vol * sqrt_t
+    d1 = (np.log(spot / strike) + (rate + 0.5 * vol * vol) * years) / vol_t
+    return d1, d1 - vol_t, sqrt_t
+
+def _price_vega(spot, strike, years, vol, rate, is_call):
+    d1, d2, sqrt_t = _d1_d2(spot, strike, years, vol, rate)
+    discounted = strike * np.exp(-rate * years)
+    call = spot * _ndtr(d1) - discounted * _ndtr(d2)
+    # Put from put-call parity, so both sides share one pair of ndtr calls
+    price = np.where(is_call, call, call - spot + discounted)
+    vega = spot * np.exp(-0.5 * d1 * d1) / SQRT_2PI * sqrt_t
+    return price, vega
+
+def black_scholes(spot, strike, years, vol, rate: float, is_call) -> Greeks:
+    """Price and Greeks of every contract at once; arguments broadcast like numpy arrays"""
+    spot, strike, years, vol = (np.asarray(value, dtype="f8") for value in (spot, strike, years, vol))
+    is_call = np.asarray(is_call, dtype=bool)
+    d1, d2, sqrt_t = _d1_d2(spot, strike, years, vol, rate)
+    discounted = strike * np.exp(-rate * years)
+    nd1, nd2 = _ndtr(d1), _ndtr(d2)
+    pdf = np.exp(-0.5 * d1 * d1) / SQRT_2PI
+    call = spot * nd1 - discounted * nd2
+    decay = -spot * pdf * vol / (2 * sqrt_t)
+    return Greeks(
+        price=np.where(is_call, call, call - spot + discounted),
+        delta=np.where(is_call, nd1, nd1 - 1),
+        gamma=pdf / (spot * vol * sqrt_t),
+        vega=spot * pdf * sqrt_t / 100,
+        theta=np.where(is_call, decay - rate * discounted * nd2, decay + rate * discounted * (1 - nd2)) / 365
+    )
+
+def implied_volatility(price, spot, strike, years, rate: float, is_call, tol: float = 1e-6, max_iter: int = 100) -> np.ndarray:
+    """Volatility that reproduces each price, NaN where none in [MIN_VOL, MAX_VOL] does.
+
+    Newton steps on the whole chain at once, guarded by a bracket per contract:
+    a step that leaves its bracket or meets a vanishing vega is replaced by
+    bisection, so deep in or out of the money contracts still converge. Each
+    iteration only evaluates the contracts that have not converged yet.
+    """
+    price, spot, strike, years = np.broadcast_arrays(*(np.asarray(value, dtype="f8") for value in (price, spot, strike, years)))
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), price.shape)
+    discounted = strike * np.exp(-rate * years)
+    lower = np.where(is_call, np.maximum(spot - discounted, 0), np.maximum(discounted - spot, 0))
+    upper = np.where(is_call, spot, discounted)
+    with np.errstate(invalid="ignore"):
+        valid = (years > 0) & (price > lower) & (price < upper)
+
+    low = np.full(price.shape, MIN_VOL)
+    high = np.full(price.shape, MAX_VOL)
+    # Brenner-Subrahmanyam starting point, exact for at-the-money contracts
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vol = np.clip(np.sqrt(2 * np.pi / years) * price / spot, MIN_VOL, MAX_VOL)
+    active = np.flatnonzero(valid)
+    for _ in range(max_iter):
+        if not active.size:
+            break
+        sigma = vol[active]
+        model, vega = _price_vega(spot[active], strike[active], years[active], sigma, rate, is_call[active])
+        diff = model - price[active]
+        converged = np.abs(diff) <= tol
+        too_high = diff > 0
+        low[active] = np.where(too_high, low[active], sigma)
+        high[active] = np.where(too_high, sigma, high[active])
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            step = sigma - diff / vega
+        bisect = ~((step > low[active]) & (step < high[active]))
+        vol[active] = np.where(converged, sigma, np.where(bisect, 0.5 * (low[active] + high[active]), step))
+        active = active[~converged]
+    # Still unsolved: prices that need a volatility beyond MAX_VOL
+    vol[active] = np.nan
+    return np.where(valid, vol, np.nan)
+
+class Chain(NamedTuple):
+    ticker: str
+    spot: float
+    as_of: datetime
+    contracts: list
+
+    def lookup(self) -> Dict[Tuple[float, datetime, str], dict]:
+        return {(c["strike"], c["expiry"], c["type"]): c for c in self.contracts}
+
+class ChainCache:
+    """LRU + TTL cache of priced chains keyed by (ticker, last bar ts, spot).
+
+    A new underlying price changes the key, and bar refreshes drop a ticker's
+    entries early. The TTL bounds how long new flow prints go unpriced.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, Tuple[float, Any]]" = OrderedDict()
+        self._by_ticker: Dict[str, Set[tuple]] = {}
+        self._lock = threading.Lock()
+        self._hits = metrics.counter("options_chain_cache.hits")
+        self._misses = metrics.counter("options_chain_cache.misses")
+        metrics.gauge("options_chain_cache.size", lambda: len(self._entries))
+
+    def get(self, key: tuple) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self._misses.inc()
+                return None
+            self._entries.move_to_end(key)
+            self._hits.inc()
+            return entry[1]
+
+    def put(self, key: tuple, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            self._by_ticker.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_ticker(self, ticker: str):
+        with self._lock:
+            for key in list(self._by_ticker.get(ticker, ())):
+                self._remove(key)
+
+    def _remove(self, key: tuple):
+        self._entries.pop(key, None)
+        keys = self._by_ticker.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_ticker[key[0]]
+
+chain_cache = ChainCache(max_entries=settings.OPTIONS_CHAIN_CACHE_MAX_ENTRIES, ttl=settings.OPTIONS_CHAIN_CACHE_TTL_SECONDS)
+
+_price_ms = metrics.histogram("options_chain.price_ms")
+
+def _finite(value: float) -> Optional[float]:
+    return value if math.isfinite(value) else None
+
+def get_chain(ticker: str, db: Session) -> Optional[Chain]:
+    """Every unexpired contract of ticker traded in the lookback window, priced at the latest close.
+
+    A contract's market price is the volume-weighted premium of its recent
+    prints; IV is solved from it and the Greeks evaluated at that IV, all in
+    one vectorized pass. None when there is no underlying price.
+    """
+    ticker = ticker.upper()
+    bars = bar_store.get_bars(ticker)
+    if bars is None:
+        return None
+    spot = float(bars["close"][-1])
+    bar_ts = int(bars["ts"][-1])
+    key = (ticker, bar_ts, spot)
+    chain = chain_cache.get(key)
+    if chain is not None:
+        return chain
+
+    now = datetime.utcnow()
+    rows = db.execute(
+        select(
+            OptionsFlow.strike, OptionsFlow.expiry, OptionsFlow.type,
+            func.sum(OptionsFlow.premium), func.sum(OptionsFlow.volume), func.max(OptionsFlow.open_interest)
+        )
+        .where(
+            OptionsFlow.ticker == ticker,
+            OptionsFlow.timestamp >= now - timedelta(days=settings.OPTIONS_CHAIN_LOOKBACK_DAYS),
+            OptionsFlow.expiry > now - EXPIRY_CLOSE
+        )
+        .group_by(OptionsFlow.strike, OptionsFlow.expiry, OptionsFlow.type)
+        .order_by(OptionsFlow.expiry, OptionsFlow.strike, OptionsFlow.type)
+    ).all()
+    rows = [row for row in rows if row[4]]
+
+    started = time.perf_counter()
+    contracts = []
+    if rows:
+        strike = np.array([row[0] for row in rows], dtype="f8")
+        years = np.array([(row[1] + EXPIRY_CLOSE - now).total_seconds() for row in rows], dtype="f8") / YEAR_SECONDS
+        is_call = np.array([row[2] == "call" for row in rows])
+        # Premium is the dollar total of a print; one contract covers 100 shares
+        price = np.array([row[3] / (row[4] * 100) for row in rows], dtype="f8")
+        rate = settings.OPTIONS_RISK_FREE_RATE
+        iv = implied_volatility(price, spot, strike, years, rate, is_call)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            greeks = black_scholes(spot, strike, years, iv, rate, is_call)
+        columns = zip(
+            rows, price.tolist(), iv.tolist(), greeks.delta.tolist(), greeks.gamma.tolist(),
+            greeks.vega.tolist(), greeks.theta.tolist()
+        )
+        for row, market, vol, delta, gamma, vega, theta in columns:
+            contracts.append({
+                "strike": row[0],
+                "expiry": row[1],
+                "type": row[2],
+                "price": round(market, 4),
+                "volume": int(row[4]),
+                "open_interest": row[5],
+                "iv": _finite(vol),
+                "delta": _finite(delta),
+                "gamma": _finite(gamma),
+                "vega": _finite(vega),
+                "theta": _finite(theta)
+            })
+    _price_ms.observe((time.perf_counter() - started) * 1000)
+    chain = Chain(ticker, spot, datetime.utcfromtimestamp(bar_ts), contracts)
+    chain_cache.put(key, chain)
+    return chain
\ No newline at end of file
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import calendar
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, or_, select, tuple_, update
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import Prediction, PredictionDirection, PredictionOutcome
+from . import metrics
+from .bar_store import bar_store
+from .lazy import lazy_import
+from .leaderboard import is_hit, leaderboard
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+# How long each timeframe's prediction runs before it is scored
+HORIZONS = {"1d": timedelta(days=1), "1w": timedelta(weeks=1), "1m": timedelta(days=30)}
+DAY_SECONDS = 86400
+
+# Codes used by resolve(); OPEN means the bars do not cover the prediction's horizon yet
+OPEN, HIT_TARGET, HIT_STOP, EXPIRED = 0, 1, 2, 3
+OUTCOMES = {HIT_TARGET: PredictionOutcome.HIT_TARGET, HIT_STOP: PredictionOutcome.HIT_STOP, EXPIRED: PredictionOutcome.EXPIRED}
+
+class ScoringReport(NamedTuple):
+    scanned: int
+    resolved: int
+    open: int
+    chunks: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.scanned / self.seconds if self.seconds else 0.0
+
+    def to_dict(self) -> dict:
+        return {**self._asdict(), "rows_per_second": round(self.rows_per_second, 1)}
+
+def resolve(
+    bars: np.ndarray,
+    created_ts: np.ndarray,
+    expiry_ts: np.ndarray,
+    direction: np.ndarray,
+    target: np.ndarray,
+    stop: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Outcome codes and deciding bar timestamps for one ticker's predictions, all at once.
+
+    A prediction covers the bars after it was made up to its expiry. Whichever
+    of target and stop is touched first decides it (both on the same bar counts
+    as the stop); untouched ones expire. direction is +1 (up), -1 (down) or 0;
+    NaN targets or stops are never touched.
+    """
+    n = len(created_ts)
+    outcome = np.full(n, OPEN, dtype="i1")
+    decided_ts = expiry_ts.copy()
+    if n == 0 or len(bars) == 0:
+        return outcome, decided_ts
+    ts = bars["ts"]
+    first = np.searchsorted(ts, created_ts, side="right")
+    end = np.searchsorted(ts, expiry_ts, side="right")
+    # Scored once a bar on or after the expiry day exists
+    complete = ts[-1] >= expiry_ts - DAY_SECONDS
+    width = int((end - first).max(initial=0))
+
+    if width:
+        index = first[:, None] + np.arange(width)
+        inside = index < end[:, None]
+        index = np.minimum(index, len(ts) - 1)
+        high, low = bars["high"][index], bars["low"][index]
+        up, down = (direction > 0)[:, None], (direction < 0)[:, None]
+        with np.errstate(invalid="ignore"):
+            target_hit = inside & ((up & (high >= target[:, None])) | (down & (low <= target[:, None])))
+            stop_hit = inside & ((up & (low <= stop[:, None])) | (down & (high >= stop[:, None])))
+        # First touching bar, or width when never touched
+        first_target = np.where(target_hit.any(axis=1), target_hit.argmax(axis=1), width)
+        first_stop = np.where(stop_hit.any(axis=1), stop_hit.argmax(axis=1), width)
+        hit_stop = first_stop <= first_target
+        touched = np.minimum(first_target, first_stop) < width
+        outcome[touched] = np.where(hit_stop[touched], HIT_STOP, HIT_TARGET)
+        bar = first + np.minimum(first_target, first_stop)
+        decided_ts[touched] = ts[bar[touched]]
+        # A touch settles a prediction even before its horizon is over
+        outcome[~touched & complete] = EXPIRED
+    else:
+        outcome[complete] = EXPIRED
+    return outcome, decided_ts
+
+class OutcomeScorer:
+    """Resolves expired predictions in chunks and writes the outcomes back in bulk.
+
+    Unresolved, expired predictions are walked in (ticker, id) order with a keyset
+    cursor, served by the partial ix_predictions_unresolved index. Each chunk
+    loads its tickers' bars once, scores every prediction of a ticker with one
+    vectorized resolve() call and is committed with a single executemany UPDATE,
+    so memory stays bounded by the chunk size and an interrupted run resumes
+    where it stopped: resolved rows no longer match the query. Rows whose
+    horizon the bars do not cover yet are left for a later run.
+    """
+
+    def __init__(self, chunk_size: int = 5000):
+        self.chunk_size = chunk_size
+        self._scored = metrics.counter("outcomes.scored")
+        self._chunk_ms = metrics.histogram("outcomes.chunk_ms")
+
+    def run(self, now: Optional[datetime] = None, max_rows: Optional[int] = None, progress=None) -> ScoringReport:
+        now = now or datetime.utcnow()
+        started = time.perf_counter()
+        scanned = resolved = still_open = chunks = 0
+        cursor: Optional[Tuple[str, int]] = None
+        while max_rows is None or scanned < max_rows:
+            chunk_started = time.perf_counter()
+            limit = self.chunk_size if max_rows is None else min(self.chunk_size, max_rows - scanned)
+            rows = self._fetch(now, cursor, limit)
+            if not rows:
+                break
+            cursor = (rows[-1].ticker, rows[-1].id)
+            updates = self._score(rows)
+            if updates:
+                self._write(updates)
+                leaderboard.record(
+                    (user_id, resolved_at, is_hit(outcome)) for _, user_id, outcome, resolved_at in updates
+                )
+            scanned += len(rows)
+            resolved += len(updates)
+            still_open += len(rows) - len(updates)
+            chunks += 1
+            self._scored.inc(len(updates))
+            self._chunk_ms.observe((time.perf_counter() - chunk_started) * 1000)
+            if progress is not None:
+                progress(ScoringReport(scanned, resolved, still_open, chunks, time.perf_counter() - started))
+        report = ScoringReport(scanned, resolved, still_open, chunks, time.perf_counter() - started)
+        if scanned:
+            logger.info("Scored predictions: %s", report.to_dict())
+        return report
+
+    def _fetch(self, now: datetime, cursor: Optional[Tuple[str, int]], limit: int):
+        expired = or_(*(
+            and_(Prediction.timeframe == timeframe, Prediction.created_at <= now - horizon)
+            for timeframe, horizon in HORIZONS.items()
+        ))
+        query = (
+            select(
+                Prediction.id, Prediction.user_id, Prediction.ticker, Prediction.timeframe,
+                Prediction.direction, Prediction.created_at, Prediction.target_price, Prediction.stop_loss
+            )
+            .where(Prediction.outcome.is_(None), expired)
+            .order_by(Prediction.ticker, Prediction.id)
+            .limit(limit)
+        )
+        if cursor is not None:
+            query = query.where(tuple_(Prediction.ticker, Prediction.id) > cursor)
+        db = SessionLocal()
+        try:
+            return db.execute(query).all()
+        finally:
+            db.close()
+
+    def _score(self, rows) -> List[tuple]:
+        """(id, user_id, outcome, resolved_at) for the rows that can be decided"""
+        by_ticker: Dict[str, list] = {}
+        for row in rows:
+            by_ticker.setdefault(row.ticker, []).append(row)
+        bar_store.ensure_history(by_ticker, min(row.created_at for row in rows))
+        bars_by_ticker = bar_store.get_many(by_ticker)
+
+        updates = []
+        for ticker, ticker_rows in by_ticker.items():
+            bars = bars_by_ticker.get(ticker)
+            if bars is None:
+                continue
+            created_ts = np.array([calendar.timegm(row.created_at.utctimetuple()) for row in ticker_rows], dtype="i8")
+            horizons = np.array([HORIZONS[row.timeframe].total_seconds() for row in ticker_rows], dtype="i8")
+            direction = np.array([
+                1 if row.direction == PredictionDirection.UP else -1 if row.direction == PredictionDirection.DOWN else 0
+                for row in ticker_rows
+            ], dtype="i1")
+            target = np.array([np.nan if row.target_price is None else row.target_price for row in ticker_rows])
+            stop = np.array([np.nan if row.stop_loss is None else row.stop_loss for row in ticker_rows])
+            outcome, decided_ts = resolve(bars, created_ts, created_ts + horizons, direction, target, stop)
+            for row, code, decided in zip(ticker_rows, outcome.tolist(), decided_ts.tolist()):
+                if code != OPEN:
+                    updates.append((row.id, row.user_id, OUTCOMES[code], datetime.utcfromtimestamp(decided)))
+        return updates
+
+    def _write(self, updates: List[tuple]):
+        table = Prediction.__table__
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(table)
+                .where(table.c.id == bindparam("prediction_id"), table.c.outcome.is_(None))
+                .values(outcome=bindparam("new_outcome"), resolved_at=bindparam("new_resolved_at")),
+                [
+                    {"prediction_id": prediction_id, "new_outcome": outcome, "new_resolved_at": resolved_at}
+                    for prediction_id, _, outcome, resolved_at in updates
+                ]
+            )
+            db.commit()
+        finally:
+            db.close()
+
+outcome_scorer = OutcomeScorer(chunk_size=settings.OUTCOME_SCORING_CHUNK_SIZE)
\ No newline at end of file
@@ -0,0 +1,91 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from ..config import settings
+from . import metrics
+
+class PasswordHasherBusy(Exception):
+    """Raised instead of queueing when too many hash operations are already pending"""
+
+def _hash(password: str, rounds: int) -> str:
+    from passlib.hash import bcrypt
+
+    return bcrypt.using(rounds=rounds).hash(password)
+
+def _verify(password: str, hashed_password: str) -> bool:
+    from passlib.hash import bcrypt
+
+    return bcrypt.verify(password, hashed_password)
+
+class PasswordHasher:
+    """bcrypt hashing and verification on a process pool so logins use every core.
+
+    At most max_pending operations may be queued or running; beyond that calls fail
+    fast with PasswordHasherBusy so overload turns into 503s instead of a growing queue.
+    A pool broken by a dead worker is replaced and the call retried once.
+    """
+
+    def __init__(self, workers: int, max_pending: int, rounds: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._rejected = metrics.counter("password_hashing.rejected")
+        self._restarts = metrics.counter("password_hashing.pool_restarts")
+        self._latency = metrics.histogram("password_hashing.latency_ms")
+        metrics.gauge("password_hashing.pending", lambda: self._pending)
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash, password, self.rounds)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._submit(_verify, password, hashed_password)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def _submit(self, fn, *args):
+        if self._pending >= self.max_pending:
+            self._rejected.inc()
+            raise PasswordHasherBusy()
+        self._pending += 1
+        started = time.perf_counter()
+        try:
+            for _ in range(2):
+                pool = self._get_pool()
+                try:
+                    return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+                except BrokenProcessPool:
+                    self._discard(pool)
+            raise PasswordHasherBusy()
+        finally:
+            self._pending -= 1
+            self._latency.observe((time.perf_counter() - started) * 1000)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that already runs I/O threads is not safe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def _discard(self, pool: ProcessPoolExecutor):
+        """Drop a broken pool; concurrent callers that saw the same pool only replace it once"""
+        if self._pool is pool:
+            self._pool = None
+            self._restarts.inc()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    rounds=settings.BCRYPT_ROUNDS
+)
@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+from . import metrics
+
+CacheKey = Tuple[str, str, int, str]
+
+class PredictionCache:
+    """LRU + TTL cache of computed predictions keyed by (ticker, timeframe, last bar ts, model version).
+
+    A new bar changes the key, so old entries simply stop being hit; invalidate_ticker
+    drops them early, which also covers rewrites of a still-forming bar. Entries of an
+    older model version are dropped as soon as a lookup uses a newer one.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()
+        self._by_ticker: Dict[str, Set[CacheKey]] = {}
+        self._model_version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._hits = metrics.counter("prediction_cache.hits")
+        self._misses = metrics.counter("prediction_cache.misses")
+        self._evictions = metrics.counter("prediction_cache.evictions")
+        metrics.gauge("prediction_cache.size", lambda: len(self._entries))
+
+    def get(self, ticker: str, timeframe: str, bar_ts: int, model_version: str) -> Optional[Any]:
+        key = (ticker, timeframe, bar_ts, model_version)
+        with self._lock:
+            self._check_model_version(model_version)
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self._misses.inc()
+                return None
+            self._entries.move_to_end(key)
+            self._hits.inc()
+            return entry[1]
+
+    def put(self, ticker: str, timeframe: str, bar_ts: int, model_version: str, value: Any):
+        key = (ticker, timeframe, bar_ts, model_version)
+        with self._lock:
+            self._check_model_version(model_version)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            self._by_ticker.setdefault(ticker, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions.inc()
+
+    def invalidate_ticker(self, ticker: str):
+        with self._lock:
+            for key in list(self._by_ticker.get(ticker, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_ticker.clear()
+
+    def _check_model_version(self, model_version: str):
+        if model_version != self._model_version:
+            self._entries.clear()
+            self._by_ticker.clear()
+            self._model_version = model_version
+
+    def _remove(self, key: CacheKey):
+        self._entries.pop(key, None)
+        keys = self._by_ticker.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_ticker[key[0]]
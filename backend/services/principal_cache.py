@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import SubscriptionTier, User
+from . import metrics
+
+class Principal:
+    """The fields of an authenticated user that request handlers need"""
+    __slots__ = ("id", "username", "subscription_tier", "is_active")
+
+    def __init__(self, id: int, username: str, subscription_tier: SubscriptionTier, is_active: bool):
+        self.id = id
+        self.username = username
+        self.subscription_tier = subscription_tier
+        self.is_active = is_active
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            username=user.username,
+            subscription_tier=user.subscription_tier or SubscriptionTier.FREE,
+            is_active=bool(user.is_active)
+        )
+
+    def load(self, db: Session) -> Optional[User]:
+        """Full ORM row, for handlers that need more than the cached fields"""
+        return db.get(User, self.id)
+
+class PrincipalCache:
+    """Bounded LRU + TTL cache of principals keyed by token subject (username)"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Principal]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = metrics.counter("principal_cache.hits")
+        self._misses = metrics.counter("principal_cache.misses")
+        metrics.gauge("principal_cache.size", lambda: len(self._entries))
+        metrics.gauge("principal_cache.hit_ratio", self.hit_ratio)
+
+    def get(self, subject: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[subject]
+                self._misses.inc()
+                return None
+            self._entries.move_to_end(subject)
+            self._hits.inc()
+            return entry[1]
+
+    def put(self, subject: str, principal: Principal):
+        with self._lock:
+            self._entries[subject] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, subject: str):
+        with self._lock:
+            self._entries.pop(subject, None)
+
+    def hit_ratio(self) -> float:
+        total = self._hits.value + self._misses.value
+        return round(self._hits.value / total, 4) if total else 0.0
+
+principal_cache = PrincipalCache(
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
+
+@event.listens_for(User, "after_update")
+def _invalidate_updated_user(mapper, connection, target):
+    # Tier, activation or username changes must not wait for the TTL in this worker
+    state = inspect(target)
+    changed = ("subscription_tier", "is_active", "username")
+    if any(state.attrs[attr].history.has_changes() for attr in changed):
+        principal_cache.invalidate(target.username)
+        # A renamed user is also cached under the old name
+        for username in state.attrs.username.history.deleted or ():
+            if username:
+                principal_cache.invalidate(username)
+
+@event.listens_for(User, "after_delete")
+def _invalidate_deleted_user(mapper, connection, target):
+    principal_cache.invalidate(target.username)
@@ -0,0 +1,133 @@
+import threading
+import time
+from typing import Dict, NamedTuple, Tuple
+
+from ..config import settings
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    used: int
+    reset_at: int
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.limit - self.used)
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(self.reset_at),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, self.reset_at - int(time.time())))
+        return headers
+
+class InMemoryBackend:
+    """Sliding-window counters for a single process"""
+    blocking = False
+
+    def __init__(self):
+        # key -> [window index, count in that window, count in the previous window]
+        self._windows: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, cost: int, limit: int, window: int, now: float) -> Tuple[bool, float]:
+        index = int(now // window)
+        weight = 1 - (now % window) / window
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None or state[0] < index - 1:
+                state = [index, 0, 0]
+            elif state[0] == index - 1:
+                state = [index, 0, state[1]]
+            estimate = state[2] * weight + state[1]
+            if cost > 0 and estimate + cost > limit:
+                self._windows[key] = state
+                return False, estimate
+            state[1] = max(0, state[1] + cost)
+            self._windows[key] = state
+            return True, state[2] * weight + state[1]
+
+_HIT_SCRIPT = """
+local curr = tonumber(redis.call('GET', KEYS[1]) or '0')
+local prev = tonumber(redis.call('GET', KEYS[2]) or '0')
+local weight = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local estimate = prev * weight + curr
+if cost > 0 and estimate + cost > limit then
+    return {0, tostring(estimate)}
+end
+if cost ~= 0 then
+    -- Refunds never take a window below zero, as in InMemoryBackend
+    curr = math.max(0, curr + cost)
+    redis.call('SET', KEYS[1], curr, 'EX', ARGV[4])
+end
+return {1, tostring(prev * weight + curr)}
+"""
+
+class RedisBackend:
+    """Sliding-window counters shared by all workers through Redis (one round trip per check)"""
+    blocking = True
+
+    def __init__(self, url: str):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(_HIT_SCRIPT)
+
+    def hit(self, key: str, cost: int, limit: int, window: int, now: float) -> Tuple[bool, float]:
+        index = int(now // window)
+        weight = 1 - (now % window) / window
+        allowed, estimate = self._script(
+            keys=[f"ratelimit:{key}:{index}", f"ratelimit:{key}:{index - 1}"],
+            args=[weight, cost, limit, window * 2],
+        )
+        return bool(allowed), float(estimate)
+
+class RateLimiter:
+    """Per-user request quota with limits taken from the user's subscription tier.
+
+    Uses the sliding-window counter approximation: the previous window's count is
+    weighted by how much of it still overlaps the sliding window. Each check is O(1)
+    and touches no database.
+    """
+
+    def __init__(self, scope: str, backend, window: int):
+        self.scope = scope
+        self.backend = backend
+        self.window = window
+
+    def limit_for(self, tier: str) -> int:
+        return {
+            "free": settings.RATE_LIMIT_FREE,
+            "pro": settings.RATE_LIMIT_PRO,
+            "elite": settings.RATE_LIMIT_ELITE
+        }.get(tier, settings.RATE_LIMIT_FREE)
+
+    def hit(self, user_id: int, tier: str, cost: int = 1) -> RateLimitResult:
+        """Consume cost units if they fit in the user's quota"""
+        return self._call(user_id, tier, cost)
+
+    def peek(self, user_id: int, tier: str) -> RateLimitResult:
+        return self._call(user_id, tier, 0)
+
+    def refund(self, user_id: int, tier: str, cost: int = 1) -> RateLimitResult:
+        """Give back units consumed by a request that did not complete"""
+        return self._call(user_id, tier, -cost)
+
+    def _call(self, user_id: int, tier: str, cost: int) -> RateLimitResult:
+        now = time.time()
+        limit = self.limit_for(tier)
+        allowed, used = self.backend.hit(f"{self.scope}:{user_id}", cost, limit, self.window, now)
+        reset_at = (int(now // self.window) + 1) * self.window
+        return RateLimitResult(allowed, limit, int(round(used)), reset_at)
+
+def create_backend(name: str):
+    if name == "redis":
+        return RedisBackend(settings.REDIS_URL)
+    if name == "memory":
+        return InMemoryBackend()
+    raise ValueError(f"Unknown rate limit backend: {name}")
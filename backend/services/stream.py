@@ -0,0 +1,181 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional, Set
+
+from ..config import settings
+from . import metrics
+
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "disconnect")
+
+class Message:
+    """One event serialized once; every subscriber gets the same encoded frames"""
+
+    __slots__ = ("type", "text", "_sse")
+
+    def __init__(self, type: str, payload: dict):
+        self.type = type
+        self.text = json.dumps({"type": type, **payload}, separators=(",", ":"), default=str)
+        self._sse: Optional[bytes] = None
+
+    @property
+    def sse(self) -> bytes:
+        if self._sse is None:
+            self._sse = f"event: {self.type}\ndata: {self.text}\n\n".encode()
+        return self._sse
+
+class Subscriber:
+    """Send buffer of one streaming connection.
+
+    The broker appends without ever waiting; the connection's task drains the
+    buffer at the client's pace. A full buffer either drops its oldest message
+    or closes the connection, depending on the slow consumer policy.
+    """
+
+    def __init__(self, user_id: int, buffer_size: int, policy: str):
+        self.user_id = user_id
+        self.tickers: Set[str] = set()
+        self.policy = policy
+        self.dropped = 0
+        self.closed = False
+        self._buffer: Deque[Message] = deque(maxlen=buffer_size)
+        self._ready = asyncio.Event()
+
+    def offer(self, message: Message) -> bool:
+        """Queue message; False when the subscriber was closed for being too slow"""
+        if self.closed:
+            return False
+        if len(self._buffer) == self._buffer.maxlen:
+            if self.policy == "disconnect":
+                self.close()
+                return False
+            self.dropped += 1
+        self._buffer.append(message)
+        self._ready.set()
+        return True
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def next_batch(self, timeout: Optional[float] = None) -> list:
+        """Wait for queued messages and take them all; empty on timeout or when closed"""
+        if not self._buffer and not self.closed:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._ready.clear()
+        batch = list(self._buffer)
+        self._buffer.clear()
+        return batch
+
+class StreamBroker:
+    """Fan-out of prices, predictions and triggered alerts to streaming connections.
+
+    Subscribers are indexed by ticker (and by user for alerts), so a publish only
+    touches the connections that asked for it. Each event is serialized once and
+    the same Message is appended to every subscriber's buffer. Publishing is safe
+    from any thread: off the event loop the fan-out is handed to the loop.
+    """
+
+    def __init__(self, buffer_size: int, policy: str, max_connections: int):
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"slow consumer policy must be one of {', '.join(SLOW_CONSUMER_POLICIES)}")
+        self.buffer_size = buffer_size
+        self.policy = policy
+        self.max_connections = max_connections
+        self._by_ticker: Dict[str, Set[Subscriber]] = {}
+        self._by_user: Dict[int, Set[Subscriber]] = {}
+        self.connections = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._published = metrics.counter("stream.published")
+        self._delivered = metrics.counter("stream.delivered")
+        self._dropped = metrics.counter("stream.dropped")
+        self._disconnected = metrics.counter("stream.slow_disconnects")
+        self._fanout_ms = metrics.histogram("stream.fanout_ms", (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 50))
+        metrics.gauge("stream.connections", lambda: self.connections)
+        metrics.gauge("stream.tickers", lambda: len(self._by_ticker))
+
+    def start(self):
+        """Bind to the running event loop; publishes before this are dropped"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+
+    def connect(self, user_id: int) -> Optional[Subscriber]:
+        """New subscriber for user_id, or None when the worker is at max_connections"""
+        if self.connections >= self.max_connections:
+            return None
+        subscriber = Subscriber(user_id, self.buffer_size, self.policy)
+        self._by_user.setdefault(user_id, set()).add(subscriber)
+        self.connections += 1
+        return subscriber
+
+    def disconnect(self, subscriber: Subscriber):
+        subscriber.close()
+        self.unsubscribe(subscriber, list(subscriber.tickers))
+        if subscriber in self._by_user.get(subscriber.user_id, ()):
+            self._discard(self._by_user, subscriber.user_id, subscriber)
+            self.connections -= 1
+
+    def subscribe(self, subscriber: Subscriber, tickers: Iterable[str]):
+        for ticker in tickers:
+            subscriber.tickers.add(ticker)
+            self._by_ticker.setdefault(ticker, set()).add(subscriber)
+
+    def unsubscribe(self, subscriber: Subscriber, tickers: Iterable[str]):
+        for ticker in tickers:
+            subscriber.tickers.discard(ticker)
+            self._discard(self._by_ticker, ticker, subscriber)
+
+    def publish(self, ticker: str, type: str, payload: dict):
+        """Send an event to every subscriber of ticker"""
+        if self._loop is None or ticker not in self._by_ticker:
+            return
+        self._dispatch(self._by_ticker, ticker, Message(type, {"ticker": ticker, **payload}))
+
+    def publish_to_user(self, user_id: int, type: str, payload: dict):
+        """Send an event to every connection of user_id"""
+        if self._loop is None or user_id not in self._by_user:
+            return
+        self._dispatch(self._by_user, user_id, Message(type, payload))
+
+    def _dispatch(self, index: dict, key, message: Message):
+        self._published.inc()
+        if threading.get_ident() == self._loop_thread:
+            self._fanout(index, key, message)
+        else:
+            self._loop.call_soon_threadsafe(self._fanout, index, key, message)
+
+    def _fanout(self, index: dict, key, message: Message):
+        started = time.perf_counter()
+        delivered = 0
+        for subscriber in list(index.get(key, ())):
+            dropped = subscriber.dropped
+            if subscriber.offer(message):
+                delivered += 1
+                if subscriber.dropped > dropped:
+                    self._dropped.inc()
+            else:
+                # Too slow under the disconnect policy; its task sees closed and ends the connection
+                self._disconnected.inc()
+                self.unsubscribe(subscriber, list(subscriber.tickers))
+        self._delivered.inc(delivered)
+        self._fanout_ms.observe((time.perf_counter() - started) * 1000)
+
+    @staticmethod
+    def _discard(index: dict, key, subscriber: Subscriber):
+        subscribers = index.get(key)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del index[key]
+
+stream_broker = StreamBroker(
+    buffer_size=settings.STREAM_SEND_BUFFER,
+    policy=settings.STREAM_SLOW_CONSUMER_POLICY,
+    max_connections=settings.STREAM_MAX_CONNECTIONS
+)
\ No newline at end of file
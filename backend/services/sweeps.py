@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import Backtest
+from . import metrics
+from .backtest import equity_curve_points, prepare, simulate
+from .concurrency import run_io
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+ArrayRef = Tuple[str, tuple, str]  # shared memory block name, shape, dtype
+
+class SharedArrays:
+    """Read-only arrays copied once into shared memory for the sweep workers.
+
+    Cells only carry the small refs; workers map the blocks instead of receiving
+    pickled copies of the price and signal matrices with every task.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.refs: Dict[str, ArrayRef] = {}
+        self._blocks: List[shared_memory.SharedMemory] = []
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            self._blocks.append(block)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self.refs[name] = (block.name, array.shape, array.dtype.str)
+
+    def release(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+# Worker side: blocks stay mapped across cells of the same sweep
+_attached: "OrderedDict[str, shared_memory.SharedMemory]" = OrderedDict()
+
+def _attach(ref: ArrayRef) -> np.ndarray:
+    name, shape, dtype = ref
+    block = _attached.get(name)
+    if block is None:
+        block = _attached[name] = shared_memory.SharedMemory(name=name)
+        while len(_attached) > 8:
+            try:
+                _attached.popitem(last=False)[1].close()
+            except BufferError:
+                pass
+    array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    array.flags.writeable = False
+    return array
+
+def _run_cell(refs: Dict[str, ArrayRef], threshold: float, holding_bars: int, initial_capital: float):
+    started = time.perf_counter()
+    stats, equity = simulate(_attach(refs["close"]), _attach(refs["signals"]), threshold, holding_bars, initial_capital)
+    equity_curve = equity_curve_points(_attach(refs["ts"]), equity)
+    return threshold, holding_bars, stats, equity_curve, (time.perf_counter() - started) * 1000
+
+class SweepJob:
+    """One parameter sweep: a grid of (confidence_threshold, holding_period) cells"""
+
+    def __init__(self, user_id: int, parameters: dict, cells: List[Tuple[float, int]]):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.parameters = parameters
+        self.cells = cells
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.results: List[dict] = []
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+    def notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait_for_change(self):
+        await self._changed.wait()
+
+    def summary(self) -> dict:
+        best = max(self.results, key=lambda result: result["sharpe_ratio"], default=None)
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "total_cells": len(self.cells),
+            "completed_cells": len(self.results),
+            "created_at": self.created_at.isoformat(),
+            "best": best,
+            "results": self.results,
+        }
+
+class SweepManager:
+    """Runs sweep jobs in the background on a process pool using all cores.
+
+    The prices and signals of a job are prepared once, put in shared memory and
+    every cell is a separate task. Results are stored in Backtest as cells finish
+    and can be polled or streamed. Jobs live in the memory of the worker that
+    accepted them and are forgotten retention seconds after they finish. When a
+    worker process dies, every job with cells on the pool fails and the next job
+    gets a fresh pool.
+    """
+
+    def __init__(self, workers: int, max_active_per_user: int, retention: float):
+        self.workers = workers
+        self.max_active_per_user = max_active_per_user
+        self.retention = retention
+        self._jobs: Dict[str, SweepJob] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._cells = metrics.counter("backtest_sweeps.cells")
+        self._restarts = metrics.counter("backtest_sweeps.pool_restarts")
+        self._cell_ms = metrics.histogram("backtest_sweeps.cell_ms")
+        metrics.gauge("backtest_sweeps.active", lambda: sum(not job.finished for job in self._jobs.values()))
+
+    def get(self, job_id: str, user_id: int) -> Optional[SweepJob]:
+        self._expire()
+        job = self._jobs.get(job_id)
+        return job if job is not None and job.user_id == user_id else None
+
+    def active_jobs(self, user_id: int) -> int:
+        return sum(job.user_id == user_id and not job.finished for job in self._jobs.values())
+
+    def submit(self, user_id: int, parameters: dict, cells: List[Tuple[float, int]]) -> SweepJob:
+        self._expire()
+        job = SweepJob(user_id, parameters, cells)
+        self._jobs[job.id] = job
+        job.task = asyncio.get_running_loop().create_task(self._run(job))
+        return job
+
+    def cancel(self, job: SweepJob):
+        if job.task is not None and not job.finished:
+            job.task.cancel()
+
+    def shutdown(self):
+        for job in self._jobs.values():
+            self.cancel(job)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def _run(self, job: SweepJob):
+        job.status = "running"
+        job.notify()
+        futures = []
+        shared = None
+        pool = None
+        try:
+            history, signals = await run_io(self._prepare, job)
+            shared = SharedArrays({"ts": history.ts, "close": history.close, "signals": signals})
+            loop = asyncio.get_running_loop()
+            pool = self._get_pool()
+            capital = job.parameters["initial_capital"]
+            futures = [
+                loop.run_in_executor(pool, _run_cell, shared.refs, threshold, holding_bars, capital)
+                for threshold, holding_bars in job.cells
+            ]
+            for next_done in asyncio.as_completed(futures):
+                threshold, holding_bars, stats, equity_curve, elapsed_ms = await next_done
+                backtest_id = await run_io(self._store, job, threshold, holding_bars, stats, equity_curve)
+                job.results.append({
+                    "confidence_threshold": threshold,
+                    "holding_period": holding_bars,
+                    "backtest_id": backtest_id,
+                    **stats
+                })
+                self._cells.inc()
+                self._cell_ms.observe(elapsed_ms)
+                job.notify()
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except BrokenProcessPool:
+            logger.error("Backtest sweep %s lost a worker process", job.id)
+            self._discard_pool(pool)
+            job.status = "failed"
+            job.error = "A backtest worker crashed, please resubmit the sweep"
+        except ValueError as exc:
+            # Nothing to backtest (no predictions, no prices, too many tickers)
+            job.status = "failed"
+            job.error = str(exc)
+        except Exception:
+            logger.exception("Backtest sweep %s failed", job.id)
+            job.status = "failed"
+            job.error = "Backtest sweep failed"
+        finally:
+            for future in futures:
+                future.cancel()
+            if shared is not None:
+                # Cells already running keep their own mapping; the name just goes away
+                shared.release()
+            job.finished_at = time.monotonic()
+            job.notify()
+
+    def _prepare(self, job: SweepJob):
+        params = job.parameters
+        db = SessionLocal()
+        try:
+            return prepare(
+                db,
+                job.user_id,
+                datetime.fromisoformat(params["start"]),
+                datetime.fromisoformat(params["end"]),
+                params["source"],
+                params["tickers"],
+                params["timeframe"],
+            )
+        finally:
+            db.close()
+
+    def _store(self, job: SweepJob, threshold: float, holding_bars: int, stats: dict, equity_curve: list) -> int:
+        db = SessionLocal()
+        try:
+            backtest = Backtest(
+                user_id=job.user_id,
+                name=f"{job.parameters['name']} (threshold {threshold}, holding {holding_bars})",
+                parameters={
+                    **job.parameters,
+                    "confidence_threshold": threshold,
+                    "holding_period": holding_bars,
+                    "sweep_id": job.id
+                },
+                results={**stats, "equity_curve": equity_curve}
+            )
+            db.add(backtest)
+            db.commit()
+            return backtest.id
+        finally:
+            db.close()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that already runs I/O threads is not safe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def _discard_pool(self, pool: Optional[ProcessPoolExecutor]):
+        """Drop a broken pool; jobs that shared it only replace it once"""
+        if pool is not None and self._pool is pool:
+            self._pool = None
+            self._restarts.inc()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _expire(self):
+        now = time.monotonic()
+        for job_id in [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and now - job.finished_at > self.retention
+        ]:
+            del self._jobs[job_id]
+
+sweep_manager = SweepManager(
+    workers=settings.BACKTEST_SWEEP_WORKERS,
+    max_active_per_user=settings.BACKTEST_SWEEP_MAX_ACTIVE_PER_USER,
+    retention=settings.BACKTEST_SWEEP_RETENTION_SECONDS
+)
\ No newline at end of file
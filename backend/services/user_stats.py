@@ -0,0 +1,183 @@
+import calendar
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Set
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import Prediction
+from . import metrics
+
+HOUR = 3600
+
+class UserStats:
+    """Prediction counters for one user: total, hourly buckets for the last 24h, per-ticker counts"""
+
+    def __init__(self, total: int, ticker_counts: Counter, recent: Iterable[datetime], top_n: int):
+        self.total = total
+        self.ticker_counts = ticker_counts
+        self.top_n = top_n
+        # Bumped by every record(), so reconcile() can tell if a reload raced with one
+        self.version = 0
+        # hour index -> count, at most 24 live entries
+        self.hourly: Dict[int, int] = {}
+        for created_at in recent:
+            self._add_hourly(created_at, 1)
+        self.top = sorted(ticker_counts.items(), key=lambda item: -item[1])[:top_n]
+
+    def record(self, ticker: str, created_at: datetime, count: int):
+        self.version += 1
+        self.total += count
+        self._add_hourly(created_at, count)
+        self.ticker_counts[ticker] += count
+        self._update_top(ticker, self.ticker_counts[ticker])
+
+    def predictions_last_24h(self, now: datetime) -> int:
+        current = _hour_index(now)
+        return sum(count for hour, count in self.hourly.items() if hour > current - 24)
+
+    def _add_hourly(self, created_at: datetime, count: int):
+        hour = _hour_index(created_at)
+        self.hourly[hour] = self.hourly.get(hour, 0) + count
+        if len(self.hourly) > 25:
+            for stale in sorted(self.hourly)[:-25]:
+                del self.hourly[stale]
+
+    def _update_top(self, ticker: str, count: int):
+        # Counts only grow between reconciliations, so only the changed ticker can move
+        top = [item for item in self.top if item[0] != ticker]
+        if len(top) < self.top_n or count > top[-1][1]:
+            top.append((ticker, count))
+            top.sort(key=lambda item: -item[1])
+        self.top = top[:self.top_n]
+
+def _hour_index(moment: datetime) -> int:
+    # Naive datetimes are UTC throughout the app
+    return calendar.timegm(moment.utctimetuple()) // HOUR
+
+class UserStatsStore:
+    """Per-user prediction statistics kept in memory and updated on every write.
+
+    A user's stats are loaded from the database on first access and then maintained
+    incrementally, so reads are O(1) regardless of history length. reconcile()
+    reloads, in chunks, the cached users with predictions newer than its last
+    pass, which picks up writes made by other workers.
+    The number of cached users is bounded (least recently used are dropped).
+    """
+
+    def __init__(self, max_users: int, top_n: int = 5, chunk_size: int = 500):
+        self.max_users = max_users
+        self.top_n = top_n
+        self.chunk_size = chunk_size
+        self._users: "OrderedDict[int, UserStats]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Highest prediction id seen by the last reconcile(); 0 until the first pass
+        self._watermark = 0
+        # Users whose reload raced with a record() and has to be repeated
+        self._stale: Set[int] = set()
+        self._loads = metrics.counter("user_stats.loads")
+        self._reconcile_ms = metrics.histogram("user_stats.reconcile_ms")
+        metrics.gauge("user_stats.cached_users", lambda: len(self._users))
+
+    def record(self, user_id: int, ticker: str, created_at: datetime, count: int = 1):
+        """Account for new predictions; users not cached yet pick them up when loaded"""
+        with self._lock:
+            stats = self._users.get(user_id)
+            if stats is not None:
+                stats.record(ticker, created_at, count)
+
+    def get(self, db: Session, user_id: int) -> dict:
+        with self._lock:
+            stats = self._users.get(user_id)
+            if stats is not None:
+                self._users.move_to_end(user_id)
+        if stats is None:
+            stats = self._load(db, [user_id])[user_id]
+            self._loads.inc()
+            self._store({user_id: stats})
+
+        now = datetime.utcnow()
+        with self._lock:
+            return {
+                "total_predictions": stats.total,
+                "predictions_today": stats.predictions_last_24h(now),
+                "top_tickers": [{"ticker": ticker, "count": count} for ticker, count in stats.top]
+            }
+
+    def reconcile(self):
+        """Rebuild the stats of cached users written to since the last pass"""
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            latest = db.execute(select(func.max(Prediction.id))).scalar() or 0
+            with self._lock:
+                user_ids = set(self._users)
+            if self._watermark:
+                written = db.execute(
+                    select(Prediction.user_id).where(Prediction.id > self._watermark).distinct()
+                ).scalars()
+                user_ids &= set(written) | self._stale
+            self._stale = set()
+            user_ids = sorted(user_ids)
+            for offset in range(0, len(user_ids), self.chunk_size):
+                chunk = user_ids[offset:offset + self.chunk_size]
+                with self._lock:
+                    before = {user_id: self._users.get(user_id) for user_id in chunk}
+                    versions = {user_id: stats.version for user_id, stats in before.items() if stats is not None}
+                loaded = self._load(db, chunk)
+                with self._lock:
+                    for user_id, stats in loaded.items():
+                        current = self._users.get(user_id)
+                        if current is None:
+                            continue
+                        if current is not before[user_id] or current.version != versions[user_id]:
+                            # A record() landed during the load, which may or may not include it
+                            self._stale.add(user_id)
+                            continue
+                        self._users[user_id] = stats
+            self._watermark = latest
+        finally:
+            db.close()
+        self._reconcile_ms.observe((time.perf_counter() - started) * 1000)
+
+    def _store(self, loaded: Dict[int, UserStats]):
+        with self._lock:
+            for user_id, stats in loaded.items():
+                self._users[user_id] = stats
+                self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def _load(self, db: Session, user_ids: List[int]) -> Dict[int, UserStats]:
+        ticker_counts: Dict[int, Counter] = {user_id: Counter() for user_id in user_ids}
+        for user_id, ticker, count in db.execute(
+            select(Prediction.user_id, Prediction.ticker, func.count(Prediction.id))
+            .where(Prediction.user_id.in_(user_ids))
+            .group_by(Prediction.user_id, Prediction.ticker)
+        ):
+            ticker_counts[user_id][ticker] = count
+
+        recent: Dict[int, List[datetime]] = {user_id: [] for user_id in user_ids}
+        since = datetime.utcnow() - timedelta(days=1)
+        for user_id, created_at in db.execute(
+            select(Prediction.user_id, Prediction.created_at)
+            .where(Prediction.user_id.in_(user_ids), Prediction.created_at >= since)
+        ):
+            recent[user_id].append(created_at)
+
+        return {
+            user_id: UserStats(
+                total=sum(ticker_counts[user_id].values()),
+                ticker_counts=ticker_counts[user_id],
+                recent=recent[user_id],
+                top_n=self.top_n
+            )
+            for user_id in user_ids
+        }
+
+user_stats = UserStatsStore(max_users=settings.USER_STATS_MAX_USERS)